@@ -1,16 +1,76 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from collections import OrderedDict
+from contextlib import ExitStack, asynccontextmanager
+import hashlib
 import os
+import re
+import threading
+import time
 import uuid
-from typing import Optional
+from typing import List, Optional, Tuple
 
 # Import your existing agent logic
-# Ensure podcast_agent.py (refactored) is in the same directory
-from podcast_agent import run_podcast, AudioEngine, ScriptParser, get_ollama_models
+# Ensure podcast_agent.py (refactored) is in the same directory.
+# None of these import CrewAI; it is loaded by warm_start() or the first agent job.
+from podcast_agent import (run_podcast, run_batch, get_model_catalog, get_ollama_client, get_research_cache,
+                           preload_agent_stack, OLLAMA_DEFAULT_MODEL)
+from audio_engine import (AudioEngine, get_piper_pool, get_onnx_tts, get_clip_cache, load_timeline, output_format,
+                          AUDIO_FORMAT, OUTPUT_FORMATS, TTS_BACKEND, VOICE_MODELS)
+from onnx_tts import get_phoneme_cache
+from script_parser import ScriptParser
+from job_queue import JobQueue
+from artifact_store import ArtifactStore, job_file_id, ARTIFACT_DIR
+from metrics import Trace, registry
 
-app = FastAPI(title="Local Podcast Agent API")
+# Number of jobs that may generate at the same time; the rest wait in the queue
+GENERATION_SLOTS = int(os.environ.get("GENERATION_SLOTS", 1))
+JOB_DB = os.environ.get("JOB_DB", os.path.join(ARTIFACT_DIR, "jobs.db"))
+# Load the agent stack and start the Piper voices in the background at startup
+WARM_START = os.environ.get("WARM_START", "1") == "1"
+# Episode files never change once written (every job gets a new name), so clients may keep them
+AUDIO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def warm_start():
+    """Pays one-off startup costs off the request path, so first requests are fast."""
+    started = time.perf_counter()
+    try:
+        if TTS_BACKEND == "onnx":
+            get_onnx_tts().warm(VOICE_MODELS.values())
+        else:
+            get_piper_pool().warm()
+    except Exception as e:
+        print(f"Piper warm-up failed: {e}")
+    try:
+        # Loads the default model so the first job doesn't pay for it
+        loaded = get_ollama_client().warm(OLLAMA_DEFAULT_MODEL)
+        print(f"Ollama model {OLLAMA_DEFAULT_MODEL} warmed in {loaded:.2f}s")
+    except Exception as e:
+        print(f"Ollama warm-up failed: {e}")
+    try:
+        preload_agent_stack()
+    except Exception as e:
+        print(f"Agent stack preload failed: {e}")
+    print(f"Warm start finished in {time.perf_counter() - started:.2f}s")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue.start()
+    artifacts.start()
+    # Load the model list in the background so /api/models never waits on Ollama
+    get_model_catalog().refresh_async()
+    if WARM_START:
+        threading.Thread(target=warm_start, name="warm-start", daemon=True).start()
+    yield
+    job_queue.stop()
+    artifacts.stop()
+    # Stop the shared Piper workers so no voice processes outlive the server
+    get_piper_pool().close()
+    get_ollama_client().close()
+
+app = FastAPI(title="Local Podcast Agent API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,45 +81,239 @@ app.add_middleware(
 )
 
 # --- Job Store ---
-jobs = {}
 
-class GenerateRequest(BaseModel):
+class AudioStream:
+    """
+    Append-only buffer of WAV chunks for one job. Any number of listeners can
+    read it from the start while the producer is still writing.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.cond = threading.Condition()
+
+    def write(self, chunk: bytes):
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.done = True
+            self.cond.notify_all()
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self.cond:
+                while index >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                if index >= len(self.chunks):
+                    return
+                chunk = self.chunks[index]
+            index += 1
+            yield chunk
+
+# Live audio for jobs started with stream=True, keyed by job ID
+streams = {}
+
+class EpisodeSpec(BaseModel):
     topic: str
     length: str = "short"
     host_name: str = "Host"
     guest_name: str = "Guest"
     model: str = "qwen2.5:0.5b" 
+    research_mode: Optional[str] = None  # "crew" or "fast"; RESEARCH_MODE when omitted
+    format: Optional[str] = None  # "wav", "opus", "mp3" or "aac"; AUDIO_FORMAT when omitted
+
+class GenerateRequest(EpisodeSpec):
+    stream: bool = False
+    priority: int = 0  # Higher runs first
+
+class BatchRequest(BaseModel):
+    episodes: List[EpisodeSpec]
+    priority: int = 0
+
+def episode_params(spec: EpisodeSpec) -> dict:
+    if spec.research_mode not in (None, "crew", "fast"):
+        raise HTTPException(status_code=422, detail="research_mode must be 'crew' or 'fast'")
+    return {
+        "topic": spec.topic,
+        "length": spec.length,
+        "host_name": spec.host_name,
+        "guest_name": spec.guest_name,
+        "model": spec.model,
+        "research_mode": spec.research_mode,
+        "format": check_format(spec.format),
+    }
 
 class ManualRequest(BaseModel):
     script: str
+    stream: bool = False
+    priority: int = 0
+    format: Optional[str] = None
+    previous_job_id: Optional[str] = None  # A finished manual render to revise: unchanged lines are reused
 
-def process_podcast_generation(job_id: str, topic: str, length: str, host: str, guest: str, model: str):
-    """Background task wrapper"""
+def check_format(fmt: Optional[str]) -> str:
+    fmt = fmt or AUDIO_FORMAT
+    if fmt not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=422, detail=f"format must be one of: {', '.join(OUTPUT_FORMATS)}")
+    return fmt
+
+def episode_filename(prefix: str, params: dict) -> str:
+    # Jobs queued before formats existed have none and stay WAV
+    return prefix + OUTPUT_FORMATS[params.get("format") or "wav"]["extension"]
+
+def audio_sink(job_id: str):
+    """Returns an on_audio callback feeding the job's live stream, or None if it has none."""
+    stream = streams.get(job_id)
+    if stream is None:
+        return None
+    started = time.perf_counter()
+    first_audio = []
+
+    def on_audio(chunk: bytes):
+        if not first_audio:
+            # Time-to-first-audio: header plus the first mixed line
+            first_audio.append(True)
+            job_queue.update(job_id, first_audio_s=round(time.perf_counter() - started, 3))
+        stream.write(chunk)
+    return on_audio
+
+# Spans that end a pipeline stage. Per-line, per-chunk and per-call phonemize
+# spans can number in the thousands, so they are only summarized once the job is done
+STAGE_SPANS = frozenset(["research", "script_generation", "parse", "mix"])
+
+def job_trace(job_id: str) -> Trace:
+    """Trace whose stage timings are written to the job record as each stage ends."""
+    def on_span(span: dict):
+        if span["name"] in STAGE_SPANS:
+            job_queue.update(job_id, timings=trace.summary())
+    trace = Trace(on_span)
+    return trace
+
+def finish_trace(job_id: str, trace: Trace):
+    job_queue.update(job_id, timings=trace.summary(), spans=trace.spans)
+
+def close_stream(job_id: str):
+    # Listeners keep their own reference; later ones get the finished file
+    stream = streams.pop(job_id, None)
+    if stream is not None:
+        stream.close()
+
+def process_podcast_generation(job_id: str, params: dict):
+    """Job queue handler for /api/generate"""
+    job_queue.update(job_id, status="processing", message="Starting generation...")
+
+    filename = episode_filename(f"podcast_{job_id}", params)
+    trace = job_trace(job_id)
     try:
-        jobs[job_id]["status"] = "processing"
-        jobs[job_id]["message"] = "Starting generation..."
-        
-        filename = f"podcast_{job_id}.wav"
-        
-        # We need to handle the output path. run_podcast returns the path.
-        output_path = run_podcast(
-            topic=topic,
-            output_file=filename,
-            length=length,
-            allow_human_input=False,
-            host_name=host,
-            guest_name=guest,
-            llm_model_name=model
-        )
-        
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["message"] = "Podcast generated successfully."
-        jobs[job_id]["filename"] = filename
-        
+        with artifacts.job(job_id) as job_dir:
+            run_podcast(
+                topic=params["topic"],
+                output_file=os.path.join(job_dir, filename),
+                length=params["length"],
+                allow_human_input=False,
+                host_name=params["host_name"],
+                guest_name=params["guest_name"],
+                llm_model_name=params["model"],
+                persistent_tts=True,
+                on_audio=audio_sink(job_id),
+                trace=trace,
+                research_mode=params.get("research_mode"),
+                script_file=os.path.join(job_dir, "script.txt"),
+                scratch_dir=artifacts.scratch_dir,
+            )
+    finally:
+        close_stream(job_id)
+        finish_trace(job_id, trace)
+
+    job_queue.update(job_id, status="completed", message="Podcast generated successfully.", filename=filename)
+
+def process_manual_render(job_id: str, params: dict):
+    """Job queue handler for /api/manual"""
+    job_queue.update(job_id, status="processing", message="Rendering script...")
+
+    filename = episode_filename(f"manual_{job_id}", params)
+    trace = job_trace(job_id)
+    with trace.span("parse"):
+        parsed_lines = ScriptParser.parse(params["script"])
+    on_audio = audio_sink(job_id)
+    previous_id = params.get("previous_job_id")
+    try:
+        # Clips go to a per-job scratch directory so parallel renders never collide;
+        # each line's clip is then kept with the episode for later revisions
+        with ExitStack() as stack:
+            job_dir = stack.enter_context(artifacts.job(job_id))
+            clip_dir = stack.enter_context(artifacts.scratch("clips_"))
+            previous = None
+            if previous_id and os.path.isdir(os.path.join(artifacts.jobs_dir, previous_id)):
+                previous = load_timeline(stack.enter_context(artifacts.job(previous_id)))
+            engine = AudioEngine(output_dir=clip_dir, persistent=True, trace=trace)
+            timeline = engine.render_revision(parsed_lines, os.path.join(job_dir, filename), job_dir,
+                                              previous=previous, on_audio=on_audio)
+    finally:
+        close_stream(job_id)
+        finish_trace(job_id, trace)
+
+    job_queue.update(job_id, status="completed", message="Podcast generated successfully.", filename=filename,
+                     reused_lines=timeline["reused_lines"], synthesized_lines=timeline["synthesized_lines"])
+
+def process_batch(job_id: str, params: dict):
+    """Job queue handler for /api/batch; episodes finished before a restart are not redone."""
+    job_queue.update(job_id, status="processing", message="Generating batch...")
+
+    pending = [episode for episode in params["episodes"]
+               if (job_queue.get(episode["job_id"]) or {}).get("status") != "completed"]
+    for episode in pending:
+        job_queue.update(episode["job_id"], status="processing", message="Waiting for research...",
+                         started_at=time.time())
+
+    def on_update(index: int, fields: dict):
+        fields = dict(fields)
+        if fields.get("output_file"):
+            fields["filename"] = os.path.basename(fields.pop("output_file"))
+        if fields.get("status") in ("completed", "failed"):
+            fields["finished_at"] = time.time()
+        job_queue.update(pending[index]["job_id"], **fields)
+
+    trace = job_trace(job_id)
+    try:
+        with ExitStack() as stack:
+            episodes = []
+            for episode in pending:
+                job_dir = stack.enter_context(artifacts.job(episode["job_id"]))
+                episodes.append(dict(
+                    episode,
+                    output_file=os.path.join(job_dir, episode_filename(f"podcast_{episode['job_id']}", episode)),
+                    script_file=os.path.join(job_dir, "script.txt"),
+                ))
+            results = run_batch(episodes, persistent_tts=True, trace=trace, on_update=on_update,
+                                scratch_dir=artifacts.scratch_dir)
     except Exception as e:
-        print(f"Job {job_id} failed: {e}")
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["message"] = str(e)
+        for episode in pending:
+            if job_queue.get(episode["job_id"])["status"] not in ("completed", "failed"):
+                job_queue.update(episode["job_id"], status="failed", message=str(e), finished_at=time.time())
+        raise
+    finally:
+        finish_trace(job_id, trace)
+
+    failed = sum(1 for result in results if result["status"] == "failed")
+    total = len(params["episodes"])
+    job_queue.update(job_id, status="completed", message=f"{total - failed} of {total} episodes generated.")
+
+def mark_expired(job_id: str):
+    """Called when retention deletes a job's files, so its status says why the audio is gone."""
+    if job_queue.get(job_id) is not None:
+        job_queue.update(job_id, expired=True, message="Audio removed by the retention policy.")
+
+artifacts = ArtifactStore(on_remove=mark_expired)
+
+job_queue = JobQueue(
+    JOB_DB,
+    handlers={"generate": process_podcast_generation, "manual": process_manual_render, "batch": process_batch},
+    slots=GENERATION_SLOTS,
+)
 
 @app.get("/")
 def read_root():
@@ -67,64 +321,244 @@ def read_root():
 
 @app.get("/api/models")
 def list_models():
-    return {"models": get_ollama_models()}
+    snapshot = get_model_catalog().snapshot()
+    details = snapshot.pop("models")
+    snapshot["models"] = [m["name"] for m in details] or ["qwen2.5:0.5b"]
+    snapshot["details"] = details
+    return snapshot
+
+@app.get("/api/cache")
+def cache_stats():
+    stats = get_clip_cache().stats()
+    stats["research"] = {kind: get_research_cache(kind).stats() for kind in ("research", "scrape", "search")}
+    if TTS_BACKEND == "onnx":
+        stats["phonemes"] = get_phoneme_cache().stats()
+    return stats
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus-style metrics aggregated across jobs."""
+    counts = job_queue.counts()
+    depth = sum(n for (kind, status), n in counts.items() if status == "queued")
+    usage = artifacts.usage()
+    gauges = {
+        "podcast_queue_depth": ("Jobs waiting for a generation slot.", {(): depth}),
+        "podcast_jobs": ("Jobs in the queue database by kind and status.",
+                         {(("kind", kind), ("status", status)): n for (kind, status), n in counts.items()}),
+        "podcast_generation_slots": ("Jobs that may generate at the same time.", {(): GENERATION_SLOTS}),
+        "podcast_artifact_jobs": ("Job directories in the artifact store.", {(): usage["jobs"]}),
+        "podcast_artifact_bytes": ("Bytes in the artifact store.",
+                                   {(("area", "jobs"),): usage["bytes"], (("area", "scratch"),): usage["scratch_bytes"]}),
+    }
+    return PlainTextResponse(registry.render(gauges), media_type="text/plain; version=0.0.4")
 
 @app.post("/api/generate")
-async def generate_endpoint(req: GenerateRequest, background_tasks: BackgroundTasks):
+async def generate_endpoint(req: GenerateRequest):
+    params = episode_params(req)
     job_id = uuid.uuid4().hex
-    jobs[job_id] = {
-        "status": "queued", 
-        "message": "Job queued...",
-        "filename": None
-    }
-    
-    background_tasks.add_task(
-        process_podcast_generation,
-        job_id,
-        req.topic,
-        req.length,
-        req.host_name,
-        req.guest_name,
-        req.model
-    )
+    if req.stream:
+        streams[job_id] = AudioStream()
+
+    job_queue.submit("generate", params, priority=req.priority, job_id=job_id)
     
-    return {"jobId": job_id, "status": "queued"}
+    response = {"jobId": job_id, "status": "queued"}
+    if req.stream:
+        response["streamUrl"] = f"/api/stream/{job_id}"
+    return response
+
+@app.post("/api/batch")
+async def batch_endpoint(req: BatchRequest):
+    if not req.episodes:
+        raise HTTPException(status_code=422, detail="A batch needs at least one episode")
+    episodes = [dict(episode_params(spec), job_id=uuid.uuid4().hex) for spec in req.episodes]
+    batch_id = uuid.uuid4().hex
+    # Episode records are only tracked here; the batch job generates them all
+    for episode in episodes:
+        job_queue.submit("episode", episode, job_id=episode["job_id"], status="batched",
+                         message="Waiting for batch to start...", batch_id=batch_id, topic=episode["topic"])
+    job_queue.submit("batch", {"episodes": episodes}, priority=req.priority, job_id=batch_id,
+                     episode_ids=[episode["job_id"] for episode in episodes])
+    return {
+        "batchId": batch_id,
+        "status": "queued",
+        "episodes": [{"jobId": episode["job_id"], "topic": episode["topic"], "status": "batched"}
+                     for episode in episodes],
+    }
+
+@app.get("/api/batch/{batch_id}")
+def get_batch(batch_id: str):
+    batch = job_queue.get(batch_id)
+    if batch is None or "episode_ids" not in batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    episodes = []
+    for episode_id in batch.pop("episode_ids"):
+        episode = job_queue.get(episode_id) or {"id": episode_id, "status": "unknown"}
+        episodes.append({"jobId": episode_id, "topic": episode.get("topic"), "status": episode["status"],
+                         "message": episode.get("message"), "filename": episode.get("filename")})
+    batch["episodes"] = episodes
+    return batch
 
 @app.get("/api/status/{job_id}")
 def get_status(job_id: str):
-    if job_id not in jobs:
+    job = job_queue.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    return jobs[job_id]
+    return job
 
 @app.post("/api/manual")
 async def manual_endpoint(req: ManualRequest):
-    # Keep manual synchronous for now, as it sends pre-written text is fast
-    try:
-        filename = f"manual_{uuid.uuid4().hex[:8]}.wav"
-        engine = AudioEngine()
-        clips = []
-        parsed_lines = ScriptParser.parse(req.script)
-        
-        idx = 0
-        for speaker, text in parsed_lines:
-            try:
-                clip_path = engine.generate_clip(text, speaker, idx)
-                clips.append(clip_path)
-                idx += 1
-            except Exception as e:
-                print(f"Skipping line {idx}: {e}")
-
-        engine.mix_audio(clips, filename)
-        return {"filename": filename, "status": "success"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Rendering runs on the job queue's worker threads, never on the event loop
+    fmt = check_format(req.format)
+    if req.previous_job_id is not None and job_queue.get(req.previous_job_id) is None:
+        raise HTTPException(status_code=404, detail="Previous job not found")
+    job_id = uuid.uuid4().hex
+    if req.stream:
+        streams[job_id] = AudioStream()
+
+    params = {"script": req.script, "format": fmt, "previous_job_id": req.previous_job_id}
+    job_queue.submit("manual", params, priority=req.priority, job_id=job_id)
+
+    response = {"jobId": job_id, "status": "queued"}
+    if req.stream:
+        response["streamUrl"] = f"/api/stream/{job_id}"
+    return response
+
+def media_type(path: str) -> Optional[str]:
+    fmt = output_format(path)
+    return OUTPUT_FORMATS[fmt]["media_type"] if fmt else None
+
+class ETagCache:
+    """Strong ETags from file content hashes, recomputed only when a file's size or mtime changes."""
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # path -> ((mtime_ns, size), etag)
+        self.lock = threading.Lock()
+
+    def get(self, path: str) -> str:
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(path)
+                return entry[1]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        etag = f'"{digest.hexdigest()[:32]}"'
+        with self.lock:
+            self.entries[path] = (version, etag)
+            self.entries.move_to_end(path)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return etag
+
+etags = ETagCache()
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+# One "bytes=first-last" range; either end may be missing, but not both
+_BYTE_RANGE = re.compile(r"bytes=([0-9]*)-([0-9]*)", re.IGNORECASE)
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) for a single "bytes=" range, or None when the whole
+    file should be sent (malformed, invalid or multi-part ranges are ignored,
+    as RFC 9110 asks). Raises ValueError if a valid range can't be satisfied.
+    """
+    match = _BYTE_RANGE.fullmatch(header.strip())
+    if match is None or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None  # Invalid: ends before it starts
+    if start >= size:
+        raise ValueError("range starts past the end of the file")
+    return start, min(int(last), size - 1) if last else size - 1
+
+def read_range(path: str, start: int, end: int, chunk_size: int = 64 * 1024):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+class WholeFileResponse(FileResponse):
+    """A FileResponse that always sends the whole file: ranges are decided by parse_range() alone."""
+    async def __call__(self, scope, receive, send):
+        headers = [(name, value) for name, value in scope["headers"] if name.lower() != b"range"]
+        await super().__call__(dict(scope, headers=headers), receive, send)
+
+def audio_file_response(request: Request, path: str) -> Response:
+    """Serves an episode file with byte ranges, a content-hash ETag and long-lived caching."""
+    etag = etags.get(path)
+    headers = {"ETag": etag, "Cache-Control": AUDIO_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    size = os.path.getsize(path)
+    byte_range = None
+    # If-Range: only honour the range if the client's copy is still current
+    if request.headers.get("range") and request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(request.headers["range"], size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        return WholeFileResponse(path, media_type=media_type(path), headers=headers)
+
+    start, end = byte_range
+    headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+    return StreamingResponse(read_range(path, start, end), status_code=206,
+                             media_type=media_type(path), headers=headers)
+
+@app.get("/api/stream/{job_id}")
+def stream_audio(job_id: str, request: Request):
+    """Plays a job's episode while later lines are still being synthesized."""
+    stream = streams.get(job_id)
+    if stream is not None:
+        return StreamingResponse(iter(stream), media_type="audio/wav")
+    filename = (job_queue.get(job_id) or {}).get("filename")
+    path = filename and find_audio(filename)
+    if path:
+        return audio_file_response(request, path)
+    raise HTTPException(status_code=404, detail="No stream for this job")
+
+def find_audio(filename: str) -> Optional[str]:
+    """An episode's path in the artifact store, or in the working directory for older jobs.
+
+    Only job episode names (<kind>_<job_id>.<format>) are looked up in the working
+    directory, so other files there (the job database, CLI output) are never served.
+    """
+    filename = os.path.basename(filename)
+    if job_file_id(filename) is None or output_format(filename) is None:
+        return None
+    legacy = f"./{filename}"
+    return artifacts.locate(filename) or (legacy if os.path.isfile(legacy) else None)
 
 @app.get("/api/audio/{filename}")
-async def get_audio(filename: str):
-    file_path = f"./{filename}"
-    if os.path.exists(file_path):
-        return FileResponse(file_path)
-    return HTTPException(status_code=404, detail="File not found")
+def get_audio(filename: str, request: Request):
+    file_path = find_audio(filename)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return audio_file_response(request, file_path)
 
 if __name__ == "__main__":
     import uvicorn
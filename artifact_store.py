@@ -0,0 +1,180 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+# --- Configuration ---
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "./artifacts")
+# Finished jobs are deleted after ARTIFACT_MAX_AGE seconds, oldest first once
+# all jobs together exceed ARTIFACT_MAX_BYTES; 0 turns either limit off
+ARTIFACT_MAX_AGE = float(os.environ.get("ARTIFACT_MAX_AGE", 7 * 24 * 3600))
+ARTIFACT_MAX_BYTES = int(os.environ.get("ARTIFACT_MAX_BYTES", 10 * 1024 ** 3))
+ARTIFACT_SWEEP_INTERVAL = float(os.environ.get("ARTIFACT_SWEEP_INTERVAL", 600))
+# Scratch directories this old were left behind by a crashed process
+SCRATCH_MAX_AGE = 6 * 3600
+
+# Episode files are named <kind>_<job_id>.<ext>, which is how /api/audio finds their job
+_JOB_FILE = re.compile(r"^[a-z]+_(?P<job_id>[0-9a-f]{32})\.[a-z0-9]+$")
+
+
+def job_file_id(filename: str) -> Optional[str]:
+    """The job id in an episode file's name, or None if it isn't named like one."""
+    match = _JOB_FILE.match(filename)
+    return match.group("job_id") if match else None
+
+
+def _tree_size_and_mtime(path: str) -> Tuple[int, float]:
+    """Total bytes under a directory and the newest modification time in it."""
+    size, newest = 0, os.path.getmtime(path)
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            size += stat.st_size
+            newest = max(newest, stat.st_mtime)
+    return size, newest
+
+
+class ArtifactStore:
+    """
+    Owns everything jobs write to disk:
+
+        <root>/jobs/<job_id>/     episode audio and script, kept until swept
+        <root>/scratch/<tmp>/     per-job clips and mixer temp files, removed when done
+
+    sweep() deletes job directories past max_age, then the oldest ones until
+    the total is under max_bytes. Jobs that are still being written (see
+    job()) are never touched.
+    """
+    def __init__(self, root: str = ARTIFACT_DIR, max_age: float = ARTIFACT_MAX_AGE,
+                 max_bytes: int = ARTIFACT_MAX_BYTES, on_remove: Callable[[str], None] = None):
+        self.root = os.path.abspath(root)  # Jobs may change the working directory
+        self.jobs_dir = os.path.join(self.root, "jobs")
+        self.scratch_dir = os.path.join(self.root, "scratch")
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.on_remove = on_remove
+        self.active = {}  # job_id -> writers currently holding it
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # --- Layout ---
+    def job_dir(self, job_id: str) -> str:
+        path = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @contextmanager
+    def job(self, job_id: str) -> Iterator[str]:
+        """Yields the job's directory, protected from the sweeper until the block ends."""
+        with self.lock:
+            self.active[job_id] = self.active.get(job_id, 0) + 1
+        try:
+            yield self.job_dir(job_id)
+        finally:
+            with self.lock:
+                self.active[job_id] -= 1
+                if not self.active[job_id]:
+                    del self.active[job_id]
+
+    @contextmanager
+    def scratch(self, prefix: str = "tmp_") -> Iterator[str]:
+        """A private temporary directory under the scratch area, removed afterwards."""
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix=prefix, dir=self.scratch_dir) as path:
+            yield path
+
+    def locate(self, filename: str) -> Optional[str]:
+        """Path of an episode file from its name, or None if it isn't in the store."""
+        job_id = job_file_id(filename)
+        if job_id is None:
+            return None
+        path = os.path.join(self.jobs_dir, job_id, filename)
+        return path if os.path.isfile(path) else None
+
+    # --- Retention ---
+    def _jobs(self) -> List[Tuple[str, int, float]]:
+        """(job_id, bytes, last modified) for every job directory."""
+        jobs = []
+        if not os.path.isdir(self.jobs_dir):
+            return jobs
+        for job_id in os.listdir(self.jobs_dir):
+            path = os.path.join(self.jobs_dir, job_id)
+            if os.path.isdir(path):
+                size, mtime = _tree_size_and_mtime(path)
+                jobs.append((job_id, size, mtime))
+        return jobs
+
+    def usage(self) -> dict:
+        jobs = self._jobs()
+        scratch = _tree_size_and_mtime(self.scratch_dir)[0] if os.path.isdir(self.scratch_dir) else 0
+        return {"jobs": len(jobs), "bytes": sum(size for _, size, _ in jobs), "scratch_bytes": scratch,
+                "max_bytes": self.max_bytes, "max_age_s": self.max_age}
+
+    def _remove(self, job_id: str) -> bool:
+        with self.lock:
+            if job_id in self.active:
+                return False
+            shutil.rmtree(os.path.join(self.jobs_dir, job_id), ignore_errors=True)
+        if self.on_remove is not None:
+            self.on_remove(job_id)
+        return True
+
+    def sweep(self) -> dict:
+        """Applies the age and size limits; returns how many jobs and bytes were freed."""
+        now = time.time()
+        removed, freed = 0, 0
+        jobs = sorted(self._jobs(), key=lambda job: job[2])  # Oldest first
+        remaining = []
+        for job_id, size, mtime in jobs:
+            if self.max_age and now - mtime > self.max_age and self._remove(job_id):
+                removed, freed = removed + 1, freed + size
+            else:
+                remaining.append((job_id, size))
+
+        total = sum(size for _, size in remaining)
+        for job_id, size in remaining:
+            if not self.max_bytes or total <= self.max_bytes:
+                break
+            if self._remove(job_id):
+                removed, freed, total = removed + 1, freed + size, total - size
+
+        # Scratch directories only outlive their job if the process died mid-job
+        for name in os.listdir(self.scratch_dir) if os.path.isdir(self.scratch_dir) else []:
+            path = os.path.join(self.scratch_dir, name)
+            if os.path.isdir(path) and now - _tree_size_and_mtime(path)[1] > SCRATCH_MAX_AGE:
+                shutil.rmtree(path, ignore_errors=True)
+        return {"removed_jobs": removed, "freed_bytes": freed}
+
+    def start(self, interval: float = ARTIFACT_SWEEP_INTERVAL):
+        """Sweeps now and then every `interval` seconds on a background thread."""
+        self.stop_event.clear()
+
+        def run():
+            while True:
+                try:
+                    result = self.sweep()
+                    if result["removed_jobs"]:
+                        print(f"Artifact sweep removed {result['removed_jobs']} jobs "
+                              f"({result['freed_bytes'] / 1024 ** 2:.1f} MB)")
+                except Exception as e:
+                    print(f"Artifact sweep failed: {e}")
+                if self.stop_event.wait(interval):
+                    return
+
+        self.thread = threading.Thread(target=run, name="artifact-sweeper", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+
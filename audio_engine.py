@@ -0,0 +1,1104 @@
+import atexit
+import difflib
+import hashlib
+import json
+import os
+import queue
+import re
+import shutil
+import struct
+import subprocess
+import threading
+import time
+import unicodedata
+import wave
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import onnx_tts
+from metrics import Trace, maybe_span
+
+try:
+    import numpy as np
+except ImportError:  # Mixing falls back to ffmpeg
+    np = None
+
+# --- Configuration ---
+PIPER_BINARY = "./piper/piper"
+# "piper" runs the piper binary; "onnx" runs the voices in-process (see onnx_tts.py)
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "piper")
+VOICE_MODELS = {
+    "Host": "./en_US-lessac-medium.onnx",
+    "Guest": "./en_US-ryan-medium.onnx"
+}
+BACKGROUND_MUSIC = "./background_music.wav"
+VOICE_GAIN = 1.5
+MUSIC_GAIN = 0.2
+# "auto" mixes 16-bit WAVs in-process with NumPy and uses ffmpeg otherwise
+MIX_BACKEND = os.environ.get("MIX_BACKEND", "auto")
+# Episode file formats; everything but WAV is encoded by ffmpeg while mixing
+OUTPUT_FORMATS = {
+    "wav": {"extension": ".wav", "media_type": "audio/wav", "codec": None, "bitrate": None},
+    "opus": {"extension": ".opus", "media_type": "audio/ogg",
+             "codec": ["-c:a", "libopus", "-application", "voip"], "bitrate": "48k"},
+    "mp3": {"extension": ".mp3", "media_type": "audio/mpeg", "codec": ["-c:a", "libmp3lame"], "bitrate": "96k"},
+    "aac": {"extension": ".m4a", "media_type": "audio/mp4",
+            "codec": ["-c:a", "aac", "-movflags", "+faststart"], "bitrate": "96k"},
+}
+AUDIO_FORMAT = os.environ.get("AUDIO_FORMAT", "wav")  # Default for API requests that don't pick one
+AUDIO_BITRATE = os.environ.get("AUDIO_BITRATE")  # Overrides the bitrate of every compressed format
+# Number of lines synthesized concurrently (and Piper workers kept per voice)
+TTS_WORKERS = int(os.environ.get("TTS_WORKERS", min(4, os.cpu_count() or 1)))
+# On-disk cache of synthesized clips, shared across jobs
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", "./tts_cache")
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Lines longer than this are split at sentence and clause boundaries and the
+# chunks synthesized in parallel; 0 sends every line to Piper whole
+TTS_CHUNK_CHARS = int(os.environ.get("TTS_CHUNK_CHARS", 200))
+# Silence stitched between chunks that end a sentence or a clause
+TTS_SENTENCE_PAUSE_MS = int(os.environ.get("TTS_SENTENCE_PAUSE_MS", 200))
+TTS_CLAUSE_PAUSE_MS = int(os.environ.get("TTS_CLAUSE_PAUSE_MS", 80))
+
+# --- 1. Piper Workers and Clip Cache ---
+class PiperWorker:
+    """
+    A long-lived Piper process for a single voice model.
+    Lines are streamed over Piper's --json-input stdin mode so the ONNX model
+    is loaded once instead of once per line.
+    """
+    def __init__(self, model: str):
+        self.model = model
+        self.process = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [PIPER_BINARY, "--model", self.model, "--json-input", "--output_dir", "."],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def synthesize(self, text: str, output_file: str) -> str:
+        """Sends one line to the worker and waits for Piper to report the written file."""
+        with self.lock:
+            if not self.is_alive():
+                self.start()
+
+            request = json.dumps({"text": text, "output_file": os.path.abspath(output_file)})
+            try:
+                self.process.stdin.write(request + "\n")
+                self.process.stdin.flush()
+                # Piper prints the output path once the WAV is written
+                reply = self.process.stdout.readline()
+            except (BrokenPipeError, OSError) as e:
+                self._kill()
+                raise RuntimeError(f"Piper worker for {self.model} crashed: {e}")
+
+            if not reply:
+                self._kill()
+                raise RuntimeError(f"Piper worker for {self.model} exited unexpectedly")
+            return output_file
+
+    def _kill(self):
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def stop(self):
+        with self.lock:
+            if self.is_alive():
+                # Closing stdin lets Piper finish its current line and exit cleanly
+                self.process.stdin.close()
+                try:
+                    self.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    pass
+            self._kill()
+
+
+class PiperPool:
+    """
+    Keeps up to `workers_per_voice` PiperWorkers per voice in VOICE_MODELS,
+    started on first use and handed out to one caller at a time.
+    """
+    def __init__(self, voice_models: dict = None, workers_per_voice: int = 1):
+        self.voice_models = voice_models or VOICE_MODELS
+        self.workers_per_voice = max(1, workers_per_voice)
+        self.workers = {}  # model -> every worker started for it
+        self.idle = {}     # model -> workers not currently in use
+        self.cond = threading.Condition()
+
+    def _acquire(self, model: str) -> PiperWorker:
+        with self.cond:
+            while True:
+                idle = self.idle.setdefault(model, [])
+                if idle:
+                    return idle.pop()
+                started = self.workers.setdefault(model, [])
+                if len(started) < self.workers_per_voice:
+                    worker = PiperWorker(model)
+                    started.append(worker)
+                    return worker
+                self.cond.wait()
+
+    def warm(self):
+        """Starts one worker per voice so the first line doesn't wait for the model to load."""
+        if not os.path.exists(PIPER_BINARY):
+            return
+        for model in set(self.voice_models.values()):
+            if not os.path.exists(model):
+                continue
+            worker = self._acquire(model)
+            try:
+                with worker.lock:
+                    if not worker.is_alive():
+                        worker.start()
+            finally:
+                self._release(model, worker)
+
+    def _release(self, model: str, worker: PiperWorker):
+        with self.cond:
+            if worker in self.workers.get(model, []):
+                self.idle.setdefault(model, []).append(worker)
+            self.cond.notify()
+
+    def synthesize(self, text: str, speaker: str, output_file: str) -> str:
+        model = self.voice_models.get(speaker, self.voice_models["Host"])
+        worker = self._acquire(model)
+        try:
+            return worker.synthesize(text, output_file)
+        finally:
+            self._release(model, worker)
+
+    def close(self):
+        with self.cond:
+            workers = [w for started in self.workers.values() for w in started]
+            self.workers = {}
+            self.idle = {}
+            self.cond.notify_all()
+        for worker in workers:
+            worker.stop()
+
+
+_piper_pool = None
+_piper_pool_lock = threading.Lock()
+
+def get_piper_pool() -> PiperPool:
+    """Returns the process-wide PiperPool, shared across engines and jobs."""
+    global _piper_pool
+    with _piper_pool_lock:
+        if _piper_pool is None:
+            _piper_pool = PiperPool(workers_per_voice=TTS_WORKERS)
+            atexit.register(_piper_pool.close)
+        return _piper_pool
+
+
+_onnx_tts = None
+_onnx_tts_lock = threading.Lock()
+
+def get_onnx_tts() -> onnx_tts.OnnxTTS:
+    """Returns the process-wide in-process TTS, with the cores split between TTS_WORKERS calls."""
+    global _onnx_tts
+    with _onnx_tts_lock:
+        if _onnx_tts is None:
+            threads = onnx_tts.ONNX_THREADS or max(1, (os.cpu_count() or 1) // TTS_WORKERS)
+            _onnx_tts = onnx_tts.OnnxTTS(threads=threads)
+        return _onnx_tts
+
+
+class ClipCache:
+    """
+    Content-addressed on-disk cache of synthesized clips.
+    Keys hash the voice .onnx file, its inference parameters and the normalized
+    text; the least recently used clips are evicted once max_bytes is exceeded.
+    """
+    def __init__(self, cache_dir: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self._model_digests = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.total_bytes = sum(os.path.getsize(p) for p in self._entries())
+
+    def _entries(self) -> List[str]:
+        return [os.path.join(self.cache_dir, name)
+                for name in os.listdir(self.cache_dir) if name.endswith(".wav")]
+
+    def _model_digest(self, model: str) -> str:
+        """Hashes the voice model and its inference block, memoized per version of both files."""
+        stat = os.stat(model)
+        config_path = model + ".json"
+        try:
+            config = os.stat(config_path)
+            config_version = (config.st_size, config.st_mtime_ns)
+        except FileNotFoundError:
+            config_version = None
+        version = (model, stat.st_size, stat.st_mtime_ns, config_version)
+        with self.lock:
+            if version in self._model_digests:
+                return self._model_digests[version]
+
+        digest = hashlib.sha256()
+        with open(model, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        if config_version is not None:
+            with open(config_path) as f:
+                inference = json.load(f).get("inference", {})
+            digest.update(json.dumps(inference, sort_keys=True).encode())
+
+        with self.lock:
+            self._model_digests[version] = digest.hexdigest()
+        return digest.hexdigest()
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def key(self, model: str, text: str) -> str:
+        payload = f"{self._model_digest(model)}\n{self.normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def get(self, key: str, output_file: str) -> bool:
+        """Copies a cached clip to output_file. Returns False on a miss."""
+        path = self._path(key)
+        try:
+            _link_or_copy(path, output_file)
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return False
+        with self.lock:
+            self.hits += 1
+        return True
+
+    def put(self, key: str, clip: str):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        shutil.copyfile(clip, tmp_path)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.total_bytes += os.path.getsize(path)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drops least recently used clips until the cache fits in max_bytes."""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        self.total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries()),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def voice_name(speaker: str) -> str:
+    """The VOICE_MODELS voice a speaker is rendered with; unknown names use the Host's."""
+    return speaker if speaker in VOICE_MODELS else "Host"
+
+def _link_or_copy(src: str, dest: str):
+    """Hard-links src to dest, falling back to a copy across filesystems."""
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(src, dest)
+
+def _move_unshared(src: str, dest: str):
+    """
+    Moves a clip into a job directory. A clip that is a hard link (a clip cache
+    hit) is copied instead, so the cache touching its entry doesn't change the
+    job's files and evicting the entry frees its space.
+    """
+    if os.stat(src).st_nlink > 1:
+        shutil.copyfile(src, dest)
+        os.remove(src)
+    else:
+        shutil.move(src, dest)
+
+
+_clip_cache = None
+_clip_cache_lock = threading.Lock()
+
+def get_clip_cache() -> ClipCache:
+    """Returns the process-wide ClipCache, shared across engines and jobs."""
+    global _clip_cache
+    with _clip_cache_lock:
+        if _clip_cache is None:
+            _clip_cache = ClipCache()
+        return _clip_cache
+
+
+# Sentence ends (optionally followed by a closing quote or bracket) and clause breaks
+_SENTENCE_END = re.compile(r"(?:(?<=[.!?\u2026])|(?<=[.!?\u2026][\"')\]\u201d]))\s+")
+_CLAUSE_END = re.compile(r"(?<=[,;:\u2013\u2014])\s+")
+
+def _pack(words: List[str], max_chars: int) -> List[str]:
+    """Greedily joins words into runs of at most max_chars (a longer word stays on its own)."""
+    runs = []
+    for word in words:
+        if runs and len(runs[-1]) + 1 + len(word) <= max_chars:
+            runs[-1] += " " + word
+        else:
+            runs.append(word)
+    return runs
+
+def split_text(text: str, max_chars: int = None) -> List[Tuple[str, float]]:
+    """
+    Splits a line into chunks of at most max_chars (TTS_CHUNK_CHARS) for
+    parallel synthesis, as (chunk, seconds of silence after it). Lines are cut
+    at sentence ends first, then at clause breaks, then between words, and
+    short neighbours are packed back together.
+    """
+    max_chars = TTS_CHUNK_CHARS if max_chars is None else max_chars
+    text = " ".join(text.split())
+    if not max_chars or len(text) <= max_chars:
+        return [(text, 0.0)]
+
+    pieces = []
+    for sentence in _SENTENCE_END.split(text):
+        clauses = _CLAUSE_END.split(sentence) if len(sentence) > max_chars else [sentence]
+        for clause in clauses:
+            words = _pack(clause.split(" "), max_chars) if len(clause) > max_chars else [clause]
+            pieces += [(run, 0.0) for run in words]
+            pieces[-1] = (pieces[-1][0], TTS_CLAUSE_PAUSE_MS / 1000)
+        pieces[-1] = (pieces[-1][0], TTS_SENTENCE_PAUSE_MS / 1000)
+
+    chunks = []
+    for piece, pause in pieces:
+        if chunks and len(chunks[-1][0]) + 1 + len(piece) <= max_chars:
+            chunks[-1] = (chunks[-1][0] + " " + piece, pause)
+        else:
+            chunks.append((piece, pause))
+    chunks[-1] = (chunks[-1][0], 0.0)
+    return chunks
+
+def _stitch_wavs(parts: List[Tuple[str, float]], output_file: str):
+    """Joins (WAV, pause seconds) parts into one WAV with the given silence after each."""
+    out = None
+    try:
+        for path, pause in parts:
+            with wave.open(path, "rb") as w:
+                params = (w.getnchannels(), w.getsampwidth(), w.getframerate())
+                if out is None:
+                    out = wave.open(output_file, "wb")
+                    out.setnchannels(params[0])
+                    out.setsampwidth(params[1])
+                    out.setframerate(params[2])
+                    fmt = params
+                elif params != fmt:
+                    raise RuntimeError(f"Chunks of {output_file} have different formats: {params} != {fmt}")
+                out.writeframes(w.readframes(w.getnframes()))
+            if pause:
+                channels, width, rate = fmt
+                silence = b"\x80" if width == 1 else b"\0"  # 8-bit WAV is unsigned
+                out.writeframes(silence * (int(pause * rate) * channels * width))
+    finally:
+        if out is not None:
+            out.close()
+
+
+_chunk_executor = None
+_chunk_executor_lock = threading.Lock()
+
+def get_chunk_executor() -> ThreadPoolExecutor:
+    """Returns the process-wide pool that synthesizes the chunks of long lines."""
+    global _chunk_executor
+    with _chunk_executor_lock:
+        if _chunk_executor is None:
+            _chunk_executor = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts-chunk")
+        return _chunk_executor
+
+
+class AudioEngine:
+    def __init__(self, output_dir=".", persistent: bool = False, use_cache: bool = True,
+                 trace: Trace = None, backend: str = None):
+        self.output_dir = output_dir
+        self.trace = trace  # Receives a "synthesize" span per line and a "mix" span
+        # The onnx backend synthesizes in-process, batching lines per voice.
+        # Otherwise persistent mode streams lines to long-lived Piper workers
+        # instead of spawning a new process (and reloading the model) per line.
+        self.onnx = get_onnx_tts() if (backend or TTS_BACKEND) == "onnx" else None
+        self.pool = get_piper_pool() if persistent and self.onnx is None else None
+        self.cache = get_clip_cache() if use_cache else None
+        self.latencies = []  # Seconds spent synthesizing each line
+        self.chunk_latencies = []  # Seconds spent on each chunk of the lines that were split
+
+    def generate_clip(self, text: str, speaker: str, index: int) -> str:
+        """
+        Generates a single audio clip for a line of dialogue. Long lines are
+        split with split_text(), their chunks synthesized in parallel and
+        stitched back together with short pauses.
+        """
+        model = VOICE_MODELS.get(speaker, VOICE_MODELS["Host"]) # Default to Host
+        output_file = os.path.join(self.output_dir, f"line_{index:03d}.wav")
+        
+        # Ensure output dir exists
+        os.makedirs(self.output_dir, exist_ok=True)
+        
+        chunks = split_text(text)
+        start = time.perf_counter()
+        with maybe_span(self.trace, "synthesize", index=index, voice=voice_name(speaker), chars=len(text)) as span:
+            if len(chunks) == 1:
+                span["cached"] = self._synthesize(text, speaker, model, output_file)
+            else:
+                span["chunks"] = len(chunks)
+                span["cached"] = self._synthesize_chunks(chunks, speaker, model, index, output_file)
+            if self.trace is not None:
+                span["audio_s"] = _wav_seconds(output_file)
+        self.latencies.append(time.perf_counter() - start)
+        return output_file
+
+    def _synthesize(self, text: str, speaker: str, model: str, output_file: str) -> bool:
+        """Writes one clip from the cache or Piper; returns whether it came from the cache."""
+        cache_key = None
+        if self.cache is not None and os.path.exists(model):
+            cache_key = self.cache.key(model, text)
+            if self.cache.get(cache_key, output_file):
+                return True
+
+        if self.onnx is not None:
+            stats = {}
+            self._write_pcm(self.onnx.synthesize([text], model, stats)[0], model, output_file)
+            self._record_phonemes(stats)
+        elif self.pool is not None:
+            self.pool.synthesize(text, speaker, output_file)
+        else:
+            command = f'echo "{text}" | {PIPER_BINARY} --model {model} --output_file {output_file}'
+            subprocess.run(command, shell=True, check=True)
+
+        if cache_key is not None:
+            self.cache.put(cache_key, output_file)
+        return False
+
+    def _synthesize_chunk(self, text: str, speaker: str, model: str, index: int, chunk: int,
+                          output_file: str) -> bool:
+        start = time.perf_counter()
+        with maybe_span(self.trace, "synthesize_chunk", index=index, chunk=chunk, chars=len(text)) as span:
+            span["cached"] = self._synthesize(text, speaker, model, output_file)
+        self.chunk_latencies.append(time.perf_counter() - start)
+        return span["cached"]
+
+    def _synthesize_chunks(self, chunks: List[Tuple[str, float]], speaker: str, model: str,
+                           index: int, output_file: str) -> bool:
+        """Synthesizes a long line's chunks in parallel and stitches them into output_file."""
+        paths = [os.path.join(self.output_dir, f"line_{index:03d}_{n:02d}.wav") for n in range(len(chunks))]
+        # This thread renders the first chunk itself, so a line always makes
+        # progress even when every chunk worker is busy with other lines
+        executor = get_chunk_executor()
+        futures = [executor.submit(self._synthesize_chunk, text, speaker, model, index, n, paths[n])
+                   for n, (text, _) in enumerate(chunks) if n]
+        try:
+            cached = [self._synthesize_chunk(chunks[0][0], speaker, model, index, 0, paths[0])]
+            cached += [future.result() for future in futures]
+            _stitch_wavs([(path, pause) for path, (_, pause) in zip(paths, chunks)], output_file)
+        finally:
+            wait(futures)
+            for path in paths:
+                if os.path.exists(path): os.remove(path)
+        return all(cached)
+
+    def _render_line(self, index: int, speaker: str, text: str):
+        try:
+            return self.generate_clip(text, speaker, index)
+        except Exception as e:
+            print(f"Failed to generate line {index}: {e}")
+            return None
+
+    def synthesize_lines(self, lines: Iterable[Tuple[str, str]], workers: int = None,
+                         skip_failed: bool = True) -> List[Optional[str]]:
+        """
+        Synthesizes (speaker, text) lines concurrently on a bounded thread pool.
+        `lines` may be lazy; each line is submitted as soon as it arrives.
+        Returns clip paths in script order; lines that fail are skipped, or
+        left as None with skip_failed=False.
+        """
+        workers = max(1, workers or TTS_WORKERS)
+        if self.onnx is not None:
+            results = self._synthesize_batched(lines, workers)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self._render_line, idx, speaker, text)
+                           for idx, (speaker, text) in enumerate(lines)]
+                results = [future.result() for future in futures]
+        if not skip_failed:
+            return results
+        return [clip for clip in results if clip is not None]
+
+    def _write_pcm(self, samples, model: str, output_file: str):
+        with _open_wav_writer(output_file, self.onnx.voice(model).sample_rate) as out:
+            out.writeframes(samples.astype("<i2").tobytes())
+
+    def _record_phonemes(self, stats: dict):
+        """Adds a "phonemize" span with the phoneme cache hits of one onnx call."""
+        if self.trace is not None and stats:
+            self.trace.record("phonemize", stats.get("phonemize_s", 0.0),
+                              hits=stats.get("phoneme_hits", 0), misses=stats.get("phoneme_misses", 0),
+                              saved_s=round(stats.get("saved_s", 0.0), 4))
+
+    def _cached_clip(self, index: int, speaker: str, text: str, model: str) -> Optional[str]:
+        """The line's clip copied from the cache (traced like generate_clip), or None on a miss."""
+        if self.cache is None or not os.path.exists(model):
+            return None
+        output_file = os.path.join(self.output_dir, f"line_{index:03d}.wav")
+        with maybe_span(self.trace, "synthesize", index=index, voice=voice_name(speaker), chars=len(text)) as span:
+            span["cached"] = self.cache.get(self.cache.key(model, text), output_file)
+            if span["cached"] and self.trace is not None:
+                span["audio_s"] = _wav_seconds(output_file)
+        return output_file if span["cached"] else None
+
+    def _render_batch(self, model: str, batch: List[Tuple[int, str, str]]) -> List[Optional[str]]:
+        """onnx backend: synthesizes (index, speaker, text) lines of one voice in a single call."""
+        start = time.perf_counter()
+        stats = {}
+        try:
+            audio = self.onnx.synthesize([text for _, _, text in batch], model, stats)
+        except Exception as e:
+            print(f"Failed to generate lines {[index for index, _, _ in batch]}: {e}")
+            return [None] * len(batch)
+        # The call is shared, so each line is charged an equal part of it
+        per_line = (time.perf_counter() - start) / len(batch)
+        self._record_phonemes(stats)
+        rate = self.onnx.voice(model).sample_rate
+        clips = []
+        for (index, speaker, text), samples in zip(batch, audio):
+            output_file = os.path.join(self.output_dir, f"line_{index:03d}.wav")
+            self._write_pcm(samples, model, output_file)
+            if self.cache is not None:
+                self.cache.put(self.cache.key(model, text), output_file)
+            if self.trace is not None:
+                self.trace.record("synthesize", per_line, start=start, index=index, voice=voice_name(speaker),
+                                  chars=len(text), cached=False, batch=len(batch),
+                                  audio_s=round(len(samples) / rate, 3))
+            self.latencies.append(per_line)
+            clips.append(output_file)
+        return clips
+
+    def _synthesize_batched(self, lines: Iterable[Tuple[str, str]], workers: int) -> List[Optional[str]]:
+        """
+        onnx backend: uncached lines are grouped per voice and synthesized
+        ONNX_BATCH_SIZE lines per call, with up to `workers` calls at once.
+        A batch is submitted as soon as it fills, so lazy lines still overlap.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        results = {}
+        pending = {}  # model -> [(index, speaker, text)] not yet submitted
+        submitted = []  # (batch, future)
+        batch_size = max(1, self.onnx.batch_size)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for idx, (speaker, text) in enumerate(lines):
+                model = VOICE_MODELS.get(speaker, VOICE_MODELS["Host"])
+                clip = self._cached_clip(idx, speaker, text, model)
+                if clip is not None:
+                    results[idx] = clip
+                    continue
+                batch = pending.setdefault(model, [])
+                batch.append((idx, speaker, text))
+                if len(batch) >= batch_size:
+                    submitted.append((batch, executor.submit(self._render_batch, model, batch)))
+                    pending[model] = []
+            for model, batch in pending.items():
+                if batch:
+                    submitted.append((batch, executor.submit(self._render_batch, model, batch)))
+            for batch, future in submitted:
+                for (idx, _, _), clip in zip(batch, future.result()):
+                    results[idx] = clip
+        return [results[idx] for idx in range(len(results))]
+
+    def stream_audio(self, lines: Iterable[Tuple[str, str]], final_output: str = None,
+                     workers: int = None) -> Iterator[bytes]:
+        """
+        Synthesizes lines concurrently and yields a streaming WAV: the header,
+        then mixed 16-bit PCM for each line in script order as soon as it (and
+        every line before it) is ready. Also writes the full episode to
+        final_output when given. Failed lines are skipped.
+        """
+        workers = max(1, workers or TTS_WORKERS)
+        mixer = None
+        out = None
+        mix_s = 0.0
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # Lines may arrive lazily (e.g. from a streaming LLM), so submit
+                # them from a feeder thread and yield results as they complete
+                futures = queue.Queue()
+
+                def feed():
+                    try:
+                        for idx, (speaker, text) in enumerate(lines):
+                            futures.put(executor.submit(self._render_line, idx, speaker, text))
+                    except RuntimeError:
+                        pass  # The listener went away and the executor shut down
+                    finally:
+                        futures.put(None)
+
+                threading.Thread(target=feed, daemon=True).start()
+                for future in iter(futures.get, None):
+                    clip = future.result()
+                    if clip is None:
+                        continue
+                    start = time.perf_counter()
+                    if mixer is None:
+                        # The first clip fixes the stream's sample rate
+                        mixer = StreamMixer(_pcm16_params(clip)[1])
+                        out = EpisodeWriter(final_output, mixer.rate) if final_output else None
+                        header = wav_stream_header(mixer.rate)
+                        mix_s += time.perf_counter() - start
+                        yield header
+                        start = time.perf_counter()
+                    pcm = mixer.mix_clip(clip)
+                    os.remove(clip)
+                    if out is not None:
+                        out.write(pcm)
+                    mix_s += time.perf_counter() - start
+                    yield pcm
+            if mixer is None:
+                # Nothing could be synthesized: still produce a valid (empty) episode
+                if final_output:
+                    EpisodeWriter(final_output, 22050).close()
+                yield wav_stream_header(22050)
+        finally:
+            if out is not None:
+                out.close()
+            # Mixing is interleaved with synthesis here, so report its total
+            if self.trace is not None:
+                self.trace.record("mix", mix_s, streamed=True)
+
+    def mix_audio(self, clips: List[str], final_output: str, keep_clips: bool = False):
+        """
+        Concatenates clips and mixes with background music, encoding to the
+        format given by final_output's extension (see OUTPUT_FORMATS).
+        """
+        with maybe_span(self.trace, "mix", clips=len(clips), format=output_format(final_output)):
+            if MIX_BACKEND != "ffmpeg" and _can_mix_natively(clips, final_output):
+                _mix_numpy(clips, final_output)
+            else:
+                self._mix_ffmpeg(clips, final_output)
+
+        # Cleanup
+        if not keep_clips:
+            for clip in clips:
+                if os.path.exists(clip): os.remove(clip)
+
+    def render_revision(self, lines: Iterable[Tuple[str, str]], final_output: str, job_dir: str,
+                        previous: dict = None, workers: int = None,
+                        on_audio: Callable[[bytes], None] = None) -> dict:
+        """
+        Renders (speaker, text) lines to final_output, keeping each line's clip
+        in job_dir/lines/ and a per-line timeline in job_dir/timeline.json so a
+        later revision can build on it.
+
+        With `previous` (from load_timeline()), lines whose speaker, text and
+        voice are unchanged reuse the previous clips, so only changed or
+        inserted lines are synthesized, and the unchanged opening of a previous
+        WAV episode is copied instead of mixed again. on_audio, if given, gets
+        a streaming WAV header and then the PCM as stream_audio() yields it.
+        Returns the new timeline.
+        """
+        lines = list(lines)
+        models = [VOICE_MODELS.get(speaker, VOICE_MODELS["Host"]) for speaker, _ in lines]
+        lines_dir = os.path.join(job_dir, "lines")
+        os.makedirs(lines_dir, exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        old = previous["lines"] if previous else []
+        sources = reusable_lines(old, lines, models)  # New index -> previous index
+        clips: List[Optional[str]] = [None] * len(lines)
+        for j, i in list(sources.items()):
+            clips[j] = os.path.join(lines_dir, f"line_{j:03d}.wav")
+            try:
+                shutil.copyfile(os.path.join(previous["dir"], old[i]["clip"]), clips[j])
+            except FileNotFoundError:  # Synthesize it again
+                clips[j] = None
+                del sources[j]
+
+        native = MIX_BACKEND != "ffmpeg" and _can_mix_natively([c for c in clips if c], final_output)
+        prefix = _copyable_prefix(previous, sources, final_output) if native else 0
+        entries = [{"speaker": speaker, "text": text, "model": model, "clip": None, "start": None, "frames": None}
+                   for (speaker, text), model in zip(lines, models)]
+        for j in range(prefix):
+            entries[j].update(clip=os.path.relpath(clips[j], job_dir), start=old[j]["start"], frames=old[j]["frames"])
+
+        workers = max(1, workers or TTS_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {j: executor.submit(self._render_line, j, speaker, text)
+                       for j, (speaker, text) in enumerate(lines) if clips[j] is None}
+
+            def ready(j: int) -> Optional[str]:
+                if j in futures:
+                    clip = futures[j].result()
+                    if clip is not None:
+                        clips[j] = os.path.join(lines_dir, f"line_{j:03d}.wav")
+                        _move_unshared(clip, clips[j])
+                return clips[j]
+
+            if not native:
+                kept = [ready(j) for j in range(len(lines))]
+                for entry, clip in zip(entries, kept):
+                    if clip is not None:
+                        entry["clip"] = os.path.relpath(clip, job_dir)
+                self.mix_audio([clip for clip in kept if clip], final_output, keep_clips=True)
+                rate = frames = None
+            else:
+                # Lines are mixed in script order as soon as each is ready
+                mixer = out = None
+                mix_s = 0.0
+                try:
+                    for j in range(prefix, len(lines)):
+                        clip = ready(j)
+                        if clip is None:
+                            continue
+                        start = time.perf_counter()
+                        if mixer is None:
+                            mixer, out = self._open_revision(
+                                previous["rate"] if prefix else _pcm16_params(clip)[1],
+                                final_output, previous, prefix, on_audio)
+                        offset = mixer.offset
+                        pcm = mixer.mix_clip(clip)
+                        out.write(pcm)
+                        if on_audio is not None:
+                            on_audio(pcm)
+                        entries[j].update(clip=os.path.relpath(clip, job_dir), start=offset,
+                                          frames=mixer.offset - offset)
+                        mix_s += time.perf_counter() - start
+                    start = time.perf_counter()
+                    if mixer is None:
+                        # Nothing new to mix: the copied opening (or silence) is the episode
+                        mixer, out = self._open_revision(previous["rate"] if prefix else 22050,
+                                                         final_output, previous, prefix, on_audio)
+                    out.close()
+                    mix_s += time.perf_counter() - start
+                except BaseException:
+                    if out is not None:
+                        out.abort()
+                    raise
+                rate, frames = mixer.rate, mixer.offset
+                if self.trace is not None:
+                    self.trace.record("mix", mix_s, streamed=True, reused_lines=len(sources), copied_lines=prefix)
+
+        timeline = {
+            "version": TIMELINE_VERSION,
+            "output": os.path.basename(final_output),
+            "format": output_format(final_output),
+            "rate": rate,
+            "frames": frames,
+            "mix": _mix_signature(),
+            "reused_lines": len(sources),
+            "synthesized_lines": len(futures),
+            "copied_lines": prefix,
+            "lines": entries,
+        }
+        with open(os.path.join(job_dir, TIMELINE_FILE), "w") as f:
+            json.dump(timeline, f, indent=1)
+        return timeline
+
+    def _open_revision(self, rate: int, final_output: str, previous: Optional[dict], prefix: int, on_audio):
+        """Starts a revision's episode with the first `prefix` lines of the previous one, copied as they are."""
+        mixer = StreamMixer(rate)
+        out = EpisodeWriter(final_output, rate)
+        if on_audio is not None:
+            on_audio(wav_stream_header(rate))
+        if prefix:
+            # Up to where the first line after the prefix began; failed lines took no time
+            end = next((e["start"] for e in previous["lines"][prefix:] if e["start"] is not None),
+                       previous["frames"])
+            with wave.open(os.path.join(previous["dir"], previous["output"]), "rb") as w:
+                while mixer.offset < end:
+                    pcm = w.readframes(min(end - mixer.offset, 256 * 1024))
+                    if not pcm:
+                        break
+                    out.write(pcm)
+                    if on_audio is not None:
+                        on_audio(pcm)
+                    mixer.offset += len(pcm) // 2
+            mixer.offset = end  # The bed carries on from where the copy stops
+        return mixer, out
+
+    def _mix_ffmpeg(self, clips: List[str], final_output: str):
+        """Fallback mixer for inputs the NumPy backend can't read (non-PCM WAV, MP3, ...)."""
+        # 1. Concatenate dialogue
+        # Temp files live next to the clips so concurrent jobs never share them
+        os.makedirs(self.output_dir, exist_ok=True)
+        concat_file = os.path.join(self.output_dir, "concat_list.txt")
+        with open(concat_file, "w") as f:
+            for clip in clips:
+                f.write(f"file '{os.path.abspath(clip)}'\n")
+        
+        dialogue_wav = os.path.join(self.output_dir, "dialogue_temp.wav")
+        subprocess.run(f"ffmpeg -y -f concat -safe 0 -i {concat_file} -c copy {dialogue_wav}", shell=True, check=True)
+
+        # 2. Mix with background music (ducking)
+        # Lowers music volume to 10% when dialogue is present, keeps it at 20% otherwise
+        fmt = output_format(final_output)
+        encode = " ".join(_encoder_args(fmt)) + " " if fmt not in (None, "wav") else ""
+        if os.path.exists(BACKGROUND_MUSIC):
+            cmd = (
+                f"ffmpeg -y -i {dialogue_wav} -stream_loop -1 -i {BACKGROUND_MUSIC} "
+                f"-filter_complex \"[1:a]volume={MUSIC_GAIN}[bg];[0:a]volume={VOICE_GAIN}[fg];"
+                f"[fg][bg]amix=inputs=2:duration=first:dropout_transition=2[a]\" "
+                f"-map \"[a]\" {encode}{final_output}"
+            )
+        elif encode:
+            print("Background music not found, skipping mix.")
+            cmd = f"ffmpeg -y -i {dialogue_wav} {encode}{final_output}"
+        else:
+            print("Background music not found, skipping mix.")
+            cmd = f"cp {dialogue_wav} {final_output}"
+            
+        subprocess.run(cmd, shell=True, check=True)
+        
+        if os.path.exists(concat_file): os.remove(concat_file)
+        if os.path.exists(dialogue_wav): os.remove(dialogue_wav)
+
+
+# --- 2. Native Mixing ---
+def _pcm16_params(path: str):
+    """Returns (channels, rate) for a 16-bit PCM WAV, or None if it isn't one."""
+    if not path.lower().endswith(".wav"):
+        return None
+    try:
+        with wave.open(path, "rb") as w:
+            if w.getsampwidth() != 2:
+                return None
+            return w.getnchannels(), w.getframerate()
+    except (wave.Error, EOFError, OSError):
+        return None
+
+def _wav_seconds(path: str) -> Optional[float]:
+    """Duration of a WAV file from its header, or None if it can't be read."""
+    try:
+        with wave.open(path, "rb") as w:
+            return round(w.getnframes() / w.getframerate(), 3)
+    except (wave.Error, EOFError, OSError):
+        return None
+
+def _can_mix_natively(clips: List[str], final_output: str) -> bool:
+    if np is None or output_format(final_output) is None:
+        return False
+    inputs = list(clips)
+    if os.path.exists(BACKGROUND_MUSIC):
+        inputs.append(BACKGROUND_MUSIC)
+    return all(_pcm16_params(path) is not None for path in inputs)
+
+def _read_wav_mono(path: str, rate: int):
+    """Reads a 16-bit PCM WAV as float32 mono samples at the given rate."""
+    with wave.open(path, "rb") as w:
+        channels, src_rate = w.getnchannels(), w.getframerate()
+        samples = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if src_rate != rate and len(samples):
+        duration = len(samples) / src_rate
+        positions = np.arange(int(duration * rate)) * (src_rate / rate)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+def _to_pcm16(samples) -> bytes:
+    return (np.clip(samples, -1.0, 32767 / 32768) * 32768).astype("<i2").tobytes()
+
+class StreamMixer:
+    """
+    Incremental voice + background bed mixer producing 16-bit mono PCM.
+    Matches the ffmpeg graph: voice x1.5, music x0.2, averaged like amix does
+    for two inputs, with the bed looped across the whole episode.
+    """
+    def __init__(self, rate: int):
+        self.rate = rate
+        self.offset = 0
+        self.music = None
+        if not os.path.exists(BACKGROUND_MUSIC):
+            print("Background music not found, skipping mix.")
+        elif np is None or _pcm16_params(BACKGROUND_MUSIC) is None:
+            print("Background music can't be mixed natively, skipping mix.")
+        else:
+            music = _read_wav_mono(BACKGROUND_MUSIC, rate)
+            self.music = music if len(music) else None
+
+    def mix_clip(self, clip: str) -> bytes:
+        if np is None:
+            # Without NumPy the dialogue is passed through unmixed
+            with wave.open(clip, "rb") as w:
+                return w.readframes(w.getnframes())
+        voice = _read_wav_mono(clip, self.rate)
+        if self.music is not None:
+            bed = self.music[np.arange(self.offset, self.offset + len(voice)) % len(self.music)]
+            voice = (voice * VOICE_GAIN + bed * MUSIC_GAIN) / 2
+        self.offset += len(voice)
+        return _to_pcm16(voice)
+
+def _open_wav_writer(path: str, rate: int):
+    out = wave.open(path, "wb")
+    out.setnchannels(1)
+    out.setsampwidth(2)
+    out.setframerate(rate)
+    return out
+
+def output_format(path: str) -> Optional[str]:
+    """The OUTPUT_FORMATS name for a file's extension, or None if it isn't one of them."""
+    extension = os.path.splitext(path)[1].lower()
+    return next((name for name, spec in OUTPUT_FORMATS.items() if spec["extension"] == extension), None)
+
+def _encoder_args(fmt: str) -> List[str]:
+    spec = OUTPUT_FORMATS[fmt]
+    return spec["codec"] + ["-b:a", AUDIO_BITRATE or spec["bitrate"]]
+
+class EpisodeWriter:
+    """
+    Writes 16-bit mono PCM to an episode file as it is mixed: straight into a
+    WAV, or piped through an ffmpeg encoder for the compressed formats, so no
+    intermediate WAV is written and transcoded afterwards.
+    """
+    def __init__(self, path: str, rate: int):
+        self.path = path
+        self.fmt = output_format(path) or "wav"
+        self.wav = None
+        self.process = None
+        if self.fmt == "wav":
+            self.wav = _open_wav_writer(path, rate)
+        else:
+            self.process = subprocess.Popen(
+                ["ffmpeg", "-y", "-loglevel", "error", "-f", "s16le", "-ar", str(rate), "-ac", "1",
+                 "-i", "pipe:0", *_encoder_args(self.fmt), path],
+                stdin=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+
+    def write(self, pcm: bytes):
+        if self.wav is not None:
+            self.wav.writeframes(pcm)
+        else:
+            self.process.stdin.write(pcm)
+
+    def close(self):
+        if self.wav is not None:
+            self.wav.close()
+            return
+        self.process.stdin.close()
+        errors = self.process.stderr.read().decode(errors="replace")
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg could not encode {self.path}: {errors.strip()[:500]}")
+
+    def abort(self):
+        """Stops writing and removes the partial file."""
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+        elif self.wav is not None:
+            self.wav.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def wav_stream_header(rate: int) -> bytes:
+    """WAV header for a 16-bit mono stream of unknown length (sizes set to the maximum)."""
+    return (
+        b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, rate, rate * 2, 2, 16)
+        + b"data" + struct.pack("<I", 0xFFFFFFFF)
+    )
+
+def _mix_numpy(clips: List[str], final_output: str):
+    """Concatenates 16-bit PCM clips and mixes in the background bed in a single pass."""
+    mixer = StreamMixer(_pcm16_params(clips[0])[1] if clips else 22050)
+    with EpisodeWriter(final_output, mixer.rate) as out:
+        for clip in clips:
+            out.write(mixer.mix_clip(clip))
+
+
+# --- 3. Revisions ---
+TIMELINE_FILE = "timeline.json"
+TIMELINE_VERSION = 1
+
+def load_timeline(job_dir: str) -> Optional[dict]:
+    """The timeline render_revision() left in a job directory, or None if there is none."""
+    try:
+        with open(os.path.join(job_dir, TIMELINE_FILE)) as f:
+            timeline = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if timeline.get("version") != TIMELINE_VERSION:
+        return None
+    timeline["dir"] = job_dir
+    return timeline
+
+def reusable_lines(old: List[dict], lines: List[Tuple[str, str]], models: List[str]) -> Dict[int, int]:
+    """Maps each new line index to an identical previous line (speaker, text and voice) that has a clip."""
+    matcher = difflib.SequenceMatcher(
+        None, [(e["speaker"], e["text"], e["model"]) for e in old],
+        [(speaker, text, model) for (speaker, text), model in zip(lines, models)], autojunk=False)
+    sources = {}
+    for tag, i1, _, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            sources.update((j1 + k, i1 + k) for k in range(j2 - j1) if old[i1 + k]["clip"])
+    return sources
+
+def _copyable_prefix(previous: Optional[dict], sources: Dict[int, int], final_output: str) -> int:
+    """
+    How many leading lines, unchanged and in the same place, can be copied
+    from the previous episode: only between WAVs mixed with the same bed.
+    """
+    if not previous or output_format(final_output) != "wav" or previous.get("format") != "wav":
+        return 0
+    if previous.get("frames") is None or previous.get("mix") != _mix_signature():
+        return 0
+    if _pcm16_params(os.path.join(previous["dir"], previous["output"])) != (1, previous.get("rate")):
+        return 0
+    prefix = 0
+    while sources.get(prefix) == prefix:
+        prefix += 1
+    return prefix
+
+def _mix_signature() -> list:
+    """What the mixed audio depends on besides the clips: the bed file and the gains."""
+    try:
+        stat = os.stat(BACKGROUND_MUSIC)
+    except OSError:
+        return [None, VOICE_GAIN, MUSIC_GAIN]
+    return [os.path.abspath(BACKGROUND_MUSIC), stat.st_size, stat.st_mtime, VOICE_GAIN, MUSIC_GAIN]
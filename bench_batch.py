@@ -0,0 +1,148 @@
+"""
+Batch throughput benchmark: the same episodes generated one by one through
+run_podcast (as separate /api/generate jobs would be) and together through
+run_batch.
+
+Research, Ollama and Piper are replaced by local stubs with simulated costs:
+a fixed time per research run, a model load whenever the stub LLM switches
+models, and a fixed time per synthesized line. Both modes share a fresh
+research cache, so the one-by-one run also skips repeated topics once the
+first is cached.
+
+Usage:
+    python bench_batch.py --episodes 8 --topics 4 --models qwen2.5:0.5b llama3.2 --output batch_bench.json
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import podcast_agent
+from bench_pipeline import StubTTSEngine, fixed_script
+from podcast_agent import ResultCache, run_batch, run_podcast
+
+
+class StubOllama(BaseHTTPRequestHandler):
+    """Streams a fixed script like /api/generate, paying a load delay whenever the model changes."""
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            swap = self.server.loaded != body["model"]
+            self.server.loaded = body["model"]
+            self.server.swaps += swap
+        if swap:
+            time.sleep(self.server.load_s)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        script = self.server.script
+        for i in range(0, len(script), 16):
+            self.wfile.write(json.dumps({"response": script[i:i + 16], "done": False}).encode() + b"\n")
+        load_ns = int(self.server.load_s * 1e9) if swap else 1_000_000
+        self.wfile.write(json.dumps({"response": "", "done": True, "load_duration": load_ns}).encode() + b"\n")
+
+    def log_message(self, *args):
+        pass
+
+
+def timed_engine(line_s: float):
+    class TimedTTSEngine(StubTTSEngine):
+        """Silence like StubTTSEngine, after a fixed synthesis delay per line."""
+        def generate_clip(self, text: str, speaker: str, index: int) -> str:
+            time.sleep(line_s)
+            return super().generate_clip(text, speaker, index)
+    return TimedTTSEngine
+
+
+def make_episodes(count: int, topics: int, models: list) -> list:
+    """Topics repeat every `topics` episodes and models alternate, like a mixed daily backlog."""
+    return [{"topic": f"Daily topic {i % topics}", "model": models[i % len(models)], "length": "short"}
+            for i in range(count)]
+
+
+def bench(mode: str, episodes: list, args, server, work_dir: str) -> dict:
+    calls = []
+
+    def research(topic, model, usage=None):
+        calls.append(topic)
+        time.sleep(args.research_s)
+        return f"- Notes on {topic}"
+
+    cache = {kind: ResultCache(os.path.join(work_dir, mode, kind), ttl=3600)
+             for kind in ("research", "scrape", "search")}
+    server.loaded, server.swaps = None, 0
+    with mock.patch.object(podcast_agent, "_research_caches", cache), \
+            mock.patch.object(podcast_agent, "fast_research", research), \
+            mock.patch.object(podcast_agent, "AudioEngine", timed_engine(args.line_ms / 1000)):
+        start = time.perf_counter()
+        if mode == "sequential":
+            for n, episode in enumerate(episodes):
+                run_podcast(episode["topic"], os.path.join(work_dir, f"seq_{n}.wav"), episode["length"],
+                            allow_human_input=False, llm_model_name=episode["model"],
+                            tts_workers=args.tts_workers, research_mode="fast")
+        else:
+            batch = [dict(episode, research_mode="fast", output_file=os.path.join(work_dir, f"batch_{n}.wav"))
+                     for n, episode in enumerate(episodes)]
+            results = run_batch(batch, tts_workers=args.tts_workers)
+            assert all(r["status"] == "completed" for r in results), results
+        elapsed = time.perf_counter() - start
+
+    return {
+        "wall_s": round(elapsed, 3),
+        "episodes_per_min": round(len(episodes) / elapsed * 60, 2),
+        "research_runs": len(calls),
+        "model_loads": server.swaps,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch vs one-by-one generation benchmark")
+    parser.add_argument("--episodes", type=int, default=8)
+    parser.add_argument("--topics", type=int, default=4, help="Distinct topics among the episodes")
+    parser.add_argument("--models", nargs="+", default=["qwen2.5:0.5b", "llama3.2"])
+    parser.add_argument("--research-s", type=float, default=0.5, help="Simulated time per research run")
+    parser.add_argument("--load-s", type=float, default=1.0, help="Simulated model load on every model switch")
+    parser.add_argument("--line-ms", type=float, default=50, help="Simulated synthesis time per line")
+    parser.add_argument("--tts-workers", type=int, default=2)
+    parser.add_argument("--output", default="batch_bench.json")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+    server.daemon_threads = True
+    server.lock, server.script, server.load_s = threading.Lock(), fixed_script("short"), args.load_s
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    episodes = make_episodes(args.episodes, args.topics, args.models)
+    results = {}
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory(prefix="batch_bench_") as work_dir, \
+                mock.patch.object(podcast_agent, "OLLAMA_URL", f"http://127.0.0.1:{server.server_address[1]}"):
+            os.chdir(work_dir)  # run_podcast writes script.txt to the working directory
+            for mode in ("sequential", "batch"):
+                results[mode] = r = bench(mode, episodes, args, server, work_dir)
+                print(f"{mode:>10}: {r['wall_s']}s, {r['episodes_per_min']} episodes/min, "
+                      f"{r['research_runs']} research runs, {r['model_loads']} model loads")
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+    results["speedup"] = round(results["sequential"]["wall_s"] / results["batch"]["wall_s"], 2)
+    print(f"Batch speedup: {results['speedup']}x")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
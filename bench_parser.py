@@ -0,0 +1,152 @@
+"""
+Script parser micro-benchmark: the previous ScriptParser (kept here as the
+reference implementation) against the current one on a generated transcript,
+plus peak memory of parse_stream() reading the transcript in blocks, and
+VoiceResolver against the per-line voice matching it replaced.
+
+Usage:
+    python bench_parser.py --lines 200000 --output parser_bench.json
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+import tracemalloc
+from typing import Iterator, List, Optional, Tuple
+
+from script_parser import ScriptParser, VoiceResolver
+
+SPEAKERS = ["Host", "Guest", "**Host**", "## Guest", "Dany", "Dany Bhatti", "Alex says", "Scene 2",
+            "NAME", "Narrator", "Dr Who", "A very long speaker name here"]
+SEPARATORS = [": ", ":", " - ", " says: ", "says", " : ", "\t:\t"]
+WORDS = ["the", "model", "speech", "*really*", "fast", "\"quoted\"", "AI", "2024", "ok?", "well,", "#tag"]
+
+
+# --- Reference implementation (ScriptParser before precompiled patterns) ---
+def legacy_parse_line(line: str) -> Optional[Tuple[str, str]]:
+    line = line.strip()
+    if not line: return None
+    clean_line = line.replace('*', '').replace('#', '').strip()
+    match = re.match(r"^([A-Za-z0-9 ]+)\s*(?:says|:|-)\s*(.*)", clean_line, re.IGNORECASE)
+    if match:
+        speaker = match.group(1).strip()
+        text = match.group(2).strip()
+        if len(speaker) > 20 or "scene" in speaker.lower() or speaker.upper() in ["NAME", "TEXT", "SPEAKER"]:
+            return None
+        text = text.strip('" ')
+        if not text: return None
+        return (speaker, text)
+    return None
+
+def legacy_parse(script_content: str) -> List[Tuple[str, str]]:
+    parsed_lines = []
+    for line in script_content.split('\n'):
+        parsed = legacy_parse_line(line)
+        if parsed:
+            parsed_lines.append(parsed)
+    return parsed_lines
+
+def legacy_voice_for(speaker: str, idx: int, host_name: str, guest_name: str) -> str:
+    s_norm = speaker.lower().strip()
+    h_norm = host_name.lower().strip()
+    g_norm = guest_name.lower().strip()
+    if (s_norm in h_norm and len(s_norm) > 2) or (h_norm in s_norm):
+        return "Host"
+    elif (s_norm in g_norm and len(s_norm) > 2) or (g_norm in s_norm):
+        return "Guest"
+    return "Host" if idx % 2 == 0 else "Guest"
+
+
+def make_transcript(lines: int, seed: int = 0) -> str:
+    """LLM-style script: mostly dialogue in varied formats, with headers, blanks and stray markup."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(lines):
+        roll = rng.random()
+        if roll < 0.05:
+            out.append("")
+        elif roll < 0.1:
+            out.append(f"# Scene {rng.randint(1, 9)}")
+        else:
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 30)))
+            out.append(f"{rng.choice(SPEAKERS)}{rng.choice(SEPARATORS)}{text}")
+    return "\n".join(out)
+
+
+def blocks(text: str, size: int) -> Iterator[str]:
+    """Hands out text in fixed-size blocks, as read from a file."""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Script parser micro-benchmark")
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--block-kb", type=int, default=64, help="Block size for the streaming run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="parser_bench.json")
+    args = parser.parse_args()
+
+    script = make_transcript(args.lines)
+    size_mb = len(script.encode()) / 1024 ** 2
+    assert ScriptParser.parse(script) == legacy_parse(script)
+    parsed = ScriptParser.parse(script)
+
+    def count(lines):
+        return sum(1 for _ in lines)
+
+    results = {
+        "legacy_parse_s": timed(lambda: legacy_parse(script), args.repeat),
+        "parse_s": timed(lambda: ScriptParser.parse(script), args.repeat),
+        "parse_stream_s": timed(lambda: count(ScriptParser.parse_stream(blocks(script, args.block_kb * 1024))),
+                                args.repeat),
+        "legacy_voices_s": timed(lambda: [legacy_voice_for(s, i, "Dany Bhatti", "Guest")
+                                          for i, (s, _) in enumerate(parsed)], args.repeat),
+    }
+    resolver = VoiceResolver("Dany Bhatti", "Guest")  # Built once per script, as run_podcast does
+    results["resolver_s"] = timed(lambda: [resolver.resolve(s, i) for i, (s, _) in enumerate(parsed)], args.repeat)
+    results = {k: round(v, 4) for k, v in results.items()}
+    results["parse_speedup"] = round(results["legacy_parse_s"] / results["parse_s"], 2)
+    results["resolver_speedup"] = round(results["legacy_voices_s"] / results["resolver_s"], 2)
+    # The transcript itself is not traced: it was allocated before tracing started
+    results["parse_stream_peak_kb"] = round(peak_memory(
+        lambda: count(ScriptParser.parse_stream(blocks(script, args.block_kb * 1024)))) / 1024, 1)
+    results["legacy_parse_peak_kb"] = round(peak_memory(lambda: legacy_parse(script)) / 1024, 1)
+
+    print(f"{args.lines} lines ({size_mb:.1f} MB), {len(parsed)} dialogue lines")
+    for key, value in results.items():
+        print(f"{key:>22}: {value}")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "transcript_mb": round(size_mb, 2),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+End-to-end pipeline benchmark: research, script generation, parsing, per-line
+synthesis and mixing, timed stage by stage for short/medium/long episodes.
+
+The research step and Ollama are replaced by local stubs by default, so runs
+are reproducible offline. Results are written as JSON to compare releases.
+
+Usage:
+    python bench_pipeline.py --lengths short medium long --output bench_results.json
+    python bench_pipeline.py --research crew --ollama-url http://localhost:11434   # live backends
+    python bench_pipeline.py --tts stub   # no Piper binary needed
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows: the process peak RSS is not reported
+    resource = None
+
+import podcast_agent
+from audio_engine import AudioEngine, get_piper_pool
+from podcast_agent import LENGTH_MAP, script_prompt, stream_ollama
+from script_parser import ScriptParser
+
+TOPIC = "Open source speech synthesis"
+
+SEARCH_RESULTS = [
+    {"title": "Neural TTS runs on a laptop", "href": "https://example.com/tts",
+     "body": "Small neural voices now synthesize faster than real time on a single CPU core."},
+    {"title": "Local LLMs for scriptwriting", "href": "https://example.com/llm",
+     "body": "Half-billion parameter models can draft short dialogues without a GPU."},
+    {"title": "Podcasts built by agents", "href": "https://example.com/agents",
+     "body": "Hobbyists chain research agents, language models and TTS into automated shows."},
+]
+
+SENTENCES = [
+    "Welcome back to the show, it's great to have you here.",
+    "Thanks for having me. I've been looking forward to this.",
+    "Let's start with the basics. What got you interested in this topic?",
+    "Honestly, it started as a weekend project that got out of hand.",
+    "A lot of listeners have asked how small models can keep up with the big ones.",
+    "The short answer is that they can't, but they don't always need to.",
+]
+
+
+def fixed_script(length: str) -> str:
+    """Deterministic script with as many lines as LENGTH_MAP asks for."""
+    count = int(LENGTH_MAP[length].split()[1])
+    speakers = ["Host", "Guest"]
+    return "\n".join(f"{speakers[i % 2]}: {SENTENCES[i % len(SENTENCES)]}" for i in range(count))
+
+
+def stub_research(topic: str) -> str:
+    """Offline stand-in for the CrewAI research crew: canned search results, summarized."""
+    return "\n".join(f"- {r['title']}: {r['body']}" for r in SEARCH_RESULTS)
+
+
+class StubOllama(BaseHTTPRequestHandler):
+    """Streams the server's fixed script back a few characters at a time, like /api/generate."""
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        script = self.server.script
+        for i in range(0, len(script), 16):
+            self.wfile.write(json.dumps({"response": script[i:i + 16], "done": False}).encode() + b"\n")
+        self.wfile.write(json.dumps({"response": "", "done": True}).encode() + b"\n")
+
+    def log_message(self, *args):
+        pass
+
+
+class StubTTSEngine(AudioEngine):
+    """AudioEngine that writes silence (60 ms per character) instead of running Piper."""
+    def generate_clip(self, text: str, speaker: str, index: int) -> str:
+        start = time.perf_counter()
+        output_file = os.path.join(self.output_dir, f"line_{index:03d}.wav")
+        with wave.open(output_file, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(22050)
+            w.writeframes(b"\0\0" * int(22050 * 0.06 * len(text)))
+        self.latencies.append(time.perf_counter() - start)
+        return output_file
+
+
+def peak_rss_kb():
+    """Highest RSS of the whole process so far (not of any one stage)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS reports bytes
+
+
+def rss_kb():
+    """Current RSS, or None where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StageTimer:
+    """Records wall time, CPU time and RSS growth for each named stage."""
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        wall, cpu, rss = time.perf_counter(), time.process_time(), rss_kb()
+        try:
+            yield
+        finally:
+            after = rss_kb()
+            self.stages.setdefault(name, []).append({
+                "wall_s": time.perf_counter() - wall,
+                "cpu_s": time.process_time() - cpu,
+                # Concurrent stages (e.g. clips on worker threads) share the process, so this is approximate
+                "rss_growth_kb": after - rss if rss is not None and after is not None else None,
+                "process_peak_rss_kb": peak_rss_kb(),
+            })
+
+
+def summarize(samples):
+    """Totals for a stage run once; count, totals and percentiles for per-line stages."""
+    walls = sorted(s["wall_s"] for s in samples)
+    summary = {
+        "wall_s": round(sum(walls), 4),
+        "cpu_s": round(sum(s["cpu_s"] for s in samples), 4),
+        "rss_growth_kb": max((s["rss_growth_kb"] for s in samples if s["rss_growth_kb"] is not None), default=None),
+        "process_peak_rss_kb": samples[-1]["process_peak_rss_kb"],
+    }
+    if len(samples) > 1:
+        summary.update({
+            "count": len(walls),
+            "mean_ms": round(statistics.mean(walls) * 1000, 2),
+            "p50_ms": round(walls[len(walls) // 2] * 1000, 2),
+            "p95_ms": round(walls[min(len(walls) - 1, int(len(walls) * 0.95))] * 1000, 2),
+        })
+    return summary
+
+
+def run_once(length: str, args, ollama_url: str, server) -> dict:
+    timer = StageTimer()
+    script = fixed_script(length)
+    if server is not None:
+        server.script = script
+
+    with timer.stage("research"):
+        if args.research == "crew":
+            research = podcast_agent.research_topic(TOPIC, args.model)
+        else:
+            research = stub_research(TOPIC)
+
+    with timer.stage("script_generation"):
+        prompt = script_prompt(research, "Host", "Guest")
+        generated = "".join(stream_ollama(args.model, prompt, base_url=ollama_url))
+
+    with timer.stage("parse"):
+        lines = ScriptParser.parse(generated)
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        engine_cls = StubTTSEngine if args.tts == "stub" else AudioEngine
+        engine = engine_cls(output_dir=tmp, persistent=args.persistent_tts, use_cache=False)
+        clips = []
+        for idx, (speaker, text) in enumerate(lines):
+            with timer.stage("generate_clip"):
+                clips.append(engine.generate_clip(text, speaker, idx))
+
+        with timer.stage("mix_audio"):
+            engine.mix_audio(clips, os.path.join(tmp, "episode.wav"))
+
+    return {"lines": len(lines), "stages": {name: summarize(s) for name, s in timer.stages.items()}}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark")
+    parser.add_argument("--lengths", nargs="+", default=list(LENGTH_MAP), choices=list(LENGTH_MAP))
+    parser.add_argument("--runs", type=int, default=3, help="Runs per length; the median run is reported")
+    parser.add_argument("--research", default="stub", choices=["stub", "crew"], help="Stubbed or live CrewAI research")
+    parser.add_argument("--ollama-url", help="Use a live Ollama instead of the local stub server")
+    parser.add_argument("--model", default="qwen2.5:0.5b")
+    parser.add_argument("--tts", default="piper", choices=["piper", "stub"])
+    parser.add_argument("--persistent-tts", action="store_true", help="Use long-lived Piper workers")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    server = None
+    ollama_url = args.ollama_url
+    if ollama_url is None:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        ollama_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    results = {}
+    try:
+        for length in args.lengths:
+            runs = [run_once(length, args, ollama_url, server) for _ in range(max(1, args.runs))]
+            runs.sort(key=lambda r: sum(s["wall_s"] for s in r["stages"].values()))
+            results[length] = runs[len(runs) // 2]
+            total = sum(s["wall_s"] for s in results[length]["stages"].values())
+            print(f"{length:>6}: {results[length]['lines']} lines, {total:.2f}s")
+    finally:
+        if server is not None:
+            server.shutdown()
+        if args.persistent_tts:
+            get_piper_pool().close()
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {"research": args.research, "llm": "live" if args.ollama_url else "stub",
+                   "model": args.model, "tts": args.tts, "persistent_tts": args.persistent_tts,
+                   "runs": args.runs},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
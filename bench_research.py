@@ -0,0 +1,197 @@
+"""
+Compares the CrewAI research agent with the direct fast path on latency,
+LLM round trips and token count, using a stub Ollama and a stub search
+backend that points at a local fixture site, so runs are reproducible offline.
+
+The stub LLM charges simulated time per token (--prompt-ms, --gen-ms), so
+long agent prompts and extra round trips cost what they would on a small
+CPU model.
+
+Usage:
+    python bench_research.py --modes crew fast --runs 3 --output research_bench.json
+"""
+
+import argparse
+import json
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import podcast_agent
+from podcast_agent import PageFetcher, ResultCache
+
+TOPIC = "open source speech synthesis"
+
+ARTICLE = (
+    "<html><head><title>{title}</title></head><body>"
+    "<p>Open source speech synthesis keeps getting faster, and story {n} shows why.</p>"
+    "<p>Researchers released a speech synthesis model that runs in real time on a single CPU core.</p>"
+    "<p>The open source community has already ported the voices to a dozen languages.</p>"
+    "<p>Unrelated sidebar text about gardening and the weather this weekend.</p>"
+    "</body></html>"
+)
+
+
+def count_tokens(text: str) -> int:
+    """Rough token estimate used by the stub (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class StubOllama(BaseHTTPRequestHandler):
+    """
+    Answers /api/generate and /api/chat like Ollama. Agent prompts (which list
+    tools) get one search action and then a final answer; plain prompts get a
+    short news list. Every call is counted with its token estimate.
+    """
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path == "/api/chat":
+            prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []))
+        else:
+            prompt = (body.get("system") or "") + body.get("prompt", "")
+
+        if "Action Input" in prompt and "Observation:" not in prompt:
+            answer = (f"Thought: I should search for the latest news.\nAction: DuckDuckGoSearch\n"
+                      f"Action Input: {{\"query\": \"{TOPIC} news\"}}")
+        elif "Action Input" in prompt:
+            answer = ("Thought: I now know the final answer\nFinal Answer: - A new open source voice "
+                      "model runs in real time on one CPU core.\n- Voices were ported to a dozen languages.")
+        else:
+            answer = ("- A new open source voice model runs in real time on one CPU core.\n"
+                      "- Voices were ported to a dozen languages.")
+
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(answer)
+        with self.server.lock:
+            self.server.calls.append((prompt_tokens, completion_tokens))
+        time.sleep((prompt_tokens * self.server.prompt_ms + completion_tokens * self.server.gen_ms) / 1000)
+
+        final = {"model": body.get("model"), "done": True, "done_reason": "stop",
+                 "prompt_eval_count": prompt_tokens, "eval_count": completion_tokens}
+        if self.path == "/api/chat":
+            final["message"] = {"role": "assistant", "content": answer}
+        else:
+            final["response"] = answer
+        self.send_response(200)
+        if body.get("stream", True):
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            self.wfile.write(json.dumps(final).encode() + b"\n")
+        else:
+            payload = json.dumps(final).encode()
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureSite(BaseHTTPRequestHandler):
+    """Serves /article/N with a small fixed network delay."""
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        n = self.path.rsplit("/", 1)[-1]
+        payload = ARTICLE.format(title=f"Speech synthesis story {n}", n=n).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(handler, **attrs):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    for name, value in attrs.items():
+        setattr(server, name, value)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def bench_mode(mode: str, runs: int, llm, site_url: str, cache_dir: str) -> dict:
+    def search(query, max_results=3):
+        return [{"title": f"{query} {i}", "href": f"{site_url}/article/{i}", "body": f"{query} result {i}."}
+                for i in range(max_results)]
+
+    samples = []
+    for run in range(runs):
+        # Fresh caches every run so each one does the full amount of work
+        caches = {kind: ResultCache(f"{cache_dir}/{mode}-{run}/{kind}", ttl=0)
+                  for kind in ("research", "scrape", "search")}
+        fetcher = PageFetcher()
+        llm.calls.clear()
+        usage = {}
+        with mock.patch.object(podcast_agent, "_research_caches", caches), \
+                mock.patch.object(podcast_agent, "search_web", search), \
+                mock.patch.object(podcast_agent, "_page_fetcher", fetcher), \
+                mock.patch.object(podcast_agent, "OLLAMA_URL", llm.url):
+            start = time.perf_counter()
+            result = podcast_agent.research_topic(TOPIC, mode=mode, use_cache=False, usage=usage)
+            elapsed = time.perf_counter() - start
+        fetcher.close()
+        samples.append({
+            "wall_s": elapsed,
+            "llm_calls": len(llm.calls),
+            "prompt_tokens": sum(p for p, _ in llm.calls),
+            "completion_tokens": sum(c for _, c in llm.calls),
+            "failed": result == podcast_agent.RESEARCH_FALLBACK,
+        })
+
+    walls = sorted(s["wall_s"] for s in samples)
+    return {
+        "runs": runs,
+        "median_s": round(statistics.median(walls), 3),
+        "min_s": round(walls[0], 3),
+        "llm_calls": samples[-1]["llm_calls"],
+        "prompt_tokens": samples[-1]["prompt_tokens"],
+        "completion_tokens": samples[-1]["completion_tokens"],
+        "failures": sum(s["failed"] for s in samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CrewAI vs fast-path research benchmark")
+    parser.add_argument("--modes", nargs="+", default=["crew", "fast"], choices=["crew", "fast"])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--prompt-ms", type=float, default=0.5, help="Simulated prompt processing per token")
+    parser.add_argument("--gen-ms", type=float, default=20.0, help="Simulated generation per token")
+    parser.add_argument("--page-delay", type=float, default=0.1, help="Simulated network delay per page")
+    parser.add_argument("--output", default="research_bench.json")
+    args = parser.parse_args()
+
+    llm_server, llm_url = serve(StubOllama, lock=threading.Lock(), calls=[],
+                                prompt_ms=args.prompt_ms, gen_ms=args.gen_ms)
+    llm_server.url = llm_url
+    site, site_url = serve(FixtureSite, delay=args.page_delay)
+
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory(prefix="research_bench_") as cache_dir:
+            for mode in args.modes:
+                results[mode] = bench_mode(mode, max(1, args.runs), llm_server, site_url, cache_dir)
+                r = results[mode]
+                print(f"{mode:>5}: {r['median_s']}s median, {r['llm_calls']} LLM calls, "
+                      f"{r['prompt_tokens'] + r['completion_tokens']} tokens, {r['failures']} failed runs")
+    finally:
+        llm_server.shutdown()
+        site.shutdown()
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {"prompt_ms": args.prompt_ms, "gen_ms": args.gen_ms, "page_delay": args.page_delay},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
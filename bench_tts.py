@@ -0,0 +1,75 @@
+"""
+Measures per-line Piper latency with one process per line vs. persistent
+workers, then the throughput of a whole script through the piper binary vs.
+the in-process onnx backend (onnx_tts.py), with the clip cache off.
+
+Usage:
+    python bench_tts.py --lines 20 --workers 4
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+import onnx_tts
+from audio_engine import AudioEngine, _wav_seconds, get_piper_pool
+
+SAMPLE_LINES = [
+    ("Host", "Welcome back to the show, it's great to have you here."),
+    ("Guest", "Thanks for having me. I've been looking forward to this."),
+    ("Host", "Let's start with the basics. What got you interested in this topic?"),
+    ("Guest", "Honestly, it started as a weekend project that got out of hand."),
+]
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return {
+        "lines": len(ordered),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 1),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+        "total_s": round(sum(ordered), 2),
+    }
+
+def bench(persistent: bool, count: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = AudioEngine(output_dir=tmp, persistent=persistent)
+        for idx in range(count):
+            speaker, text = SAMPLE_LINES[idx % len(SAMPLE_LINES)]
+            engine.generate_clip(text, speaker, idx)
+        return summarize(engine.latencies)
+
+def bench_throughput(backend: str, count: int, workers: int):
+    lines = [SAMPLE_LINES[idx % len(SAMPLE_LINES)] for idx in range(count)]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = AudioEngine(output_dir=tmp, persistent=True, use_cache=False, backend=backend)
+        engine.synthesize_lines(lines[:2], workers=workers)  # Loads the voices outside the timing
+        start = time.perf_counter()
+        clips = engine.synthesize_lines(lines, workers=workers, skip_failed=False)
+        elapsed = time.perf_counter() - start
+        audio = sum(_wav_seconds(clip) or 0 for clip in clips if clip)
+    return {
+        "lines": count,
+        "failed": clips.count(None),
+        "wall_s": round(elapsed, 2),
+        "lines_per_s": round(count / elapsed, 2),
+        "rtf": round(elapsed / audio, 4) if audio else None,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Piper per-line latency and backend throughput benchmark")
+    parser.add_argument("--lines", type=int, default=20, help="Number of lines to synthesize per mode")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent lines (piper) or batches (onnx)")
+    args = parser.parse_args()
+
+    print(f"One process per line: {bench(False, args.lines)}")
+    # The first persistent line includes the one-off model load
+    print(f"Persistent workers:   {bench(True, args.lines)}")
+
+    print(f"Throughput, piper binary: {bench_throughput('piper', args.lines, args.workers)}")
+    if onnx_tts.is_available():
+        print(f"Throughput, onnx:         {bench_throughput('onnx', args.lines, args.workers)}")
+    else:
+        print("Throughput, onnx:         skipped (pip install onnxruntime)")
+    get_piper_pool().close()
@@ -68,10 +68,22 @@ def generate_podcast_from_script(script):
         return None
     
     result = response.json()
-    filename = result.get("filename")
+    job_id = result.get("jobId")
+    
+    print(f"Render job started with ID: {job_id}")
     
-    print(f"Podcast generated from script! Filename: {filename}")
-    return filename
+    # Manual renders are queued like agent jobs, so poll the same way
+    while True:
+        status_data = requests.get(f"{BASE_URL}/api/status/{job_id}").json()
+        
+        if status_data['status'] == 'completed':
+            print(f"Podcast generated from script! Filename: {status_data['filename']}")
+            return status_data['filename']
+        elif status_data['status'] == 'failed':
+            print(f"Script rendering failed: {status_data['message']}")
+            return None
+        
+        time.sleep(2)
 
 def download_audio_file(filename):
     """
@@ -0,0 +1,206 @@
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Columns stored directly; any other job field goes into the `extra` JSON blob
+COLUMNS = ["id", "kind", "params", "priority", "status", "message", "filename",
+           "created_at", "started_at", "finished_at", "extra"]
+
+DEFAULT_JOB_SECONDS = 120.0  # ETA guess until some jobs have finished
+
+
+class JobQueue:
+    """
+    Persistent priority queue for generation jobs, backed by SQLite.
+
+    A fixed number of worker threads ("slots") pull the highest-priority,
+    oldest queued job and run the handler registered for its kind. Jobs that
+    were mid-flight when the process stopped are queued again on start();
+    records without a handler (e.g. a batch's episodes) are marked failed
+    instead, and are left for the job that owns them to retry.
+    """
+    def __init__(self, db_path: str, handlers: Dict[str, Callable[[str, dict], None]], slots: int = 1):
+        self.db_path = db_path
+        self.handlers = handlers
+        self.slots = max(1, slots)
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.stopping = False
+        self.threads = []
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT, params TEXT, priority INTEGER, "
+                "status TEXT, message TEXT, filename TEXT, created_at REAL, "
+                "started_at REAL, finished_at REAL, extra TEXT)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created_at)")
+
+    # --- Lifecycle ---
+    def start(self):
+        with self.lock:
+            self.stopping = False
+            kinds = list(self.handlers)
+            with self.conn:
+                # Anything still "processing" was interrupted by a restart
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'queued', message = 'Requeued after restart', started_at = NULL "
+                    f"WHERE status = 'processing' AND kind IN ({', '.join('?' * len(kinds))})", kinds
+                )
+                # No worker can run the rest; their owner (requeued above) redoes them
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'failed', message = 'Interrupted by a restart', finished_at = ? "
+                    "WHERE status = 'processing'", (time.time(),)
+                )
+        for i in range(self.slots):
+            thread = threading.Thread(target=self._worker, name=f"job-slot-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        with self.wakeup:
+            self.stopping = True
+            self.wakeup.notify_all()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    # --- Public API ---
+    def submit(self, kind: str, params: dict, priority: int = 0, job_id: str = None,
+               status: str = "queued", message: str = "Job queued...", **fields) -> str:
+        """
+        Queues a job; higher priority runs first, ties run in submission order.
+        A job stored with any other status is only a record (e.g. an episode
+        run by its batch) and is never picked up by a worker.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        with self.wakeup:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO jobs (id, kind, params, priority, status, message, created_at, extra) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, json.dumps(params), priority, status, message, time.time(), json.dumps(fields)),
+                )
+            self.wakeup.notify()
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        """Sets job fields; unknown names are kept in the job's extra data."""
+        with self.lock:
+            self._update(job_id, fields)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Returns the public view of a job, with queue position and ETA while queued."""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = self._to_dict(row)
+            if job["status"] == "queued":
+                ahead = self._queued_ahead(row)
+                wait = self._estimate_wait(ahead)
+                job["queue_position"] = ahead + 1
+                job["estimated_start"] = round(time.time() + wait, 1)
+                job["estimated_wait_s"] = round(wait, 1)
+        for key in ("params", "created_at", "started_at", "finished_at", "kind", "priority"):
+            job.pop(key, None)
+        return job
+
+    def depth(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def counts(self) -> Dict[Tuple[str, str], int]:
+        """Number of jobs per (kind, status)."""
+        with self.lock:
+            rows = self.conn.execute("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status").fetchall()
+        return {(kind, status): count for kind, status, count in rows}
+
+    # --- Internals ---
+    def _to_dict(self, row: sqlite3.Row) -> dict:
+        job = json.loads(row["extra"] or "{}")
+        job.update({key: row[key] for key in COLUMNS if key != "extra"})
+        job["params"] = json.loads(row["params"] or "{}")
+        return job
+
+    def _update(self, job_id: str, fields: dict):
+        columns = {k: v for k, v in fields.items() if k in COLUMNS and k != "extra"}
+        extra = {k: v for k, v in fields.items() if k not in COLUMNS}
+        with self.conn:
+            if extra:
+                row = self.conn.execute("SELECT extra FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                merged = json.loads(row["extra"] or "{}") if row else {}
+                merged.update(extra)
+                columns["extra"] = json.dumps(merged)
+            if columns:
+                assignments = ", ".join(f"{name} = ?" for name in columns)
+                self.conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*columns.values(), job_id))
+
+    def _queued_ahead(self, row: sqlite3.Row) -> int:
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+            "(priority > ? OR (priority = ? AND created_at < ?))",
+            (row["priority"], row["priority"], row["created_at"]),
+        ).fetchone()[0]
+
+    def _average_duration(self) -> float:
+        rows = self.conn.execute(
+            "SELECT finished_at - started_at FROM jobs WHERE status = 'completed' "
+            "AND started_at IS NOT NULL ORDER BY finished_at DESC LIMIT 20"
+        ).fetchall()
+        durations = [r[0] for r in rows if r[0] is not None]
+        return sum(durations) / len(durations) if durations else DEFAULT_JOB_SECONDS
+
+    def _estimate_wait(self, ahead: int) -> float:
+        """Simulates the slots draining the jobs ahead, using the recent average job time."""
+        average = self._average_duration()
+        now = time.time()
+        running = self.conn.execute("SELECT started_at FROM jobs WHERE status = 'processing'").fetchall()
+        free_at: List[float] = [max(0.0, average - (now - r[0])) for r in running if r[0]]
+        free_at += [0.0] * max(0, self.slots - len(free_at))
+        heapq.heapify(free_at)
+        for _ in range(ahead):
+            heapq.heappush(free_at, heapq.heappop(free_at) + average)
+        return free_at[0]
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        row = self.conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at ASC LIMIT 1"
+        ).fetchone()
+        if row is not None:
+            self._update(row["id"], {"status": "processing", "message": "Starting generation...",
+                                     "started_at": time.time()})
+        return row
+
+    def _worker(self):
+        while True:
+            with self.wakeup:
+                row = None
+                while not self.stopping:
+                    row = self._claim()
+                    if row is not None:
+                        break
+                    self.wakeup.wait(timeout=1.0)
+                if self.stopping:
+                    return
+            self._run(row)
+
+    def _run(self, row: sqlite3.Row):
+        job_id = row["id"]
+        try:
+            self.handlers[row["kind"]](job_id, json.loads(row["params"]))
+        except Exception as e:
+            traceback.print_exc()
+            print(f"Job {job_id} failed: {e}")
+            self.update(job_id, status="failed", message=str(e), finished_at=time.time())
+        else:
+            self.update(job_id, finished_at=time.time())
@@ -1,4 +1,4 @@
-from podcast_agent import AudioEngine
+from audio_engine import AudioEngine
 import os
 
 def generate_ai_agents_episode():
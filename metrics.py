@@ -0,0 +1,176 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) for stage latency buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Synthesis seconds per second of audio; below 1 is faster than real time
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus style, one series per label set."""
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', _number(bound)),))} {count}")
+            lines.append(f"{self.name}_bucket{_labels(key + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(key)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(key)} {series[-1]}")
+        return lines
+
+
+def _labels(items) -> str:
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+def _escape(value) -> str:
+    """Escapes a label value as the Prometheus text format requires."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _number(value: float) -> str:
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Process-wide stage latency and synthesis speed histograms, aggregated across jobs."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stage_seconds = Histogram("podcast_stage_seconds", "Time spent in each pipeline stage.",
+                                       LATENCY_BUCKETS)
+        self.rtf = Histogram("podcast_synthesis_real_time_factor",
+                             "Synthesis time divided by audio duration for uncached lines.", RTF_BUCKETS)
+        self.first_token = Histogram("podcast_llm_first_token_seconds",
+                                     "Time to the first script token, by whether the model was loaded.",
+                                     LATENCY_BUCKETS)
+
+    def observe_span(self, span: dict):
+        with self.lock:
+            self.stage_seconds.observe(span["duration_s"], stage=span["name"])
+            if span.get("rtf") is not None:
+                self.rtf.observe(span["rtf"], voice=span.get("voice", "unknown"))
+            if span["name"] == "script_generation" and span.get("first_token_s") is not None:
+                self.first_token.observe(span["first_token_s"], model=span.get("model", "unknown"),
+                                         state="cold" if span.get("cold") else "warm")
+
+    def render(self, gauges: Dict[str, Tuple[str, Dict[Tuple, float]]] = None) -> str:
+        """Prometheus text exposition; gauges maps name -> (help, {labels: value})."""
+        lines = []
+        for name, (help, values) in (gauges or {}).items():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            lines += [f"{name}{_labels(key)} {_number(value)}" for key, value in values.items()]
+        with self.lock:
+            lines += self.stage_seconds.render() + self.rtf.render() + self.first_token.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class Trace:
+    """
+    Timed spans for one job. Each finished span is kept for the job record,
+    fed to the process-wide registry and passed to on_span if given.
+    """
+    def __init__(self, on_span: Optional[Callable[[dict], None]] = None):
+        self.on_span = on_span
+        self.started = time.perf_counter()
+        self.spans = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Times the block; the yielded dict can be filled with extra attributes."""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(name, time.perf_counter() - start, start=start, **attrs)
+
+    def record(self, name: str, duration_s: float, start: float = None, **attrs):
+        if start is None:
+            start = time.perf_counter() - duration_s
+        span = {"name": name, "start_s": round(start - self.started, 4), "duration_s": round(duration_s, 4)}
+        span.update(attrs)
+        if span.get("audio_s") and not span.get("cached"):
+            span["rtf"] = round(duration_s / span["audio_s"], 4)
+        with self.lock:
+            self.spans.append(span)
+        registry.observe_span(span)
+        if self.on_span is not None:
+            self.on_span(span)
+
+    def summary(self) -> dict:
+        """
+        Total seconds per stage, plus line counts, real-time factor and chunk
+        latencies for synthesis, phoneme cache hits, and the model state and
+        first-token latency for the script.
+        """
+        with self.lock:
+            spans = list(self.spans)
+        stages = {}
+        for span in spans:
+            stages[span["name"]] = round(stages.get(span["name"], 0.0) + span["duration_s"], 4)
+        clips = [s for s in spans if s["name"] == "synthesize"]
+        summary = {"stages": stages}
+        script = next((s for s in spans if s["name"] == "script_generation" and "first_token_s" in s), None)
+        if script is not None:
+            summary["llm"] = {"model": script.get("model"), "cold": script.get("cold"),
+                              "first_token_s": script["first_token_s"], "load_s": script.get("load_s")}
+        phonemes = [s for s in spans if s["name"] == "phonemize"]
+        if phonemes:
+            hits, misses = sum(s["hits"] for s in phonemes), sum(s["misses"] for s in phonemes)
+            summary["phonemes"] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+                "saved_s": round(sum(s["saved_s"] for s in phonemes), 4),
+            }
+        if clips:
+            audio = sum(s.get("audio_s") or 0 for s in clips)
+            fresh = [s for s in clips if not s.get("cached") and s.get("audio_s")]
+            summary["synthesis"] = {
+                "lines": len(clips),
+                "cached_lines": sum(1 for s in clips if s.get("cached")),
+                "characters": sum(s.get("chars", 0) for s in clips),
+                "audio_s": round(audio, 3),
+                "rtf": round(sum(s["duration_s"] for s in fresh) / sum(s["audio_s"] for s in fresh), 4)
+                       if fresh else None,
+            }
+            chunks = sorted(s["duration_s"] for s in spans if s["name"] == "synthesize_chunk")
+            if chunks:
+                summary["synthesis"]["chunks"] = {
+                    "split_lines": sum(1 for s in clips if s.get("chunks")),
+                    "count": len(chunks),
+                    "p50_s": chunks[len(chunks) // 2],
+                    "max_s": chunks[-1],
+                }
+        return summary
+
+
+@contextmanager
+def maybe_span(trace: Optional[Trace], name: str, **attrs):
+    """Trace.span when tracing is on, a plain attribute dict otherwise."""
+    if trace is None:
+        yield attrs
+    else:
+        with trace.span(name, **attrs) as span:
+            yield span
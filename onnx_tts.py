@@ -0,0 +1,417 @@
+"""
+In-process Piper voices: text is phonemized with espeak-ng, mapped to the
+voice's phoneme IDs and run through its .onnx model with ONNX Runtime on the
+CPU, so no piper process or per-line WAV round trip is involved.
+
+Needs `pip install onnxruntime`. Phonemes come from the piper-phonemize
+package when it is installed, otherwise from the libespeak-ng that ships in
+./piper (the same build the piper binary uses).
+"""
+
+import ctypes
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# --- Configuration ---
+ESPEAK_LIBRARY = "./piper/libespeak-ng.so.1"
+ESPEAK_DATA_DIR = "./piper"  # Directory holding espeak-ng-data
+# Sentences per inference call; similar lengths are batched together
+ONNX_BATCH_SIZE = int(os.environ.get("ONNX_BATCH_SIZE", 8))
+# Intra-op threads per inference call; 0 splits the cores between TTS_WORKERS
+ONNX_THREADS = int(os.environ.get("ONNX_THREADS", 0))
+# Silence between the sentences of a line, as piper's --sentence_silence default
+SENTENCE_SILENCE_S = 0.2
+# Phrase -> phonemes cache: the most recent entries in memory, the rest in SQLite
+PHONEME_CACHE_PATH = os.environ.get("PHONEME_CACHE_PATH", "./tts_cache/phonemes.sqlite3")
+PHONEME_CACHE_MEMORY_ENTRIES = int(os.environ.get("PHONEME_CACHE_MEMORY_ENTRIES", 10000))
+PHONEME_CACHE_MAX_ENTRIES = int(os.environ.get("PHONEME_CACHE_MAX_ENTRIES", 200000))
+
+BOS, EOS, PAD = "^", "$", "_"
+
+# Clause terminators reported by espeak_TextToPhonemesWithTerminator
+_CLAUSE_TYPE_SENTENCE = 0x00080000
+_PUNCTUATION = {
+    40 | 0x00000000 | _CLAUSE_TYPE_SENTENCE: ["."],
+    40 | 0x00002000 | _CLAUSE_TYPE_SENTENCE: ["?"],
+    45 | 0x00003000 | _CLAUSE_TYPE_SENTENCE: ["!"],
+    20 | 0x00001000 | 0x00040000: [",", " "],
+    30 | 0x00000000 | 0x00040000: [":", " "],
+    30 | 0x00001000 | 0x00040000: [";", " "],
+}
+
+# espeak-ng phonemizes every clause on its own, so text split after clause
+# punctuation gives the same phonemes. A full stop only ends a clause before a
+# capital or a digit ("5 p.m. when" and "etc. and" are one clause), and
+# ellipses are left alone because espeak-ng reads them differently mid-sentence
+_PHRASE_END = re.compile(r"(?<=[^.][.!?])\s+(?=[A-Z0-9])|(?<=[,;:])\s+")
+
+
+def is_available() -> bool:
+    """Whether onnxruntime and a phonemizer can be loaded."""
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        return False
+    return np is not None and (_piper_phonemize() is not None or os.path.exists(ESPEAK_LIBRARY))
+
+
+def _piper_phonemize():
+    try:
+        from piper_phonemize import phonemize_espeak
+    except ImportError:
+        return None
+    return phonemize_espeak
+
+
+class EspeakPhonemizer:
+    """
+    Text to IPA phonemes, one list of codepoints per sentence, the way
+    piper-phonemize does it: clause punctuation is kept as phonemes and
+    espeak-ng's sentence terminators split the sentences.
+    """
+    def __init__(self, library: str = ESPEAK_LIBRARY, data_dir: str = ESPEAK_DATA_DIR,
+                 cache: "PhonemeCache" = None):
+        self.library = library
+        self.data_dir = data_dir
+        self.cache = cache
+        self.lib = None
+        self.voice = None
+        self.lock = threading.Lock()  # espeak-ng keeps global state
+        self.phonemize_espeak = _piper_phonemize()
+
+    def _load(self):
+        lib = ctypes.CDLL(os.path.abspath(self.library))
+        lib.espeak_Initialize.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+        lib.espeak_SetVoiceByName.argtypes = [ctypes.c_char_p]
+        lib.espeak_TextToPhonemesWithTerminator.argtypes = [
+            ctypes.POINTER(ctypes.c_void_p), ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
+        lib.espeak_TextToPhonemesWithTerminator.restype = ctypes.c_char_p
+        # AUDIO_OUTPUT_SYNCHRONOUS: phonemes only, nothing is played
+        if lib.espeak_Initialize(2, 0, os.path.abspath(self.data_dir).encode(), 0) < 0:
+            raise RuntimeError(f"espeak-ng could not load its data from {self.data_dir}")
+        self.lib = lib
+
+    def phonemize(self, text: str, voice: str, stats: dict = None) -> List[List[str]]:
+        """
+        Phonemes per sentence. With a cache, the text is looked up phrase by
+        phrase, so names and stock phrases are only phonemized once. `stats`
+        receives phoneme_hits, phoneme_misses, phonemize_s and saved_s.
+        """
+        if self.cache is None:
+            return self._phonemize(text, voice)
+
+        sentences, is_open = [], False
+        for phrase in _PHRASE_END.split(" ".join(text.split())):
+            if not phrase:
+                continue
+            phonemes = self.cache.get(voice, phrase, stats)
+            if phonemes is None:
+                start = time.perf_counter()
+                phonemes = self._phonemize(phrase, voice)
+                self.cache.put(voice, phrase, phonemes, time.perf_counter() - start, stats)
+            if not phonemes:
+                continue
+            if is_open:
+                sentences[-1] = sentences[-1] + phonemes[0]
+                sentences += phonemes[1:]
+            else:
+                sentences += phonemes
+            # A phrase ending in a comma (or nothing) continues the same sentence
+            is_open = not sentences[-1] or sentences[-1][-1] not in ".?!"
+        return sentences
+
+    def _phonemize(self, text: str, voice: str) -> List[List[str]]:
+        if self.phonemize_espeak is not None:
+            return self.phonemize_espeak(text, voice)
+
+        with self.lock:
+            if self.lib is None:
+                self._load()
+            if voice != self.voice:
+                if self.lib.espeak_SetVoiceByName(voice.encode()) != 0:
+                    raise RuntimeError(f"espeak-ng has no voice {voice}")
+                self.voice = voice
+
+            buffer = ctypes.create_string_buffer(text.encode("utf-8"))
+            pointer = ctypes.c_void_p(ctypes.addressof(buffer))
+            terminator = ctypes.c_int(0)
+            sentences, current = [], []
+            while pointer.value:
+                # espeakCHARS_UTF8, espeakPHONEMES_IPA; advances pointer by one clause
+                clause = self.lib.espeak_TextToPhonemesWithTerminator(
+                    ctypes.byref(pointer), 1, 0x02, ctypes.byref(terminator)) or b""
+                current += list(unicodedata.normalize("NFD", clause.decode("utf-8")))
+                current += _PUNCTUATION.get(terminator.value & 0x000FFFFF, [])
+                if terminator.value & _CLAUSE_TYPE_SENTENCE:
+                    sentences.append(current)
+                    current = []
+            if current:
+                sentences.append(current)
+        return sentences
+
+
+class PhonemeCache:
+    """
+    Phrase -> phonemes cache shared by every voice. Recent phrases are kept in
+    an in-memory LRU of memory_entries; all of them persist in a SQLite file,
+    trimmed to the max_entries most recently used.
+    """
+    def __init__(self, path: str = PHONEME_CACHE_PATH, memory_entries: int = PHONEME_CACHE_MEMORY_ENTRIES,
+                 max_entries: int = PHONEME_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.memory = OrderedDict()  # (voice, phrase) -> phonemes, least recently used first
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+        # Measured cost of phonemizing, to estimate what each hit saved
+        self.miss_s = 0.0
+        self.miss_chars = 0
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS phonemes (voice TEXT, phrase TEXT, phonemes TEXT, "
+                        "used_at REAL, PRIMARY KEY (voice, phrase))")
+        self.db.execute("CREATE INDEX IF NOT EXISTS phonemes_used_at ON phonemes (used_at)")
+        self.entries = self.db.execute("SELECT COUNT(*) FROM phonemes").fetchone()[0]
+
+    def _remember(self, key, phonemes):
+        self.memory[key] = phonemes
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, voice: str, phrase: str, stats: dict = None) -> Optional[List[List[str]]]:
+        key = (voice, phrase)
+        with self.lock:
+            phonemes = self.memory.get(key)
+            if phonemes is not None:
+                self.memory.move_to_end(key)
+            else:
+                row = self.db.execute("SELECT phonemes FROM phonemes WHERE voice = ? AND phrase = ?", key).fetchone()
+                if row is not None:
+                    phonemes = json.loads(row[0])
+                    # Disk hits are marked as used when they move into memory
+                    self.db.execute("UPDATE phonemes SET used_at = ? WHERE voice = ? AND phrase = ?",
+                                    (time.time(), *key))
+                    self._remember(key, phonemes)
+                    self.disk_hits += 1
+            if phonemes is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            saved = len(phrase) * self.miss_s / self.miss_chars if self.miss_chars else 0.0
+            self.saved_s += saved
+        if stats is not None:
+            stats["phoneme_hits"] = stats.get("phoneme_hits", 0) + 1
+            stats["saved_s"] = stats.get("saved_s", 0.0) + saved
+        return phonemes
+
+    def put(self, voice: str, phrase: str, phonemes: List[List[str]], seconds: float, stats: dict = None):
+        """Stores a phrase phonemized on a miss that took `seconds`."""
+        with self.lock:
+            self.miss_s += seconds
+            self.miss_chars += len(phrase)
+            self._remember((voice, phrase), phonemes)
+            # Two jobs missing the same phrase at once store it once
+            self.entries += self.db.execute(
+                "INSERT OR IGNORE INTO phonemes VALUES (?, ?, ?, ?)",
+                (voice, phrase, json.dumps(phonemes, ensure_ascii=False), time.time())).rowcount
+            if self.max_entries and self.entries > self.max_entries:
+                self._evict()
+        if stats is not None:
+            stats["phoneme_misses"] = stats.get("phoneme_misses", 0) + 1
+            stats["phonemize_s"] = stats.get("phonemize_s", 0.0) + seconds
+
+    def _evict(self):
+        """Drops the least recently used tenth of max_entries, so eviction runs rarely."""
+        keep = self.max_entries - max(1, self.max_entries // 10)
+        self.db.execute("DELETE FROM phonemes WHERE rowid IN (SELECT rowid FROM phonemes "
+                        "ORDER BY used_at LIMIT ?)", (self.entries - keep,))
+        self.entries = self.db.execute("SELECT COUNT(*) FROM phonemes").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "saved_s": round(self.saved_s, 3),
+                "memory_entries": len(self.memory),
+                "entries": self.entries,
+                "max_entries": self.max_entries,
+            }
+
+
+_phoneme_cache = None
+_phoneme_cache_lock = threading.Lock()
+
+def get_phoneme_cache() -> PhonemeCache:
+    """Returns the process-wide PhonemeCache, shared across voices and jobs."""
+    global _phoneme_cache
+    with _phoneme_cache_lock:
+        if _phoneme_cache is None:
+            _phoneme_cache = PhonemeCache()
+        return _phoneme_cache
+
+
+_phonemizer = None
+_phonemizer_lock = threading.Lock()
+
+def get_phonemizer() -> EspeakPhonemizer:
+    """Returns the process-wide phonemizer, shared by every voice."""
+    global _phonemizer
+    with _phonemizer_lock:
+        if _phonemizer is None:
+            _phonemizer = EspeakPhonemizer(cache=get_phoneme_cache())
+        return _phonemizer
+
+
+def _open_session(model: str, threads: int):
+    try:
+        import onnxruntime
+    except ImportError:
+        raise RuntimeError("The onnx TTS backend needs onnxruntime (pip install onnxruntime)")
+    options = onnxruntime.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    return onnxruntime.InferenceSession(model, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def _to_int16(audio) -> "np.ndarray":
+    """Peak-normalizes one sentence to 16-bit PCM, as piper does."""
+    peak = max(0.01, float(np.max(np.abs(audio)))) if len(audio) else 1.0
+    return np.clip(audio * (32767 / peak), -32767, 32767).astype(np.int16)
+
+
+def _trim_padding(audio, sample_rate: int, floor: float = 0.01, window_s: float = 0.01,
+                  hold_s: float = 0.05) -> "np.ndarray":
+    """
+    Drops the silent tail a shorter sentence gets from being padded in a batch.
+    Audio is kept up to the last 10 ms window whose RMS is above `floor` times
+    the clip's RMS, plus `hold_s`, so quiet word endings (fricatives, breath)
+    fade out as the model made them instead of being cut at an amplitude.
+    """
+    window = max(1, int(sample_rate * window_s))
+    frames = len(audio) // window
+    if not frames:
+        return audio
+    power = np.square(audio[:frames * window], dtype=np.float64).reshape(frames, window).mean(axis=1)
+    level = float(power.mean())
+    active = np.flatnonzero(power > level * floor ** 2) if level > 0 else []
+    if not len(active):
+        return audio[:0]
+    return audio[:(int(active[-1]) + 1) * window + int(sample_rate * hold_s)]
+
+
+class OnnxVoice:
+    """One Piper voice (the .onnx model and its .onnx.json config) run with ONNX Runtime."""
+    def __init__(self, model: str, threads: int = ONNX_THREADS, session=None, phonemizer=None):
+        if np is None:
+            raise RuntimeError("The onnx TTS backend needs numpy")
+        with open(model + ".json") as f:
+            config = json.load(f)
+        inference = config.get("inference", {})
+        self.model = model
+        self.sample_rate = config["audio"]["sample_rate"]
+        self.espeak_voice = config.get("espeak", {}).get("voice", "en-us")
+        self.id_map: Dict[str, List[int]] = config["phoneme_id_map"]
+        self.scales = np.array([inference.get("noise_scale", 0.667), inference.get("length_scale", 1.0),
+                                inference.get("noise_w", 0.8)], dtype=np.float32)
+        self.multi_speaker = config.get("num_speakers", 1) > 1
+        self.phonemizer = phonemizer or get_phonemizer()
+        self.session = session if session is not None else _open_session(model, threads)
+
+    def phoneme_ids(self, phonemes: Sequence[str]) -> List[int]:
+        """BOS and each known phoneme followed by PAD, then EOS, as the piper binary does."""
+        ids = self.id_map[BOS] + self.id_map[PAD]
+        for phoneme in phonemes:
+            if phoneme in self.id_map:
+                ids += self.id_map[phoneme] + self.id_map[PAD]
+        return ids + self.id_map[EOS]
+
+    def infer(self, batch: List[List[int]]) -> List["np.ndarray"]:
+        """Runs padded phoneme ID sequences through the model in one call; float audio per sequence."""
+        lengths = np.array([len(ids) for ids in batch], dtype=np.int64)
+        ids = np.full((len(batch), int(lengths.max())), self.id_map[PAD][0], dtype=np.int64)
+        for row, sequence in enumerate(batch):
+            ids[row, :len(sequence)] = sequence
+        inputs = {"input": ids, "input_lengths": lengths, "scales": self.scales}
+        if self.multi_speaker:
+            inputs["sid"] = np.zeros(len(batch), dtype=np.int64)
+        audio = self.session.run(None, inputs)[0].reshape(len(batch), -1)
+        # Audio length follows the predicted durations, not the number of IDs, so
+        # any row (even the one with the most IDs) may be padded to the batch width
+        return [_trim_padding(row, self.sample_rate) for row in audio]
+
+    def synthesize(self, texts: Sequence[str], batch_size: int = ONNX_BATCH_SIZE,
+                   sentence_silence: float = SENTENCE_SILENCE_S, stats: dict = None) -> List["np.ndarray"]:
+        """
+        16-bit mono PCM for each text. Every sentence of every text is one
+        batch item, so a few long lines and many short ones batch equally well.
+        `stats` receives the phonemizer's cache counters.
+        """
+        sentences = []  # (text index, phoneme IDs)
+        for index, text in enumerate(texts):
+            for phonemes in self.phonemizer.phonemize(text, self.espeak_voice, stats):
+                sentences.append((index, self.phoneme_ids(phonemes)))
+
+        # Sorting by length keeps the padding in each batch small
+        order = sorted(range(len(sentences)), key=lambda n: len(sentences[n][1]))
+        audio = [None] * len(sentences)
+        for start in range(0, len(order), max(1, batch_size)):
+            group = order[start:start + max(1, batch_size)]
+            for n, samples in zip(group, self.infer([sentences[n][1] for n in group])):
+                audio[n] = _to_int16(samples)
+
+        silence = np.zeros(int(self.sample_rate * sentence_silence), dtype=np.int16)
+        parts = [[] for _ in texts]
+        for (index, _), samples in zip(sentences, audio):
+            if parts[index]:
+                parts[index].append(silence)
+            parts[index].append(samples)
+        return [np.concatenate(p) if p else np.zeros(0, dtype=np.int16) for p in parts]
+
+
+class OnnxTTS:
+    """Loads each voice model once and synthesizes batches of lines with it."""
+    def __init__(self, threads: int = ONNX_THREADS, batch_size: int = ONNX_BATCH_SIZE):
+        self.threads = threads
+        self.batch_size = batch_size
+        self.voices = {}  # model path -> OnnxVoice
+        self.lock = threading.Lock()
+
+    def voice(self, model: str) -> OnnxVoice:
+        with self.lock:
+            if model not in self.voices:
+                self.voices[model] = OnnxVoice(model, threads=self.threads)
+            return self.voices[model]
+
+    def warm(self, models: Sequence[str]):
+        """Loads the given voices so the first line doesn't wait for the model."""
+        for model in set(models):
+            if os.path.exists(model):
+                self.voice(model)
+
+    def synthesize(self, texts: Sequence[str], model: str, stats: dict = None) -> List["np.ndarray"]:
+        return self.voice(model).synthesize(texts, batch_size=self.batch_size, stats=stats)
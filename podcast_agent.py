@@ -1,180 +1,800 @@
 import os
 import argparse
+import asyncio
+import atexit
+import hashlib
+import http.client
+import importlib
+import json
+import tempfile
 import re
-import subprocess
-from crewai import Agent, Task, Crew, Process, LLM
-from crewai.tools import BaseTool
-from crewai_tools import ScrapeWebsiteTool
-from pydantic import BaseModel, Field
-from typing import Type, List, Tuple
+import threading
+import time
+import unicodedata
+import urllib.request
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from metrics import Trace, maybe_span
+# The TTS/mixing core and the parser import without CrewAI; re-exported for existing callers
+from audio_engine import (AudioEngine, ClipCache, PiperPool, PiperWorker, StreamMixer,
+                          get_clip_cache, get_piper_pool, wav_stream_header, TTS_WORKERS)
+from script_parser import ScriptParser, VoiceResolver
 
 # --- Configuration ---
 os.environ["OPENAI_API_KEY"] = "NA"
-PIPER_BINARY = "./piper/piper"
-VOICE_MODELS = {
-    "Host": "./en_US-lessac-medium.onnx",
-    "Guest": "./en_US-ryan-medium.onnx"
-}
-BACKGROUND_MUSIC = "./background_music.wav"
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_TIMEOUT = 300  # Seconds to wait for the next streamed chunk
+MODELS_CACHE_TTL = float(os.environ.get("MODELS_CACHE_TTL", 30))  # Seconds before /api/tags is re-read
+# How long Ollama keeps a model loaded after each request ("30m", "1h", "-1" for forever)
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_DEFAULT_MODEL = os.environ.get("OLLAMA_DEFAULT_MODEL", "qwen2.5:0.5b")  # Pre-warmed at API startup
+OLLAMA_POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", 4))  # Idle keep-alive connections kept open
+OLLAMA_COLD_LOAD_S = 0.5  # A model load longer than this means the request hit a cold model
+# On-disk caches for research summaries, scraped pages and search results (TTLs in seconds)
+RESEARCH_CACHE_DIR = os.environ.get("RESEARCH_CACHE_DIR", "./research_cache")
+RESEARCH_CACHE_TTL = float(os.environ.get("RESEARCH_CACHE_TTL", 6 * 3600))
+SCRAPE_CACHE_TTL = float(os.environ.get("SCRAPE_CACHE_TTL", 24 * 3600))
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", 3600))
+RESEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("RESEARCH_CACHE_MAX_ENTRIES", 1000))
+# "crew" runs the CrewAI research agent; "fast" runs search, fetch and one summarize prompt
+RESEARCH_MODE = os.environ.get("RESEARCH_MODE", "crew")
+# "separate" gives the researcher search + scrape tools; "bundle" one concurrent fan-out tool
+RESEARCH_TOOL_MODE = os.environ.get("RESEARCH_TOOL_MODE", "separate")
+RESEARCH_FETCH_TIMEOUT = float(os.environ.get("RESEARCH_FETCH_TIMEOUT", 10))
+RESEARCH_MAX_CONNECTIONS = int(os.environ.get("RESEARCH_MAX_CONNECTIONS", 16))
+RESEARCH_PER_HOST = int(os.environ.get("RESEARCH_PER_HOST", 2))
+RESEARCH_PAGE_MAX_BYTES = 1024 * 1024
 
 # --- 1. LLM Setup ---
-# Default global LLM (will be overridden dynamically if needed, but we'll try to keep agents dynamic)
-# local_llm = LLM(model="ollama/qwen2.5:0.5b", base_url="http://localhost:11434")
 
-def get_ollama_models():
-    """Returns a list of available Ollama models."""
-    try:
-        result = subprocess.run(["ollama", "list"], capture_output=True, text=True, check=True)
-        lines = result.stdout.strip().split('\n')
-        models = []
-        # Skip header (NAME ID SIZE MODIFIED)
-        for line in lines[1:]:
-            parts = line.split()
-            if parts:
-                models.append(parts[0]) # The name column
-        return models
-    except Exception as e:
-        print(f"Error fetching models: {e}")
-        return ["qwen2.5:0.5b"] # Fallback
+def _duration_s(value) -> float:
+    """Seconds in an Ollama keep_alive value ("30m", "1h", "90s", 300); negative means forever."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"\s*(-?[\d.]+)\s*([smh]?)\s*", str(value))
+    if not match:
+        return 0.0
+    return float(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+
+class OllamaClient:
+    """
+    Talks to one Ollama server over a small pool of keep-alive HTTP connections,
+    shared by research and scriptwriting across jobs. Every request carries
+    `keep_alive` so the model stays resident between stages and jobs, and the
+    client remembers which models it expects to be loaded.
+    """
+    def __init__(self, base_url: str, keep_alive=OLLAMA_KEEP_ALIVE, pool_size: int = OLLAMA_POOL_SIZE,
+                 timeout: float = OLLAMA_TIMEOUT):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.keep_alive = keep_alive
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.idle = []
+        self.warm_until = {}  # model -> time.monotonic() deadline
+        self.connections_opened = 0
+        self.lock = threading.Lock()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+            self.connections_opened += 1
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def _release(self, conn: http.client.HTTPConnection):
+        with self.lock:
+            if len(self.idle) < self.pool_size:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    def _post(self, path: str, body: dict):
+        """Sends a request, retrying once if a pooled connection was closed by the server."""
+        payload = json.dumps(body).encode()
+        for attempt in range(2):
+            conn = self._connection()
+            reused = conn.sock is not None
+            try:
+                conn.request("POST", path, body=payload, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if response.status >= 400:
+                detail = response.read().decode(errors="replace")
+                self._release(conn)
+                raise RuntimeError(f"Ollama error {response.status}: {detail[:200]}")
+            return conn, response
+
+    def is_warm(self, model: str) -> bool:
+        with self.lock:
+            deadline = self.warm_until.get(model)
+        return deadline is not None and time.monotonic() < deadline
+
+    def _mark_warm(self, model: str):
+        keep = _duration_s(self.keep_alive)
+        with self.lock:
+            self.warm_until[model] = float("inf") if keep < 0 else time.monotonic() + keep
+
+    def generate(self, model: str, prompt: str, stats: dict = None) -> Iterator[str]:
+        """
+        Streams a completion from /api/generate, yielding text pieces as they arrive.
+        If `stats` is given it receives the call and token counts, the time to
+        the first token, the model load time and whether the model was cold.
+        """
+        expected_warm = self.is_warm(model)
+        started = time.perf_counter()
+        conn, response = self._post("/api/generate", {"model": model, "prompt": prompt, "stream": True,
+                                                      "keep_alive": self.keep_alive})
+        finished = False
+        first_token_s = None
+        try:
+            # One JSON object per line until {"done": true}
+            for raw in response:
+                if not raw.strip():
+                    continue
+                message = json.loads(raw)
+                if message.get("error"):
+                    raise RuntimeError(f"Ollama error: {message['error']}")
+                if message.get("response"):
+                    if first_token_s is None:
+                        first_token_s = time.perf_counter() - started
+                    yield message["response"]
+                if message.get("done"):
+                    self._mark_warm(model)
+                    if stats is not None:
+                        load_s = message.get("load_duration", 0) / 1e9
+                        stats["llm_calls"] = stats.get("llm_calls", 0) + 1
+                        stats["prompt_tokens"] = stats.get("prompt_tokens", 0) + message.get("prompt_eval_count", 0)
+                        stats["completion_tokens"] = stats.get("completion_tokens", 0) + message.get("eval_count", 0)
+                        stats["first_token_s"] = round(first_token_s if first_token_s is not None
+                                                       else time.perf_counter() - started, 4)
+                        stats["load_s"] = round(load_s, 4)
+                        # Trust Ollama's own load time when it reports one
+                        stats["cold"] = (load_s >= OLLAMA_COLD_LOAD_S if "load_duration" in message
+                                         else not expected_warm)
+                    finished = True
+                    break
+            if finished:
+                response.read()  # Drain the rest of the body so the connection can be reused
+        finally:
+            if finished and not response.will_close:
+                self._release(conn)
+            else:
+                conn.close()
 
-# --- 2. Tool Definitions ---
-class SearchToolInput(BaseModel):
-    query: str = Field(description="The search query.")
+    def warm(self, model: str) -> float:
+        """Loads `model` into memory (an empty prompt makes Ollama load it) and returns the seconds taken."""
+        started = time.perf_counter()
+        conn, response = self._post("/api/generate", {"model": model, "prompt": "", "stream": False,
+                                                      "keep_alive": self.keep_alive})
+        try:
+            message = json.loads(response.read() or b"{}")
+        finally:
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+        if message.get("error"):
+            raise RuntimeError(f"Ollama error: {message['error']}")
+        self._mark_warm(model)
+        return time.perf_counter() - started
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+
+_ollama_clients = {}
+_ollama_clients_lock = threading.Lock()
+
+def get_ollama_client(base_url: str = None) -> OllamaClient:
+    """Returns the process-wide OllamaClient for `base_url` (OLLAMA_URL by default)."""
+    url = (base_url or OLLAMA_URL).rstrip("/")
+    with _ollama_clients_lock:
+        if url not in _ollama_clients:
+            _ollama_clients[url] = OllamaClient(url)
+        return _ollama_clients[url]
+
+def stream_ollama(model: str, prompt: str, base_url: str = None, stats: dict = None) -> Iterator[str]:
+    """
+    Streams a completion from Ollama's /api/generate through the shared client,
+    yielding text pieces as they arrive. See OllamaClient.generate for `stats`.
+    """
+    return get_ollama_client(base_url).generate(model, prompt, stats=stats)
+
+_crew_llms = {}
+_crew_llms_lock = threading.Lock()  # Not the clients' lock: building an LLM can take a while
+
+def get_crew_llm(llm_model_name: str):
+    """One CrewAI LLM per model, reused across jobs and asking Ollama to keep the model loaded."""
+    from crewai import LLM as CrewLLM
+    key = (llm_model_name, OLLAMA_URL)
+    with _crew_llms_lock:
+        if key not in _crew_llms:
+            _crew_llms[key] = CrewLLM(model=f"ollama/{llm_model_name}", base_url=OLLAMA_URL,
+                                      keep_alive=OLLAMA_KEEP_ALIVE)
+        return _crew_llms[key]
+
+class ModelCatalog:
+    """
+    In-memory view of the models installed in Ollama, read from its /api/tags
+    endpoint. Only the very first read waits for a fetch: after `ttl` seconds
+    the cached list is still returned while a background thread fetches a new
+    one, and while Ollama is unreachable reads get an empty list (callers fall
+    back to a default) and a background retry at most every `retry_after` seconds.
+    """
+    def __init__(self, base_url: str = None, ttl: float = MODELS_CACHE_TTL, timeout: float = 2.0,
+                 retry_after: float = 5.0):
+        self.base_url = base_url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.models = None      # Latest successful list, or None before the first fetch
+        self.fetched_at = 0.0
+        self.attempted_at = 0.0  # Start of the latest fetch, successful or not
+        self.error = None
+        self.refreshing = False
+        self.lock = threading.Lock()
 
-class SearchTool(BaseTool):
-    name: str = "DuckDuckGoSearch"
-    description: str = "Search the web for a query using DuckDuckGo."
-    args_schema: Type[BaseModel] = SearchToolInput
+    def _fetch(self) -> List[dict]:
+        url = f"{self.base_url or OLLAMA_URL}/api/tags"
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            tags = json.load(response)
+        models = []
+        for tag in tags.get("models", []):
+            details = tag.get("details") or {}
+            models.append({
+                "name": tag.get("name") or tag.get("model"),
+                "size": tag.get("size", 0),
+                "parameter_size": details.get("parameter_size"),
+                "quantization": details.get("quantization_level"),
+                "family": details.get("family"),
+                "modified_at": tag.get("modified_at"),
+            })
+        return models
 
-    def _run(self, query: str) -> str:
-        from duckduckgo_search import DDGS
+    def refresh(self):
+        """Fetches the list now; on failure the previous list is kept."""
+        with self.lock:
+            self.attempted_at = time.time()
         try:
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, max_results=3))
-            return str(results)
+            models = self._fetch()
         except Exception as e:
-            return f"Search failed: {e}"
+            print(f"Error fetching models: {e}")
+            with self.lock:
+                self.error = str(e)
+            return
+        with self.lock:
+            self.models = models
+            self.fetched_at = time.time()
+            self.error = None
 
-search_tool = SearchTool()
-scrape_tool = ScrapeWebsiteTool()
+    def refresh_async(self):
+        """Starts a background refresh unless one is already running."""
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
 
-# --- 3. Audio Engine ---
-class AudioEngine:
-    def __init__(self, output_dir="."):
-        self.output_dir = output_dir
+        def run():
+            try:
+                self.refresh()
+            finally:
+                with self.lock:
+                    self.refreshing = False
+
+        threading.Thread(target=run, name="ollama-models", daemon=True).start()
+
+    def snapshot(self) -> dict:
+        """Cached models with their metadata, triggering a background refresh when stale."""
+        with self.lock:
+            loaded = self.models is not None
+            stale = time.time() - self.fetched_at > self.ttl
+            attempted = self.attempted_at
+        if not loaded and not attempted:
+            # Nothing to serve yet: one bounded HTTP call, never a subprocess
+            self.refresh()
+        elif not loaded:
+            # Ollama was unreachable: don't make every read wait for the timeout again
+            if time.time() - attempted > self.retry_after:
+                self.refresh_async()
+        elif stale:
+            self.refresh_async()
+        with self.lock:
+            return {
+                "models": list(self.models) if self.models is not None else [],
+                "fetched_at": self.fetched_at or None,
+                "stale": self.models is None or time.time() - self.fetched_at > self.ttl,
+                "error": self.error,
+            }
+
+    def names(self) -> List[str]:
+        return [m["name"] for m in self.snapshot()["models"]]
+
+    def size_of(self, name: str) -> Optional[int]:
+        """Size in bytes of an installed model, or None if it isn't known."""
+        return next((m["size"] for m in self.snapshot()["models"] if m["name"] == name), None)
+
+
+_model_catalog = None
+_model_catalog_lock = threading.Lock()
+
+def get_model_catalog() -> ModelCatalog:
+    """Returns the process-wide ModelCatalog."""
+    global _model_catalog
+    with _model_catalog_lock:
+        if _model_catalog is None:
+            _model_catalog = ModelCatalog()
+        return _model_catalog
+
+def get_ollama_models():
+    """Returns a list of available Ollama models."""
+    names = get_model_catalog().names()
+    return names or ["qwen2.5:0.5b"] # Fallback
+
+# --- 2. Research Caches ---
+# Punctuation that doesn't change what a topic means; symbols such as the ones
+# in "C++", "C#", ".NET" or "R&D" do, so they are kept
+_TOPIC_PUNCTUATION = re.compile(r"[^\w\s+#.&]")
+
+class ResultCache:
+    """
+    On-disk cache of text results (research summaries, pages, search hits),
+    one JSON file per key. Entries expire after `ttl` seconds and the least
+    recently used are evicted once there are more than `max_entries`.
+    """
+    def __init__(self, cache_dir: str, ttl: float, max_entries: int = RESEARCH_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
 
-    def generate_clip(self, text: str, speaker: str, index: int) -> str:
-        """Generates a single audio clip for a line of dialogue."""
-        model = VOICE_MODELS.get(speaker, VOICE_MODELS["Host"]) # Default to Host
-        output_file = os.path.join(self.output_dir, f"line_{index:03d}.wav")
-        
-        # Ensure output dir exists
-        os.makedirs(self.output_dir, exist_ok=True)
-        
-        command = f'echo "{text}" | {PIPER_BINARY} --model {model} --output_file {output_file}'
-        subprocess.run(command, shell=True, check=True)
-        return output_file
-
-    def mix_audio(self, clips: List[str], final_output: str):
-        """Concatenates clips and mixes with background music."""
-        # 1. Concatenate dialogue
-        concat_file = "concat_list.txt"
-        with open(concat_file, "w") as f:
-            for clip in clips:
-                f.write(f"file '{clip}'\n")
-        
-        dialogue_wav = "dialogue_temp.wav"
-        subprocess.run(f"ffmpeg -y -f concat -safe 0 -i {concat_file} -c copy {dialogue_wav}", shell=True, check=True)
-
-        # 2. Mix with background music (ducking)
-        # Lowers music volume to 10% when dialogue is present, keeps it at 20% otherwise
-        if os.path.exists(BACKGROUND_MUSIC):
-            cmd = (
-                f"ffmpeg -y -i {dialogue_wav} -stream_loop -1 -i {BACKGROUND_MUSIC} "
-                f"-filter_complex \"[1:a]volume=0.2[bg];[0:a]volume=1.5[fg];"
-                f"[fg][bg]amix=inputs=2:duration=first:dropout_transition=2[a]\" "
-                f"-map \"[a]\" {final_output}"
-            )
-        else:
-            print("Background music not found, skipping mix.")
-            cmd = f"cp {dialogue_wav} {final_output}"
-            
-        subprocess.run(cmd, shell=True, check=True)
-        
-        # Cleanup
-        if os.path.exists(concat_file): os.remove(concat_file)
-        if os.path.exists(dialogue_wav): os.remove(dialogue_wav)
-        for clip in clips:
-            if os.path.exists(clip): os.remove(clip)
-
-# --- 5. Logic ---
-class ScriptParser:
     @staticmethod
-    def parse(script_content: str) -> List[Tuple[str, str]]:
+    def normalize(text: str) -> str:
         """
-        Parses the script to extract (Speaker, Text) tuples.
-        Handles formatting like "Speaker: Text" or "Speaker says: Text".
+        Case-, whitespace- and punctuation-insensitive form of a topic or query.
+        Symbols that are part of a name ("C++", "C#") are kept; only a word's
+        trailing full stop is dropped.
         """
-        lines = script_content.split('\n')
-        parsed_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if not line: continue
-            
-            # Remove markdown bolding/headers
-            clean_line = line.replace('*', '').replace('#', '').strip()
-            
-            # Check for "Name: Text" pattern
-            # Matches: "Host: ", "Guest: ", "John says: ", etc.
-            match = re.match(r"^([A-Za-z0-9 ]+)\s*(?:says|:|-)\s*(.*)", clean_line, re.IGNORECASE)
-            
-            if match:
-                speaker = match.group(1).strip()
-                text = match.group(2).strip()
-                
-                # Filter out obvious metadata lines that might get caught
-                if len(speaker) > 20 or "scene" in speaker.lower() or speaker.upper() in ["NAME", "TEXT", "SPEAKER"]:
-                    continue
+        text = unicodedata.normalize("NFKC", text).casefold()
+        words = (word.rstrip(".") for word in _TOPIC_PUNCTUATION.sub(" ", text).split())
+        return " ".join(word for word in words if word)
 
-                # Final cleanup of text
-                text = text.strip('" ')
-                if not text: continue
-                
-                parsed_lines.append((speaker, text))
-            
-        return parsed_lines
+    def key(self, *parts: str) -> str:
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _entries(self) -> List[str]:
+        return [os.path.join(self.cache_dir, name)
+                for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached value, or None if it is missing or older than the TTL."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            entry = None
+        if entry is not None and time.time() - entry["created_at"] > self.ttl:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            entry = None
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            pass
+        return entry["value"]
+
+    def put(self, key: str, value: str):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"created_at": time.time(), "value": value}, f)
+        os.replace(tmp_path, path)
+        with self.lock:
+            entries = self._entries()
+            if len(entries) > self.max_entries:
+                self._evict(entries)
+
+    def _evict(self, entries: List[str]):
+        """Drops expired entries, then the least recently used ones, down to max_entries."""
+        now = time.time()
+        stamped = []
+        for path in entries:
+            try:
+                stamped.append((os.stat(path).st_mtime, path))
+            except FileNotFoundError:
+                continue
+        stamped.sort()
+        excess = len(stamped) - self.max_entries
+        for mtime, path in stamped:
+            if excess <= 0 and now - mtime <= self.ttl:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            excess -= 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries()),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+            }
+
+
+_research_caches = {}
+_research_caches_lock = threading.Lock()
+
+def get_research_cache(kind: str) -> ResultCache:
+    """Returns the process-wide cache for "research", "scrape" or "search" results."""
+    ttls = {"research": RESEARCH_CACHE_TTL, "scrape": SCRAPE_CACHE_TTL, "search": SEARCH_CACHE_TTL}
+    with _research_caches_lock:
+        if kind not in _research_caches:
+            _research_caches[kind] = ResultCache(os.path.join(RESEARCH_CACHE_DIR, kind), ttls[kind])
+        return _research_caches[kind]
+
+# --- 3. Web Research ---
+def search_web(query: str, max_results: int = 3) -> List[dict]:
+    """DuckDuckGo text search ({title, href, body} dicts), cached per normalized query."""
+    cache = get_research_cache("search")
+    key = cache.key(cache.normalize(query), str(max_results))
+    cached = cache.get(key)
+    if cached is not None:
+        return json.loads(cached)
+
+    from duckduckgo_search import DDGS
+    with DDGS() as ddgs:
+        results = list(ddgs.text(query, max_results=max_results))
+    cache.put(key, json.dumps(results))
+    return results
+
+
+class _TextExtractor(HTMLParser):
+    """Collects the title and visible text of an HTML page."""
+    SKIP = {"script", "style", "noscript", "head", "nav", "footer", "svg"}
+
+    def __init__(self):
+        super().__init__()
+        self.title = ""
+        self.parts = []
+        self.skipping = 0
+        self.in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self.in_title = True
+        elif tag in self.SKIP:
+            self.skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+        elif tag in self.SKIP and self.skipping:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data
+        elif not self.skipping and data.strip():
+            self.parts.append(data.strip())
+
+def html_to_text(html: str) -> Tuple[str, str]:
+    """Returns (title, visible text) for an HTML document."""
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return " ".join(extractor.title.split()), " ".join(" ".join(extractor.parts).split())
+
+
+class PageFetcher:
+    """
+    Fetches many pages at once from a private event loop thread, sharing one
+    pooled httpx.AsyncClient across calls. Each host gets at most `per_host`
+    concurrent requests; every request is bounded by `timeout` seconds.
+    """
+    def __init__(self, max_connections: int = RESEARCH_MAX_CONNECTIONS, per_host: int = RESEARCH_PER_HOST,
+                 timeout: float = RESEARCH_FETCH_TIMEOUT, max_bytes: int = RESEARCH_PAGE_MAX_BYTES):
+        self.max_connections = max_connections
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.loop = None
+        self.client = None
+        self.host_slots = {}  # host -> asyncio.Semaphore, only touched on the loop thread
+        self.lock = threading.Lock()
+
+    def _start(self):
+        with self.lock:
+            if self.loop is not None:
+                return
+            try:
+                import httpx  # Imported here to keep it off the startup path
+            except ImportError:
+                raise RuntimeError("The bundled research tool needs httpx (pip install httpx)")
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="research-fetcher", daemon=True).start()
+            self.client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(self.timeout),
+                follow_redirects=True,
+                headers={"User-Agent": "Mozilla/5.0 (compatible; LocalPodcastAgent/1.0)"},
+            )
+            self.loop = loop
+
+    def run(self, coro):
+        """Runs a coroutine on the fetcher's loop and waits for its result."""
+        self._start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def fetch(self, url: str) -> dict:
+        """Fetches one page: {url, title, text} or {url, error}. Pages are cached per URL."""
+        cache = get_research_cache("scrape")
+        key = cache.key("page", url.strip())  # Parsed {title, text}, unlike the scrape tool's raw text
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return dict(json.loads(cached), url=url, cached=True)
+
+        host = urlsplit(url).netloc
+        slots = self.host_slots.setdefault(host, asyncio.Semaphore(self.per_host))
+        try:
+            async with slots:
+                # The timeout covers the whole download, not just each read
+                body = await asyncio.wait_for(self._download(url), self.timeout)
+        except Exception as e:
+            return {"url": url, "error": f"{type(e).__name__}: {e}".rstrip(": ")}
+        title, text = html_to_text(body)
+        await asyncio.to_thread(cache.put, key, json.dumps({"title": title, "text": text}))
+        return {"url": url, "title": title, "text": text}
+
+    async def _download(self, url: str) -> str:
+        async with self.client.stream("GET", url) as response:
+            response.raise_for_status()
+            body = b""
+            async for block in response.aiter_bytes():
+                body += block
+                if len(body) >= self.max_bytes:
+                    break
+            return body[:self.max_bytes].decode(response.encoding or "utf-8", errors="replace")
+
+    async def gather(self, queries: List[str], search: Callable[[str], List[dict]],
+                     max_results: int = 3) -> dict:
+        # Search backends are blocking, so each query runs on its own thread
+        searches = await asyncio.gather(*(asyncio.to_thread(search, q) for q in queries),
+                                        return_exceptions=True)
+        sources, errors, seen = [], [], set()
+        for query, results in zip(queries, searches):
+            if isinstance(results, Exception):
+                errors.append({"query": query, "error": str(results)})
+                continue
+            for result in results[:max_results]:
+                url = result.get("href") or result.get("url")
+                if url and url not in seen:
+                    seen.add(url)
+                    sources.append({"query": query, "url": url, "title": result.get("title", ""),
+                                    "snippet": result.get("body", "")})
+        pages = await asyncio.gather(*(self.fetch(source["url"]) for source in sources))
+        for source, page in zip(sources, pages):
+            source["title"] = page.get("title") or source["title"]
+            for field in ("text", "error", "cached"):
+                if field in page:
+                    source[field] = page[field]
+        return {"queries": queries, "sources": sources, "errors": errors}
+
+    def close(self):
+        with self.lock:
+            if self.loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result(timeout=5)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop = None
+            self.client = None
+            self.host_slots = {}
+
+
+_page_fetcher = None
+_page_fetcher_lock = threading.Lock()
+
+def get_page_fetcher() -> PageFetcher:
+    """Returns the process-wide PageFetcher, so its connection pool is shared across jobs."""
+    global _page_fetcher
+    with _page_fetcher_lock:
+        if _page_fetcher is None:
+            _page_fetcher = PageFetcher()
+            atexit.register(_page_fetcher.close)
+        return _page_fetcher
+
+def gather_research(queries: List[str], search: Callable[[str], List[dict]] = None,
+                    fetcher: PageFetcher = None, max_results: int = 3) -> dict:
+    """
+    Runs every query concurrently, then fetches every distinct result URL
+    concurrently. Returns {"queries", "sources": [{query, url, title, snippet,
+    text | error}], "errors"}; failed searches and pages are reported, not raised.
+    """
+    fetcher = fetcher or get_page_fetcher()
+    return fetcher.run(fetcher.gather(queries, search or search_web, max_results))
+
+def format_bundle(bundle: dict, max_chars: int = 1500) -> str:
+    """Digests a research bundle into one compact text block for the agent."""
+    blocks = []
+    for n, source in enumerate(bundle["sources"], 1):
+        body = source.get("text") or source.get("snippet") or ""
+        if len(body) > max_chars:
+            body = body[:max_chars].rsplit(" ", 1)[0] + " ..."
+        blocks.append(f"[{n}] {source['title']} ({source['url']})\n{body}")
+    for error in bundle["errors"]:
+        blocks.append(f"Search for '{error['query']}' failed: {error['error']}")
+    return "\n\n".join(blocks) or "No results found."
+
+# The CrewAI tools (and crewai itself) are only imported when first used
+_LAZY_TOOLS = {"SearchTool", "CachedScrapeWebsiteTool", "ResearchBundleTool",
+               "search_tool", "scrape_tool", "research_bundle_tool"}
+
+def __getattr__(name: str):
+    if name in _LAZY_TOOLS:
+        return getattr(importlib.import_module("research_tools"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def preload_agent_stack():
+    """Imports CrewAI and builds the research tools ahead of the first job."""
+    importlib.import_module("research_tools")
+
+# --- 4. Logic ---
+# Target script size per episode length
+LENGTH_MAP = {
+    "short": "approx 10 lines",
+    "medium": "approx 30 lines",
+    "long": "approx 60 lines"
+}
+
+RESEARCH_FALLBACK = "Could not find news. Using general knowledge."
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'])")
+
+def extract_key_sentences(topic: str, bundle: dict, max_sentences: int = 12,
+                          max_chars: int = 2500) -> List[str]:
+    """
+    Extractive summary of a research bundle: the sentences that mention the
+    most topic terms, preferring those near the top of each page, kept in
+    source order and capped so the summarize prompt stays small.
+    """
+    terms = {word for word in ResultCache.normalize(topic).split() if len(word) > 2}
+    candidates = []
+    seen = set()
+    for rank, source in enumerate(bundle["sources"]):
+        # The search snippet comes first, then the page body
+        sentences = [part for field in ("snippet", "text") if source.get(field)
+                     for part in _SENTENCE_END.split(source[field])]
+        for position, sentence in enumerate(sentences):
+            sentence = sentence.strip()
+            normalized = ResultCache.normalize(sentence)
+            if not 25 <= len(sentence) <= 400 or normalized in seen:
+                continue
+            seen.add(normalized)
+            words = set(normalized.split())
+            score = len(terms & words) / max(1, len(terms)) + 1.0 / (1 + position) + 0.5 / (1 + rank)
+            candidates.append((score, rank, position, sentence))
+
+    chosen, total = [], 0
+    for candidate in sorted(candidates, key=lambda c: -c[0]):
+        if len(chosen) >= max_sentences or total + len(candidate[3]) > max_chars:
+            continue
+        chosen.append(candidate)
+        total += len(candidate[3])
+    return [sentence for _, _, _, sentence in sorted(chosen, key=lambda c: (c[1], c[2]))]
+
+def research_summary_prompt(topic: str, sentences: List[str]) -> str:
+    notes = "\n".join(f"- {sentence}" for sentence in sentences)
+    return (
+        f"You are a podcast researcher. Using only these notes from recent web pages about {topic}:\n"
+        f"{notes}\n\n"
+        "Write a list of the 3 to 6 most interesting news items, one line each, "
+        "each with a concrete fact or detail.\n\nNEWS:"
+    )
+
+def fast_research(topic: str, llm_model_name: str = "qwen2.5:0.5b", search: Callable[[str], List[dict]] = None,
+                  fetcher: PageFetcher = None, usage: dict = None) -> str:
+    """
+    Deterministic research without an agent loop: concurrent search and fetch
+    (gather_research), an extractive pass over the pages, then exactly one
+    summarize prompt to Ollama. Falls back to the extracted notes if the LLM
+    call fails.
+    """
+    print("Running Research (fast path)...")
+    try:
+        bundle = gather_research([topic, f"{topic} latest news"], search=search, fetcher=fetcher)
+    except Exception as e:
+        print(f"Research failed: {e}")
+        return RESEARCH_FALLBACK
+    sentences = extract_key_sentences(topic, bundle)
+    if not sentences:
+        print("Research found nothing usable.")
+        return RESEARCH_FALLBACK
+
+    stats = usage if usage is not None else {}
+    try:
+        summary = "".join(stream_ollama(llm_model_name, research_summary_prompt(topic, sentences),
+                                        stats=stats)).strip()
+    except Exception as e:
+        print(f"Research summary failed: {e}")
+        summary = ""
+    research_result = summary or "\n".join(f"- {sentence}" for sentence in sentences)
+    print(f"Research Result parsed: {research_result[:100]}...")
+    return research_result
+
+def research_topic(topic: str, llm_model_name: str = "qwen2.5:0.5b", allow_human_input: bool = False,
+                   use_cache: bool = True, tool_mode: str = None, mode: str = None,
+                   usage: dict = None) -> str:
+    """
+    Researches a topic and returns a summary, either with the CrewAI research
+    agent (mode "crew") or the direct fast path (mode "fast", see fast_research).
+    Summaries are cached on the normalized topic, so a repeat episode (even
+    with other hosts or another model) skips research entirely.
+    `usage` receives the number of LLM calls and tokens spent.
+    """
+    cache = get_research_cache("research") if use_cache and not allow_human_input else None
+    if cache is not None:
+        cache_key = cache.key(cache.normalize(topic))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print("Research cache hit.")
+            if usage is not None:
+                usage["cached"] = True
+            return cached
+
+    if (mode or RESEARCH_MODE) == "fast" and not allow_human_input:
+        research_result = fast_research(topic, llm_model_name, usage=usage)
+        if cache is not None and research_result != RESEARCH_FALLBACK:
+            cache.put(cache_key, research_result)
+        return research_result
 
-def run_podcast(topic: str, output_file: str = "podcast.wav", length: str = "short", 
-                allow_human_input: bool = True, host_name: str = "Host", guest_name: str = "Guest",
-                llm_model_name: str = "qwen2.5:0.5b"):
-    
-    print(f"Starting generation with model: {llm_model_name}")
-    
     # Dynamic LLM for CrewAI
     # We need to recreate agents to switch models if we use CrewAI
-    from crewai import LLM as CrewLLM
-    dynamic_llm = CrewLLM(model=f"ollama/{llm_model_name}", base_url="http://localhost:11434")
+    from crewai import Agent, Crew, Process, Task
+    from research_tools import research_bundle_tool, scrape_tool, search_tool
+    dynamic_llm = get_crew_llm(llm_model_name)
 
     # Re-define agents with the specific model
     researcher = Agent(
         role='Podcast Researcher',
         goal='Find relevant and interesting news topics.',
         backstory='You are a meticulous researcher who loves finding deep cuts and interesting stories.',
-        tools=[search_tool, scrape_tool],
+        tools=[research_bundle_tool] if (tool_mode or RESEARCH_TOOL_MODE) == "bundle" else [search_tool, scrape_tool],
         verbose=True,
         llm=dynamic_llm
     )
-    
-    # Define length prompt
-    length_map = {
-        "short": "approx 10 lines",
-        "medium": "approx 30 lines",
-        "long": "approx 60 lines"
-    }
-    length_desc = length_map.get(length, "approx 10 lines")
 
-    # 1. Research
     research_task = Task(
         description=f"Find the latest news on {topic}. Summarize them into a list.",
         expected_output="A list of news summaries.",
@@ -194,16 +814,22 @@ def run_podcast(topic: str, output_file: str = "podcast.wav", length: str = "sho
         research_result = research_crew.kickoff()
     except Exception as e:
         print(f"Research failed: {e}")
-        research_result = "Could not find news. Using general knowledge."
+        return RESEARCH_FALLBACK
 
+    token_usage = getattr(research_result, "token_usage", None)
+    if usage is not None and token_usage is not None:
+        usage["llm_calls"] = getattr(token_usage, "successful_requests", 0)
+        usage["prompt_tokens"] = getattr(token_usage, "prompt_tokens", 0)
+        usage["completion_tokens"] = getattr(token_usage, "completion_tokens", 0)
     print(f"Research Result parsed: {str(research_result)[:100]}...")
+    if cache is not None:
+        cache.put(cache_key, str(research_result))
+    return str(research_result)
 
-    # 2. Write Script (Direct LLM Call)
-    print(f"Writing Script (Direct Mode using {llm_model_name})...")
-    
-    prompt = (
+def script_prompt(research_result: str, host_name: str, guest_name: str) -> str:
+    return (
         f"You are a scriptwriter. Write a script between {host_name} and {guest_name} about:\n"
-        f"{str(research_result)}\n\n"
+        f"{research_result}\n\n"
         "RULES:\n"
         "1. Write ONLY the spoken dialogue.\n"
         "2. Format: Name: Text\n"
@@ -212,77 +838,221 @@ def run_podcast(topic: str, output_file: str = "podcast.wav", length: str = "sho
         "SCRIPT:"
     )
 
-    try:
-        # Direct call to Ollama 
-        # Note: 'ollama run' takes the model name directly (e.g. 'qwen2.5:0.5b')
-        cmd = ["ollama", "run", llm_model_name, prompt]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        script_content = result.stdout
-    except Exception as e:
-        print(f"Direct generation failed: {e}")
-        script_content = ""
+def fallback_script(host_name: str, guest_name: str) -> str:
+    return (
+        f"{host_name}: Welcome listeners. We encountered an error generating the script.\n"
+        f"{guest_name}: It seems our AI writer is having a bad day.\n"
+        f"{host_name}: Please try strictly researching a simple topic like 'Weather'."
+    )
 
-    print(f"Raw Script Output:\n{script_content[:200]}...\n")
-    
-    # Validation and Audio generation remains same...
+def run_podcast(topic: str, output_file: str = "podcast.wav", length: str = "short", 
+                allow_human_input: bool = True, host_name: str = "Host", guest_name: str = "Guest",
+                llm_model_name: str = "qwen2.5:0.5b", persistent_tts: bool = False,
+                tts_workers: int = None, on_audio: Callable[[bytes], None] = None,
+                trace: Trace = None, research_mode: str = None, script_file: str = "script.txt",
+                scratch_dir: str = None):
     
-    # Validation
-    if len(script_content) < 50 or ":" not in script_content:
-        # ... (fallback logic)
-        script_content = (
-            f"{host_name}: Welcome listeners. We encountered an error generating the script.\n"
-            f"{guest_name}: It seems our AI writer is having a bad day.\n"
-            f"{host_name}: Please try strictly researching a simple topic like 'Weather'."
-        )
-
-    # Save script
-    with open("script.txt", "w") as f:
-        f.write(script_content)
-    print("\nScript saved to script.txt")
+    print(f"Starting generation with model: {llm_model_name}")
 
-    # 3. Audio Generation
-    print("Generating audio...")
-    engine = AudioEngine()
-    clips = []
-    
-    parsed_lines = ScriptParser.parse(script_content)
+    # Define length prompt
+    length_desc = LENGTH_MAP.get(length, "approx 10 lines")
+
+    # 1. Research
+    with maybe_span(trace, "research", topic=topic, mode=research_mode or RESEARCH_MODE) as span:
+        usage = {}
+        research_result = research_topic(topic, llm_model_name, allow_human_input,
+                                         mode=research_mode, usage=usage)
+        span.update(usage)
+
+    # 2. Write Script (Direct LLM Call)
+    print(f"Writing Script (Direct Mode using {llm_model_name})...")
     
-    idx = 0
-    for speaker, text in parsed_lines:
-        print(f"Generating line {idx} ({speaker}): {text[:50]}...")
-        
-        # Map custom names to generic Voice Models with fuzzy matching
-        s_norm = speaker.lower().strip()
-        h_norm = host_name.lower().strip()
-        g_norm = guest_name.lower().strip()
-        
-        # Check if speaker name contains or is contained by host/guest name 
-        # (e.g. "Dany" matches "Dany Bhatti")
-        if (s_norm in h_norm and len(s_norm) > 2) or (h_norm in s_norm):
-            voice_role = "Host"
-        elif (s_norm in g_norm and len(s_norm) > 2) or (g_norm in s_norm):
-            voice_role = "Guest"
-        else:
-            # Fallback for unexpected names
-            voice_role = "Host" if idx % 2 == 0 else "Guest"
+    prompt = script_prompt(research_result, host_name, guest_name)
 
+    def voiced_lines():
+        """
+        Streams the script from Ollama and yields (voice, text) for each line as
+        soon as it is complete, so synthesis overlaps with generation.
+        """
+        pieces = []
+        llm_s = [0.0]  # Time spent waiting on Ollama, so parsing can be timed on its own
+        llm_stats = {}
+        started = time.perf_counter()
+
+        def tee():
+            stream = stream_ollama(llm_model_name, prompt, stats=llm_stats)
+            while True:
+                wait = time.perf_counter()
+                piece = next(stream, None)
+                llm_s[0] += time.perf_counter() - wait
+                if piece is None:
+                    return
+                pieces.append(piece)
+                yield piece
+
+        idx = 0
+        parse_s = 0.0
+        voices = VoiceResolver(host_name, guest_name)
         try:
-            clip_path = engine.generate_clip(text, voice_role, idx)
-            clips.append(clip_path)
-            idx += 1
+            lines = ScriptParser.parse_stream(tee())
+            while True:
+                step, llm_before = time.perf_counter(), llm_s[0]
+                parsed = next(lines, None)
+                parse_s += time.perf_counter() - step - (llm_s[0] - llm_before)
+                if parsed is None:
+                    break
+                speaker, text = parsed
+                voice_role = voices.resolve(speaker, idx)
+                print(f"Queued line {idx} ({speaker} -> {voice_role}): {text[:50]}...")
+                idx += 1
+                yield voice_role, text
         except Exception as e:
-            print(f"Failed to generate line {idx}: {e}")
+            print(f"Direct generation failed: {e}")
+        if trace is not None:
+            llm_stats.pop("llm_calls", None)
+            trace.record("script_generation", time.perf_counter() - started, start=started,
+                         model=llm_model_name, llm_wait_s=round(llm_s[0], 4), lines=idx, **llm_stats)
+            trace.record("parse", parse_s, lines=idx)
+
+        script_content = "".join(pieces)
+        print(f"Raw Script Output:\n{script_content[:200]}...\n")
+
+        # Validation: lines already handed to TTS can't be taken back, so the
+        # fallback only applies when nothing usable came out of the model
+        if idx == 0:
+            script_content = fallback_script(host_name, guest_name)
+            for speaker, text in ScriptParser.parse(script_content):
+                yield voices.resolve(speaker, idx), text
+                idx += 1
+
+        # Save script
+        with open(script_file, "w") as f:
+            f.write(script_content)
+        print(f"\nScript saved to {script_file}")
+
+    # 3. Audio Generation
+    print("Generating audio...")
 
-    engine.mix_audio(clips, output_file)
+    # Clips go to a per-job directory so parallel jobs never collide
+    with tempfile.TemporaryDirectory(prefix="clips_", dir=scratch_dir) as clip_dir:
+        engine = AudioEngine(output_dir=clip_dir, persistent=persistent_tts, trace=trace)
+        if on_audio is not None:
+            # Streaming mode: hand out WAV chunks while later lines are still synthesizing
+            for chunk in engine.stream_audio(voiced_lines(), output_file, workers=tts_workers):
+                on_audio(chunk)
+        else:
+            clips = engine.synthesize_lines(voiced_lines(), workers=tts_workers)
+            engine.mix_audio(clips, output_file)
     print(f"Audio generated: {output_file}")
     return output_file
 
+# --- 5. Batches ---
+def run_batch(episodes: List[dict], persistent_tts: bool = False, tts_workers: int = None,
+              trace: Trace = None, on_update: Callable[[int, dict], None] = None,
+              scratch_dir: str = None) -> List[dict]:
+    """
+    Generates several episodes, sharing work between them. Each episode is a
+    dict with `topic` and `output_file`, plus optional `length`, `host_name`,
+    `guest_name`, `model`, `research_mode` (as for run_podcast) and
+    `script_file` to save the script to.
+
+    Each stage runs over the whole batch: research once per distinct topic,
+    scripts grouped by model so Ollama never swaps back to a model it already
+    unloaded, then every line of one voice synthesized together, then one mix
+    per episode. A failed episode doesn't stop the others.
+
+    Returns one {"status", "message", "output_file"} dict per episode;
+    `on_update(index, fields)` is called as each episode changes state.
+    """
+    results = [{"status": "processing", "message": "Waiting for research...", "output_file": None}
+               for _ in episodes]
+
+    def update(i: int, **fields):
+        results[i].update(fields)
+        if on_update is not None:
+            on_update(i, fields)
+
+    def model_of(i: int) -> str:
+        return episodes[i].get("model") or OLLAMA_DEFAULT_MODEL
+
+    # 1. Research, once per (normalized topic, mode)
+    topics = {}
+    for i, episode in enumerate(episodes):
+        mode = episode.get("research_mode") or RESEARCH_MODE
+        topics.setdefault((ResultCache.normalize(episode["topic"]), mode), []).append(i)
+    research = {}
+    for (_, mode), members in sorted(topics.items(), key=lambda item: model_of(item[1][0])):
+        first = members[0]
+        with maybe_span(trace, "research", topic=episodes[first]["topic"], mode=mode,
+                        episodes=len(members)) as span:
+            usage = {}
+            summary = research_topic(episodes[first]["topic"], model_of(first), mode=mode, usage=usage)
+            span.update(usage)
+        for i in members:
+            research[i] = summary
+            update(i, message="Writing script...")
+
+    # 2. Scripts, grouped by model; reversed so the first group uses the model research ended on
+    scripts = {}
+    for i in sorted(range(len(episodes)), key=model_of, reverse=True):
+        episode = episodes[i]
+        host_name, guest_name = episode.get("host_name", "Host"), episode.get("guest_name", "Guest")
+        prompt = script_prompt(research[i], host_name, guest_name)
+        with maybe_span(trace, "script_generation", model=model_of(i), episode=i) as span:
+            stats = {}
+            try:
+                script_content = "".join(stream_ollama(model_of(i), prompt, stats=stats))
+            except Exception as e:
+                print(f"Script generation failed for '{episode['topic']}': {e}")
+                script_content = ""
+            stats.pop("llm_calls", None)
+            span.update(stats)
+        parsed = ScriptParser.parse(script_content)
+        if not parsed:
+            script_content = fallback_script(host_name, guest_name)
+            parsed = ScriptParser.parse(script_content)
+        if episode.get("script_file"):
+            with open(episode["script_file"], "w") as f:
+                f.write(script_content)
+        voices = VoiceResolver(host_name, guest_name)
+        scripts[i] = [(voices.resolve(speaker, idx), text) for idx, (speaker, text) in enumerate(parsed)]
+        update(i, message="Synthesizing audio...")
+
+    # 3. Synthesis, all lines of one voice together, then one mix per episode
+    work = sorted(((voice, text, i, n) for i, lines in scripts.items() for n, (voice, text) in enumerate(lines)),
+                  key=lambda item: item[0])
+    with tempfile.TemporaryDirectory(prefix="batch_clips_", dir=scratch_dir) as clip_dir:
+        engine = AudioEngine(output_dir=clip_dir, persistent=persistent_tts, trace=trace)
+        rendered = engine.synthesize_lines([(voice, text) for voice, text, _, _ in work],
+                                           workers=tts_workers, skip_failed=False)
+        clips = {i: [None] * len(lines) for i, lines in scripts.items()}
+        for (_, _, i, n), clip in zip(work, rendered):
+            clips[i][n] = clip
+
+        for i in range(len(episodes)):
+            episode_clips = [clip for clip in clips[i] if clip is not None]
+            if not episode_clips:
+                update(i, status="failed", message="No audio could be synthesized.")
+                continue
+            try:
+                with maybe_span(trace, "mix", episode=i):
+                    engine.mix_audio(episode_clips, episodes[i]["output_file"])
+            except Exception as e:
+                update(i, status="failed", message=f"Mixing failed: {e}")
+                continue
+            update(i, status="completed", message="Podcast generated successfully.",
+                   output_file=episodes[i]["output_file"])
+    return results
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Local Agentic Podcast System")
     parser.add_argument("--topic", help="Topic for the podcast")
     parser.add_argument("--output", default="podcast.wav", help="Output audio file")
     parser.add_argument("--length", default="short", choices=["short", "medium", "long"], help="Length of the podcast (short=10 lines, medium=30 lines, long=60 lines)")
+    parser.add_argument("--persistent-tts", action="store_true", help="Keep one Piper process per voice instead of one per line")
+    parser.add_argument("--tts-workers", type=int, default=TTS_WORKERS, help="Number of lines to synthesize in parallel")
+    parser.add_argument("--research-mode", default=RESEARCH_MODE, choices=["crew", "fast"], help="CrewAI agent or direct search + one summarize prompt")
     
     args = parser.parse_args()
     
@@ -292,4 +1062,5 @@ if __name__ == "__main__":
         print("Local Agentic Podcast System")
         topic = input("Enter a topic for the podcast: ")
         
-    run_podcast(topic, args.output, args.length)
+    run_podcast(topic, args.output, args.length, persistent_tts=args.persistent_tts, tts_workers=args.tts_workers,
+                research_mode=args.research_mode)
@@ -0,0 +1,63 @@
+"""
+CrewAI tools for the research agent. Importing this module pulls in crewai,
+crewai_tools and pydantic, so podcast_agent only loads it on first use.
+"""
+from typing import Type
+
+from crewai.tools import BaseTool
+from crewai_tools import ScrapeWebsiteTool
+from pydantic import BaseModel, Field
+
+from podcast_agent import format_bundle, gather_research, get_research_cache, search_web
+
+
+class SearchToolInput(BaseModel):
+    query: str = Field(description="The search query.")
+
+class SearchTool(BaseTool):
+    name: str = "DuckDuckGoSearch"
+    description: str = "Search the web for a query using DuckDuckGo."
+    args_schema: Type[BaseModel] = SearchToolInput
+
+    def _run(self, query: str) -> str:
+        try:
+            return str(search_web(query))
+        except Exception as e:
+            return f"Search failed: {e}"
+
+class CachedScrapeWebsiteTool(ScrapeWebsiteTool):
+    """ScrapeWebsiteTool that reuses pages fetched within SCRAPE_CACHE_TTL."""
+    def _run(self, **kwargs):
+        url = kwargs.get("website_url", getattr(self, "website_url", None))
+        if not url:
+            return super()._run(**kwargs)
+        cache = get_research_cache("scrape")
+        key = cache.key(url.strip())
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        page = super()._run(**kwargs)
+        if isinstance(page, str) and page.strip():
+            cache.put(key, page)
+        return page
+
+class ResearchBundleToolInput(BaseModel):
+    queries: str = Field(description="One or more search queries, separated by ';'.")
+
+class ResearchBundleTool(BaseTool):
+    name: str = "ResearchBundle"
+    description: str = (
+        "Search the web for several queries at once and read every result page. "
+        "Returns the title, URL and main text of each source in a single call."
+    )
+    args_schema: Type[BaseModel] = ResearchBundleToolInput
+
+    def _run(self, queries: str) -> str:
+        query_list = [q.strip() for q in queries.split(";") if q.strip()]
+        if not query_list:
+            return "No queries given."
+        return format_bundle(gather_research(query_list))
+
+search_tool = SearchTool()
+scrape_tool = CachedScrapeWebsiteTool()
+research_bundle_tool = ResearchBundleTool()
@@ -0,0 +1,119 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# The "Name: ", "Name says: " or "Name - " prefix of a dialogue line; the text is the rest of it
+_DIALOGUE = re.compile(r"([A-Za-z0-9 ]+)\s*(?:says|:|-)\s*", re.IGNORECASE)
+# Speaker names that are really column headers
+_HEADERS = frozenset(["NAME", "TEXT", "SPEAKER"])
+# Distinct speaker names VoiceResolver remembers, so odd transcripts can't grow it forever
+MAX_KNOWN_SPEAKERS = 1024
+
+
+class ScriptParser:
+    @staticmethod
+    def parse_line(line: str) -> Optional[Tuple[str, str]]:
+        """Parses a single script line into a (Speaker, Text) tuple, or None if it isn't dialogue."""
+        clean_line = line.strip()
+        if not clean_line: return None
+
+        # Remove markdown bolding/headers
+        if '*' in clean_line or '#' in clean_line:
+            clean_line = clean_line.replace('*', '').replace('#', '').strip()
+
+        match = _DIALOGUE.match(clean_line)
+        if match is None:
+            return None
+        speaker = match.group(1).strip()
+
+        # Filter out obvious metadata lines that might get caught
+        if len(speaker) > 20 or "scene" in speaker.lower() or speaker.upper() in _HEADERS:
+            return None
+
+        # Final cleanup of text
+        text = clean_line[match.end():]
+        if '\n' in text:
+            text = text[:text.index('\n')]  # Only what is on the speaker's line
+        text = text.strip().strip('" ')
+        if not text: return None
+        return (speaker, text)
+
+    @staticmethod
+    def parse_lines(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+        """
+        Yields (Speaker, Text) for each dialogue line of an iterable of lines,
+        e.g. an open file, so a transcript never has to be in memory at once.
+        """
+        parse_line = ScriptParser.parse_line
+        for line in lines:
+            parsed = parse_line(line)
+            if parsed:
+                yield parsed
+
+    @staticmethod
+    def parse(script_content: str) -> List[Tuple[str, str]]:
+        """
+        Parses the script to extract (Speaker, Text) tuples.
+        Handles formatting like "Speaker: Text" or "Speaker says: Text".
+        """
+        return list(ScriptParser.parse_lines(script_content.split('\n')))
+
+    @staticmethod
+    def parse_stream(chunks: Iterable[str]) -> Iterator[Tuple[str, str]]:
+        """
+        Incremental version of parse() for text arriving in arbitrary pieces
+        (e.g. streamed LLM tokens or blocks read from a file). Yields each
+        (Speaker, Text) tuple as soon as its line is terminated by a newline;
+        the last line is flushed at the end. Only the current line is buffered.
+        """
+        parse_line = ScriptParser.parse_line
+        partial = []  # Pieces of the line still waiting for its newline
+        for chunk in chunks:
+            if '\n' not in chunk:
+                partial.append(chunk)
+                continue
+            first, *complete, rest = chunk.split('\n')
+            partial.append(first)
+            parsed = parse_line("".join(partial))
+            if parsed:
+                yield parsed
+            for line in complete:
+                parsed = parse_line(line)
+                if parsed:
+                    yield parsed
+            partial = [rest]
+        parsed = parse_line("".join(partial))
+        if parsed:
+            yield parsed
+
+
+class VoiceResolver:
+    """
+    Maps the speaker names a script uses to the "Host" and "Guest" voices.
+    A name matches when it contains, or (if longer than two characters) is
+    contained in, the host's or guest's name, so "Dany" matches "Dany Bhatti".
+    Unknown names alternate by line index. Matches are memoized per name.
+    """
+    def __init__(self, host_name: str = "Host", guest_name: str = "Guest"):
+        self.host = host_name.lower().strip()
+        self.guest = guest_name.lower().strip()
+        self.known: Dict[str, Optional[str]] = {}  # speaker -> voice, None if it matched neither
+
+    def _match(self, speaker: str) -> Optional[str]:
+        name = speaker.lower().strip()
+        if (name in self.host and len(name) > 2) or (self.host in name):
+            return "Host"
+        if (name in self.guest and len(name) > 2) or (self.guest in name):
+            return "Guest"
+        return None
+
+    def resolve(self, speaker: str, idx: int) -> str:
+        if speaker in self.known:
+            voice = self.known[speaker]
+        else:
+            voice = self._match(speaker)
+            if len(self.known) < MAX_KNOWN_SPEAKERS:
+                self.known[speaker] = voice
+        if voice is None:
+            # Fallback for unexpected names
+            return "Host" if idx % 2 == 0 else "Guest"
+        return voice
@@ -0,0 +1,323 @@
+import hashlib
+import importlib.util
+import json
+import os
+import statistics
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ.setdefault("JOB_DB", os.path.join(_tmp.name, "jobs.db"))
+os.environ.setdefault("ARTIFACT_DIR", os.path.join(_tmp.name, "artifacts"))
+
+from fastapi.testclient import TestClient
+
+import api
+import audio_engine
+
+
+class SlowEngine:
+    """Stands in for AudioEngine; each render blocks its worker thread like Piper would."""
+    def __init__(self, output_dir=".", persistent=False, use_cache=True, trace=None):
+        self.output_dir = output_dir
+        self.trace = trace
+
+    def render_revision(self, lines, final_output, job_dir, previous=None, workers=None, on_audio=None):
+        time.sleep(0.5)
+        lines = list(lines)
+        models = [api.VOICE_MODELS.get(speaker, api.VOICE_MODELS["Host"]) for speaker, _ in lines]
+        reused = audio_engine.reusable_lines(previous["lines"] if previous else [], lines, models)
+        for idx, (speaker, text) in enumerate(lines):
+            if idx not in reused:
+                self.trace.record("synthesize", 0.1, voice=speaker, chars=len(text), audio_s=0.5, cached=False)
+        with self.trace.span("mix"):
+            open(final_output, "wb").close()
+        timeline = {"version": audio_engine.TIMELINE_VERSION, "reused_lines": len(reused),
+                    "synthesized_lines": len(lines) - len(reused),
+                    "lines": [{"speaker": speaker, "text": text, "model": model, "clip": "lines/x.wav"}
+                              for (speaker, text), model in zip(lines, models)]}
+        with open(os.path.join(job_dir, audio_engine.TIMELINE_FILE), "w") as f:
+            json.dump(timeline, f)
+        return timeline
+
+
+class TestManualEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(_tmp.name)
+        patcher = mock.patch.object(api, "AudioEngine", SlowEngine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def wait_for(self, client, job_id: str) -> dict:
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            job = client.get(f"/api/status/{job_id}").json()
+            if job["status"] in ("completed", "failed"):
+                return job
+            time.sleep(0.05)
+        self.fail(f"job {job_id} did not finish")
+
+    def status_latencies(self, client, job_id: str, count: int = 20):
+        latencies = []
+        for _ in range(count):
+            start = time.perf_counter()
+            client.get(f"/api/status/{job_id}")
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    def test_manual_returns_job_and_completes(self):
+        with TestClient(api.app) as client:
+            res = client.post("/api/manual", json={"script": "Host: Hello\nGuest: Hi"})
+            self.assertEqual(res.json()["status"], "queued")
+            job = self.wait_for(client, res.json()["jobId"])
+        self.assertEqual(job["status"], "completed")
+        self.assertTrue(job["filename"].startswith("manual_"))
+        self.assertEqual(set(job["timings"]["stages"]), {"parse", "synthesize", "mix"})
+        self.assertEqual(job["timings"]["synthesis"]["lines"], 2)
+        self.assertAlmostEqual(job["timings"]["synthesis"]["rtf"], 0.2)
+        self.assertEqual(len(job["spans"]), 4)
+
+    def test_manual_format(self):
+        with TestClient(api.app) as client:
+            job_id = client.post("/api/manual", json={"script": "Host: Hi", "format": "mp3"}).json()["jobId"]
+            job = self.wait_for(client, job_id)
+            res = client.get(f"/api/audio/{job['filename']}")
+            bad = client.post("/api/manual", json={"script": "Host: Hi", "format": "flac"})
+        self.assertTrue(job["filename"].endswith(".mp3"))
+        self.assertEqual(res.headers["content-type"], "audio/mpeg")
+        self.assertEqual(bad.status_code, 422)
+
+    def test_manual_revision_reuses_unchanged_lines(self):
+        with TestClient(api.app) as client:
+            first = client.post("/api/manual", json={"script": "Host: One\nGuest: Two\nHost: Three"}).json()
+            self.wait_for(client, first["jobId"])
+            res = client.post("/api/manual", json={"script": "Host: One\nGuest: Two, edited\nHost: Three",
+                                                   "previous_job_id": first["jobId"]})
+            job = self.wait_for(client, res.json()["jobId"])
+            missing = client.post("/api/manual", json={"script": "Host: Hi", "previous_job_id": "nope"})
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual((job["reused_lines"], job["synthesized_lines"]), (2, 1))
+        self.assertEqual(job["timings"]["synthesis"]["lines"], 1)
+        self.assertEqual(missing.status_code, 404)
+
+    def test_metrics_endpoint(self):
+        with TestClient(api.app) as client:
+            job_id = client.post("/api/manual", json={"script": "Host: Hello"}).json()["jobId"]
+            self.wait_for(client, job_id)
+            res = client.get("/metrics")
+        self.assertTrue(res.headers["content-type"].startswith("text/plain"))
+        self.assertIn("podcast_queue_depth 0", res.text)
+        self.assertIn('podcast_jobs{kind="manual",status="completed"}', res.text)
+        self.assertIn('podcast_stage_seconds_count{stage="mix"}', res.text)
+        self.assertIn('podcast_synthesis_real_time_factor_bucket{voice="Host",le="0.2"}', res.text)
+
+    def test_status_latency_flat_while_rendering(self):
+        with TestClient(api.app) as client:
+            idle_id = client.post("/api/manual", json={"script": "Host: warmup"}).json()["jobId"]
+            self.wait_for(client, idle_id)
+            idle = statistics.median(self.status_latencies(client, idle_id))
+
+            # Several renders in flight while /api/status keeps being polled
+            submitted = time.perf_counter()
+            ids = [client.post("/api/manual", json={"script": f"Host: line {i}"}).json()["jobId"]
+                   for i in range(4)]
+            self.assertLess(time.perf_counter() - submitted, 0.5)
+            busy = self.status_latencies(client, idle_id)
+            for job_id in ids:
+                self.wait_for(client, job_id)
+
+        # A blocked event loop would add a whole render (0.5s) to the polls
+        self.assertLess(statistics.median(busy), idle + 0.1)
+        self.assertLess(max(busy), 0.5)
+
+
+class TestJobTrace(unittest.TestCase):
+    def test_only_stage_spans_update_the_job(self):
+        with mock.patch.object(api.job_queue, "update") as update:
+            trace = api.job_trace("job")
+            for index in range(50):
+                trace.record("synthesize", 0.1, index=index, chars=300, chunks=3)
+                for chunk in range(3):
+                    trace.record("synthesize_chunk", 0.03, index=index, chunk=chunk, chars=100)
+            self.assertEqual(update.call_count, 0)
+            trace.record("mix", 0.5)
+        self.assertEqual(update.call_count, 1)
+        self.assertEqual(update.call_args.kwargs["timings"]["synthesis"]["chunks"]["count"], 150)
+
+    @unittest.skipIf(importlib.util.find_spec("numpy") is None, "numpy not installed")
+    def test_onnx_job_updates_once_per_stage(self):
+        import numpy as np
+
+        class PhonemizingTTS:
+            """Stands in for OnnxTTS, reporting phoneme cache stats like the real one."""
+            batch_size = 4
+
+            def voice(self, model):
+                return mock.Mock(sample_rate=16000)
+
+            def synthesize(self, texts, model, stats=None):
+                stats.update(phonemize_s=0.01, phoneme_hits=len(texts), phoneme_misses=1, saved_s=0.02)
+                return [np.full(len(text), 1000, dtype=np.int16) for text in texts]
+
+        lines = [("Host" if i % 2 else "Guest", f"line number {i}") for i in range(40)]
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(api.job_queue, "update") as update, \
+                mock.patch.object(audio_engine, "_onnx_tts", PhonemizingTTS()), \
+                mock.patch.object(audio_engine, "BACKGROUND_MUSIC", os.path.join(tmp, "none.wav")):
+            trace = api.job_trace("job")
+            engine = audio_engine.AudioEngine(output_dir=tmp, use_cache=False, trace=trace, backend="onnx")
+            engine.mix_audio(engine.synthesize_lines(lines), os.path.join(tmp, "out.wav"))
+
+        # 40 "synthesize" and 10 "phonemize" spans, but only the mix touches the job record
+        self.assertEqual(sum(1 for s in trace.spans if s["name"] == "phonemize"), 10)
+        self.assertEqual(update.call_count, 1)
+        self.assertEqual(update.call_args.kwargs["timings"]["phonemes"]["hits"], 40)
+
+
+EPISODE = "episode_" + "ab" * 16 + ".mp3"
+
+
+class TestAudioEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(_tmp.name)
+        self.data = bytes(range(256)) * 40
+        with open(EPISODE, "wb") as f:
+            f.write(self.data)
+        self.etag = f'"{hashlib.sha256(self.data).hexdigest()[:32]}"'
+
+    def tearDown(self):
+        os.remove(EPISODE)
+        os.chdir(self.cwd)
+
+    def get(self, **headers):
+        with TestClient(api.app) as client:
+            return client.get(f"/api/audio/{EPISODE}", headers=headers)
+
+    def test_full_file_with_cache_headers(self):
+        res = self.get()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, self.data)
+        self.assertEqual(res.headers["etag"], self.etag)
+        self.assertEqual(res.headers["accept-ranges"], "bytes")
+        self.assertIn("immutable", res.headers["cache-control"])
+        self.assertEqual(res.headers["content-type"], "audio/mpeg")
+
+    def test_byte_ranges(self):
+        res = self.get(Range="bytes=100-199")
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(res.content, self.data[100:200])
+        self.assertEqual(res.headers["content-range"], f"bytes 100-199/{len(self.data)}")
+        self.assertEqual(self.get(Range="bytes=-10").content, self.data[-10:])
+        self.assertEqual(self.get(Range="bytes=10000-").content, self.data[10000:])
+        unsatisfiable = self.get(Range=f"bytes={len(self.data)}-")
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable.headers["content-range"], f"bytes */{len(self.data)}")
+
+    def test_invalid_ranges_are_ignored(self):
+        # Malformed or invalid ranges get the whole file, not 416
+        for header in ("bytes=a-5", "bytes=5", "bytes=-", "bytes=9-3", "bytes=0-1,5-9", "items=0-9", "bytes=0x1-5"):
+            res = self.get(Range=header)
+            self.assertEqual((res.status_code, res.content), (200, self.data), header)
+        self.assertIsNone(api.parse_range("bytes=\u00b2-5", len(self.data)))  # Not an ASCII digit
+        # Only a valid range that misses the file is unsatisfiable
+        self.assertEqual(self.get(Range="bytes=-0").status_code, 416)
+        self.assertEqual(self.get(Range=f"bytes={len(self.data) + 5}-{len(self.data) + 9}").status_code, 416)
+
+    def test_conditional_requests(self):
+        not_modified = self.get(**{"If-None-Match": f'W/"stale", {self.etag}'})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b"")
+        # A range against an outdated copy gets the whole file
+        stale = self.get(Range="bytes=0-9", **{"If-Range": '"stale"'})
+        self.assertEqual((stale.status_code, len(stale.content)), (200, len(self.data)))
+
+    def test_etag_follows_content(self):
+        first = self.get().headers["etag"]
+        with open(EPISODE, "ab") as f:
+            f.write(b"more")
+        self.assertNotEqual(self.get().headers["etag"], first)
+
+    def test_missing_file(self):
+        with TestClient(api.app) as client:
+            self.assertEqual(client.get("/api/audio/missing.wav").status_code, 404)
+
+    def test_only_episode_files_are_served(self):
+        # Other files in the working directory are not episodes, whatever their name
+        names = ("jobs.db", "podcast.wav", "episode_" + "ab" * 16 + ".db")
+        with tempfile.TemporaryDirectory() as other:
+            os.chdir(other)
+            for name in names:
+                with open(name, "wb") as f:
+                    f.write(self.data)
+            with TestClient(api.app) as client:
+                for name in names:
+                    self.assertEqual(client.get(f"/api/audio/{name}").status_code, 404, name)
+            os.chdir(_tmp.name)
+
+    def test_parse_range(self):
+        self.assertEqual(api.parse_range("bytes=0-0", 10), (0, 0))
+        self.assertEqual(api.parse_range("bytes=5-100", 10), (5, 9))
+        self.assertIsNone(api.parse_range("bytes=0-1,4-5", 10))
+        self.assertIsNone(api.parse_range("items=0-1", 10))
+        self.assertIsNone(api.parse_range("bytes=abc", 10))
+        with self.assertRaises(ValueError):
+            api.parse_range("bytes=-0", 10)
+
+
+class TestBatchEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(_tmp.name)
+        self.batches = []
+
+        def fake_run_batch(episodes, persistent_tts=False, tts_workers=None, trace=None, on_update=None,
+                           scratch_dir=None):
+            self.batches.append(episodes)
+            results = []
+            for i, episode in enumerate(episodes):
+                status = "failed" if episode["topic"] == "broken" else "completed"
+                fields = {"status": status, "message": status,
+                          "output_file": episode["output_file"] if status == "completed" else None}
+                on_update(i, fields)
+                results.append(fields)
+            return results
+
+        patcher = mock.patch.object(api, "run_batch", fake_run_batch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def test_batch_reports_each_episode(self):
+        with TestClient(api.app) as client:
+            res = client.post("/api/batch", json={"episodes": [{"topic": "AI"}, {"topic": "broken", "model": "m"}]})
+            batch_id = res.json()["batchId"]
+            self.assertEqual([e["status"] for e in res.json()["episodes"]], ["batched", "batched"])
+            deadline = time.time() + 10
+            while client.get(f"/api/batch/{batch_id}").json()["status"] != "completed":
+                self.assertLess(time.time(), deadline)
+                time.sleep(0.05)
+            batch = client.get(f"/api/batch/{batch_id}").json()
+            first = client.get(f"/api/status/{batch['episodes'][0]['jobId']}").json()
+
+        self.assertEqual(batch["message"], "1 of 2 episodes generated.")
+        self.assertEqual([e["status"] for e in batch["episodes"]], ["completed", "failed"])
+        self.assertEqual(first["filename"], f"podcast_{first['id']}.wav")
+        self.assertEqual([e["model"] for e in self.batches[0]], ["qwen2.5:0.5b", "m"])
+
+    def test_batch_validation(self):
+        with TestClient(api.app) as client:
+            self.assertEqual(client.post("/api/batch", json={"episodes": []}).status_code, 422)
+            bad = {"episodes": [{"topic": "AI", "research_mode": "slow"}]}
+            self.assertEqual(client.post("/api/batch", json=bad).status_code, 422)
+            self.assertEqual(client.get("/api/batch/missing").status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
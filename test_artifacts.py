@@ -0,0 +1,92 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from unittest import mock
+
+import artifact_store
+from artifact_store import ArtifactStore
+
+
+class TestArtifactStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.removed = []
+        self.store = ArtifactStore(self.tmp.name, max_age=3600, max_bytes=2500, on_remove=self.removed.append)
+
+    def add_job(self, size: int, age: float = 0) -> str:
+        job_id = uuid.uuid4().hex
+        path = os.path.join(self.store.job_dir(job_id), f"podcast_{job_id}.wav")
+        with open(path, "wb") as f:
+            f.write(b"\0" * size)
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+        os.utime(os.path.dirname(path), (stamp, stamp))
+        return job_id
+
+    def jobs(self):
+        return set(os.listdir(self.store.jobs_dir))
+
+    def test_locate(self):
+        job_id = self.add_job(10)
+        path = self.store.locate(f"podcast_{job_id}.wav")
+        self.assertEqual(path, os.path.join(self.store.jobs_dir, job_id, f"podcast_{job_id}.wav"))
+        self.assertIsNone(self.store.locate(f"podcast_{uuid.uuid4().hex}.wav"))
+        self.assertIsNone(self.store.locate("../jobs.db"))
+
+    def test_scratch_is_private_and_removed(self):
+        with self.store.scratch("clips_") as first, self.store.scratch("clips_") as second:
+            self.assertNotEqual(first, second)
+            self.assertEqual(os.path.dirname(first), self.store.scratch_dir)
+            open(os.path.join(first, "line_000.wav"), "wb").close()
+        self.assertEqual(os.listdir(self.store.scratch_dir), [])
+
+    def test_sweep_by_age_then_size(self):
+        expired = self.add_job(100, age=7200)
+        oldest = self.add_job(1000, age=300)
+        middle = self.add_job(1000, age=200)
+        newest = self.add_job(1000, age=100)
+
+        result = self.store.sweep()
+        # The expired job goes, then the oldest until 2000 <= 2500 bytes remain
+        self.assertEqual(self.jobs(), {middle, newest})
+        self.assertEqual(result, {"removed_jobs": 2, "freed_bytes": 1100})
+        self.assertEqual(sorted(self.removed), sorted([expired, oldest]))
+        self.assertEqual(self.store.usage()["bytes"], 2000)
+
+    def test_jobs_being_written_are_kept(self):
+        old = self.add_job(5000, age=7200)
+        with self.store.job(old):
+            self.store.sweep()
+            self.assertEqual(self.jobs(), {old})
+        self.store.sweep()
+        self.assertEqual(self.jobs(), set())
+
+    def test_orphaned_scratch_removed(self):
+        os.makedirs(os.path.join(self.store.scratch_dir, "clips_crashed"))
+        with mock.patch.object(artifact_store.time, "time", return_value=time.time() + 7 * 3600):
+            self.store.sweep()
+        self.assertEqual(os.listdir(self.store.scratch_dir), [])
+
+    def test_background_sweeper(self):
+        self.add_job(100, age=7200)
+        swept = threading.Event()
+        original = self.store.sweep
+
+        def sweep():
+            result = original()
+            swept.set()
+            return result
+
+        with mock.patch.object(self.store, "sweep", sweep):
+            self.store.start(interval=60)
+            self.assertTrue(swept.wait(5))
+            self.store.stop()
+        self.assertEqual(self.jobs(), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
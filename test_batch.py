@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import podcast_agent
+from podcast_agent import run_batch
+
+
+class FakeEngine:
+    """Records the order lines are synthesized in; lines saying 'fail' produce no clip."""
+    synthesized = []
+
+    def __init__(self, output_dir=".", persistent=False, use_cache=True, trace=None):
+        self.output_dir = output_dir
+
+    def synthesize_lines(self, lines, workers=None, skip_failed=True):
+        clips = []
+        for idx, (voice, text) in enumerate(lines):
+            FakeEngine.synthesized.append((voice, text))
+            clips.append(None if "fail" in text else f"{voice}:{text}")
+        return clips
+
+    def mix_audio(self, clips, final_output):
+        with open(final_output, "w") as f:
+            f.write("\n".join(clips))
+
+
+class TestRunBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        FakeEngine.synthesized = []
+        self.researched = []
+        self.models = []
+
+        def research(topic, model, mode=None, usage=None):
+            self.researched.append(topic)
+            return f"notes on {topic}"
+
+        def llm(model, prompt, stats=None):
+            self.models.append(model)
+            topic = prompt.split("about:\n", 1)[1].split("\n", 1)[0]
+            yield f"Host: Welcome, {topic}\nGuest: Thanks, {topic}\n"
+
+        for name, value in (("research_topic", research), ("stream_ollama", llm), ("AudioEngine", FakeEngine)):
+            patcher = mock.patch.object(podcast_agent, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def episode(self, topic, model="a"):
+        return {"topic": topic, "model": model, "output_file": os.path.join(self.tmp.name, f"{len(topic)}-{model}.wav")}
+
+    def test_shared_work_is_deduplicated_and_grouped(self):
+        episodes = [self.episode("AI news", "a"), self.episode("Space", "b"),
+                    self.episode("ai  NEWS!", "b"), self.episode("Space", "a")]
+        updates = []
+        results = run_batch(episodes, on_update=lambda i, fields: updates.append((i, fields)))
+
+        self.assertEqual(sorted(self.researched), ["AI news", "Space"])
+        # One switch between models, no swapping back
+        self.assertEqual(self.models, ["b", "b", "a", "a"])
+        # Every Guest line comes before every Host line
+        voices = [voice for voice, _ in FakeEngine.synthesized]
+        self.assertEqual(voices, sorted(voices))
+        self.assertEqual(len(voices), 8)
+
+        self.assertEqual([r["status"] for r in results], ["completed"] * 4)
+        with open(results[2]["output_file"]) as f:
+            self.assertEqual(f.read(), "Host:Welcome, notes on AI news\nGuest:Thanks, notes on AI news")
+        self.assertIn((0, {"status": "completed", "message": "Podcast generated successfully.",
+                           "output_file": episodes[0]["output_file"]}), updates)
+
+    def test_failed_episode_does_not_stop_batch(self):
+        results = run_batch([self.episode("fail"), self.episode("Space")])
+        self.assertEqual([r["status"] for r in results], ["failed", "completed"])
+
+
+if __name__ == '__main__':
+    unittest.main()
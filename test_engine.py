@@ -0,0 +1,423 @@
+import io
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import wave
+from unittest import mock
+
+import audio_engine
+from audio_engine import AudioEngine, ClipCache
+from metrics import Trace
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class FlakyEngine(AudioEngine):
+    """AudioEngine that fakes Piper with random delays and a failing line."""
+    def generate_clip(self, text: str, speaker: str, index: int) -> str:
+        time.sleep(random.uniform(0, 0.02))
+        if text == "fail":
+            raise RuntimeError("piper crashed")
+        return os.path.join(self.output_dir, f"line_{index:03d}.wav")
+
+
+class TestParallelSynthesis(unittest.TestCase):
+    def test_order_kept_and_failures_skipped(self):
+        lines = [("Host", f"line {i}") for i in range(20)]
+        lines[5] = ("Guest", "fail")
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = FlakyEngine(output_dir=tmp, use_cache=False)
+            clips = engine.synthesize_lines(lines, workers=8)
+            expected = [os.path.join(tmp, f"line_{i:03d}.wav") for i in range(20) if i != 5]
+            self.assertEqual(clips, expected)
+
+
+class TestClipCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model = os.path.join(self.tmp.name, "voice.onnx")
+        with open(self.model, "wb") as f:
+            f.write(b"fake model")
+        with open(self.model + ".json", "w") as f:
+            f.write('{"inference": {"noise_scale": 0.667, "length_scale": 1, "noise_w": 0.8}}')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_clip(self, name: str, size: int) -> str:
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(b"\0" * size)
+        return path
+
+    def test_key_normalizes_text(self):
+        cache = ClipCache(os.path.join(self.tmp.name, "cache"))
+        self.assertEqual(cache.key(self.model, "Thanks  for having me. "),
+                         cache.key(self.model, "Thanks for having me."))
+        self.assertNotEqual(cache.key(self.model, "Thanks for having me."),
+                            cache.key(self.model, "Thanks for having us."))
+
+    def test_key_changes_with_inference_params(self):
+        cache = ClipCache(os.path.join(self.tmp.name, "cache"))
+        before = cache.key(self.model, "Hello")
+        with open(self.model + ".json", "w") as f:
+            f.write('{"inference": {"noise_scale": 0.5, "length_scale": 1, "noise_w": 0.8}}')
+        self.assertNotEqual(before, cache.key(self.model, "Hello"))
+
+    def test_hit_miss_and_lru_eviction(self):
+        cache = ClipCache(os.path.join(self.tmp.name, "cache"), max_bytes=250)
+        out = os.path.join(self.tmp.name, "out.wav")
+        self.assertFalse(cache.get("a", out))
+
+        cache.put("a", self.write_clip("a.wav", 100))
+        cache.put("b", self.write_clip("b.wav", 100))
+        os.utime(cache._path("a"), (1, 1))
+        os.utime(cache._path("b"), (2, 2))
+        self.assertTrue(cache.get("a", out))  # "a" becomes most recently used
+        cache.put("c", self.write_clip("c.wav", 100))
+
+        self.assertTrue(os.path.exists(cache._path("a")))
+        self.assertFalse(os.path.exists(cache._path("b")))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 2))
+        self.assertLessEqual(stats["bytes"], 250)
+
+
+def write_wav(path: str, samples, rate: int = 22050, channels: int = 1):
+    with wave.open(path, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(np.asarray(samples, dtype="<i2").tobytes())
+
+def read_wav(path: str):
+    with wave.open(path, "rb") as w:
+        return w.getframerate(), np.frombuffer(w.readframes(w.getnframes()), dtype="<i2")
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestNativeMix(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clips = []
+        for i, value in enumerate([1000, -2000]):
+            path = os.path.join(self.tmp.name, f"line_{i:03d}.wav")
+            write_wav(path, [value] * 100)
+            self.clips.append(path)
+        self.output = os.path.join(self.tmp.name, "out.wav")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_concat_without_music(self):
+        missing = os.path.join(self.tmp.name, "missing.wav")
+        with mock.patch.object(audio_engine, "BACKGROUND_MUSIC", missing):
+            AudioEngine(output_dir=self.tmp.name, use_cache=False).mix_audio(self.clips, self.output)
+        rate, samples = read_wav(self.output)
+        self.assertEqual(rate, 22050)
+        self.assertEqual(samples.tolist(), [1000] * 100 + [-2000] * 100)
+        self.assertFalse(any(os.path.exists(c) for c in self.clips))
+
+    def test_mix_is_traced(self):
+        trace = Trace()
+        missing = os.path.join(self.tmp.name, "missing.wav")
+        with mock.patch.object(audio_engine, "BACKGROUND_MUSIC", missing):
+            AudioEngine(output_dir=self.tmp.name, use_cache=False, trace=trace).mix_audio(self.clips, self.output)
+        self.assertEqual([(s["name"], s["clips"]) for s in trace.spans], [("mix", 2)])
+
+    def test_music_is_looped_and_gained(self):
+        music = os.path.join(self.tmp.name, "music.wav")
+        write_wav(music, [400, 400, 800, 800] * 15, channels=2)  # 30 stereo frames
+        with mock.patch.object(audio_engine, "BACKGROUND_MUSIC", music):
+            AudioEngine(output_dir=self.tmp.name, use_cache=False).mix_audio(self.clips, self.output)
+        _, samples = read_wav(self.output)
+        self.assertEqual(len(samples), 200)
+        # (voice * 1.5 + downmixed bed * 0.2) / 2, bed alternates 400/800 per frame
+        self.assertAlmostEqual(int(samples[0]), (1000 * 1.5 + 400 * 0.2) / 2, delta=1)
+        self.assertAlmostEqual(int(samples[31]), (1000 * 1.5 + 800 * 0.2) / 2, delta=1)
+        self.assertAlmostEqual(int(samples[150]), (-2000 * 1.5 + 400 * 0.2) / 2, delta=1)
+
+
+class FakeEncoder:
+    """Stands in for an ffmpeg encoder process, keeping what was piped to it."""
+    def __init__(self, args, stdin=None, stderr=None, returncode=0):
+        self.args = args
+        self.stdin = io.BytesIO()
+        self.stdin.close = lambda: None
+        self.stderr = io.BytesIO(b"" if returncode == 0 else b"Unknown encoder 'libopus'")
+        self.returncode = returncode
+        with open(args[-1], "wb") as f:
+            f.write(b"encoded")
+
+    def wait(self):
+        return self.returncode
+
+    def kill(self):
+        pass
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestEncodeOnMix(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.clips = []
+        for i, value in enumerate([1000, -2000]):
+            path = os.path.join(self.tmp.name, f"line_{i:03d}.wav")
+            write_wav(path, [value] * 100)
+            self.clips.append(path)
+        patcher = mock.patch.object(audio_engine, "BACKGROUND_MUSIC", os.path.join(self.tmp.name, "none.wav"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_format_from_extension(self):
+        self.assertEqual(audio_engine.output_format("a/podcast_1.OPUS"), "opus")
+        self.assertEqual(audio_engine.output_format("episode.m4a"), "aac")
+        self.assertIsNone(audio_engine.output_format("episode.flac"))
+
+    def test_pcm_piped_to_encoder_while_mixing(self):
+        encoders = []
+
+        def popen(args, **kwargs):
+            encoders.append(FakeEncoder(args, **kwargs))
+            return encoders[-1]
+
+        output = os.path.join(self.tmp.name, "out.opus")
+        with mock.patch.object(audio_engine.subprocess, "Popen", popen):
+            AudioEngine(output_dir=self.tmp.name, use_cache=False).mix_audio(self.clips, output)
+
+        args = encoders[0].args
+        self.assertEqual(args[args.index("-c:a") + 1], "libopus")
+        self.assertEqual(args[args.index("-b:a") + 1], "48k")
+        self.assertEqual(args[args.index("-ar") + 1], "22050")
+        pcm = np.frombuffer(encoders[0].stdin.getvalue(), dtype="<i2")
+        self.assertEqual(pcm.tolist(), [1000] * 100 + [-2000] * 100)
+        # Nothing but the encoded episode is left behind
+        self.assertEqual(os.listdir(self.tmp.name), ["out.opus"])
+
+    def test_encoder_failure_is_reported(self):
+        output = os.path.join(self.tmp.name, "out.opus")
+        with mock.patch.object(audio_engine.subprocess, "Popen",
+                               lambda args, **kwargs: FakeEncoder(args, returncode=1)):
+            with self.assertRaisesRegex(RuntimeError, "Unknown encoder"):
+                AudioEngine(output_dir=self.tmp.name, use_cache=False).mix_audio(self.clips, output)
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg not installed")
+    def test_compressed_formats_are_smaller(self):
+        speech = (np.sin(np.arange(22050 * 5) * 0.05) * 8000).astype("<i2")
+        wav = os.path.join(self.tmp.name, "long.wav")
+        write_wav(wav, speech)
+        sizes = {}
+        for fmt in ("opus", "mp3", "aac"):
+            clip = os.path.join(self.tmp.name, f"clip_{fmt}.wav")
+            shutil.copy(wav, clip)
+            output = os.path.join(self.tmp.name, "episode" + audio_engine.OUTPUT_FORMATS[fmt]["extension"])
+            AudioEngine(output_dir=self.tmp.name, use_cache=False).mix_audio([clip], output)
+            sizes[fmt] = os.path.getsize(output)
+        for fmt, size in sizes.items():
+            self.assertLess(size * 5, os.path.getsize(wav), fmt)
+
+
+class TestSplitText(unittest.TestCase):
+    def test_short_line_is_one_chunk(self):
+        self.assertEqual(audio_engine.split_text("Hello  there. Welcome.", 200), [("Hello there. Welcome.", 0.0)])
+        self.assertEqual(len(audio_engine.split_text("x " * 300, 0)), 1)
+
+    def test_sentences_then_clauses_then_words(self):
+        text = ("First sentence here. " + "Second one, with a clause, " + "word " * 8 + "ends! "
+                + "\"Quoted last.\" Tail")
+        chunks = audio_engine.split_text(text, 30)
+        self.assertTrue(all(len(chunk) <= 30 for chunk, _ in chunks), chunks)
+        self.assertEqual(" ".join(chunk for chunk, _ in chunks), " ".join(text.split()))
+        self.assertEqual(chunks[0], ("First sentence here.", audio_engine.TTS_SENTENCE_PAUSE_MS / 1000))
+        self.assertEqual(chunks[1], ("Second one, with a clause,", audio_engine.TTS_CLAUSE_PAUSE_MS / 1000))
+        # Cut after the closing quote, with short neighbours packed together
+        self.assertEqual(chunks[-2], ("word word ends! \"Quoted last.\"", audio_engine.TTS_SENTENCE_PAUSE_MS / 1000))
+        self.assertEqual(chunks[-1], ("Tail", 0.0))
+        # Runs of words cut mid-clause get no pause
+        self.assertIn(0.0, [pause for _, pause in chunks[2:-1]])
+
+
+class FakePool:
+    """Stands in for PiperPool: one frame of audio per character, after a short delay."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = self.peak = 0
+        self.texts = []
+
+    def synthesize(self, text: str, speaker: str, output_file: str) -> str:
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.texts.append(text)
+        time.sleep(0.05)
+        with wave.open(output_file, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(1000)
+            w.writeframes(b"\1\0" * len(text))
+        with self.lock:
+            self.active -= 1
+        return output_file
+
+
+class TestChunkedSynthesis(unittest.TestCase):
+    def test_long_line_chunks_run_in_parallel_and_are_stitched(self):
+        sentences = [f"Sentence number {i} is here." for i in range(4)]
+        trace = Trace()
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(audio_engine, "TTS_CHUNK_CHARS", 30), \
+                mock.patch.object(audio_engine, "TTS_SENTENCE_PAUSE_MS", 100):
+            engine = AudioEngine(output_dir=tmp, use_cache=False, trace=trace)
+            engine.pool = FakePool()
+            clip = engine.generate_clip(" ".join(sentences), "Host", 7)
+
+            self.assertEqual(sorted(engine.pool.texts), sentences)
+            self.assertGreater(engine.pool.peak, 1)
+            with wave.open(clip, "rb") as w:
+                frames = w.readframes(w.getnframes())
+            # Every character's frame plus 100ms of silence after the first three sentences
+            self.assertEqual(len(frames) // 2, sum(map(len, sentences)) + 3 * 100)
+            self.assertEqual(frames[-2:], b"\1\0")
+            self.assertEqual(os.listdir(tmp), ["line_007.wav"])
+
+        self.assertEqual(len(engine.chunk_latencies), 4)
+        line = next(s for s in trace.spans if s["name"] == "synthesize")
+        self.assertEqual((line["chunks"], line["cached"]), (4, False))
+        chunks = trace.summary()["synthesis"]["chunks"]
+        self.assertEqual((chunks["split_lines"], chunks["count"]), (1, 4))
+
+
+class TestSpanVoice(unittest.TestCase):
+    def test_spans_name_the_voice_not_the_speaker(self):
+        # Script speaker names are arbitrary; metrics are labelled by the voice that rendered them
+        trace = Trace()
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = AudioEngine(output_dir=tmp, use_cache=False, trace=trace)
+            engine.pool = FakePool()
+            engine.generate_clip("Hello.", "Dr \"Who\"", 0)
+            engine.generate_clip("Hi.", "Guest", 1)
+        self.assertEqual([s["voice"] for s in trace.spans if s["name"] == "synthesize"], ["Host", "Guest"])
+
+
+class SineEngine(AudioEngine):
+    """AudioEngine that fakes Piper by writing one constant-valued clip per line."""
+    def generate_clip(self, text: str, speaker: str, index: int) -> str:
+        if text == "fail":
+            raise RuntimeError("piper crashed")
+        time.sleep(random.uniform(0, 0.02))
+        path = os.path.join(self.output_dir, f"line_{index:03d}.wav")
+        write_wav(path, [int(text)] * 10)
+        return path
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestStreamAudio(unittest.TestCase):
+    def test_chunks_in_script_order(self):
+        lines = [("Host", str(v)) for v in (100, 200, 300)] + [("Guest", "fail"), ("Host", "400")]
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "out.wav")
+            engine = SineEngine(output_dir=tmp, use_cache=False)
+            with mock.patch.object(audio_engine, "BACKGROUND_MUSIC", os.path.join(tmp, "none.wav")):
+                chunks = list(engine.stream_audio(lines, output, workers=4))
+
+            self.assertEqual(chunks[0], audio_engine.wav_stream_header(22050))
+            values = [np.frombuffer(c, dtype="<i2")[0] for c in chunks[1:]]
+            self.assertEqual(values, [100, 200, 300, 400])
+            _, samples = read_wav(output)
+            self.assertEqual(samples.tobytes(), b"".join(chunks[1:]))
+
+
+class CountingSineEngine(SineEngine):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.texts = []
+
+    def generate_clip(self, text: str, speaker: str, index: int) -> str:
+        self.texts.append(text)
+        return super().generate_clip(text, speaker, index)
+
+
+class LinkedSineEngine(CountingSineEngine):
+    """Hands out clips hard-linked to a cache entry, as a clip cache hit does."""
+    def generate_clip(self, text: str, speaker: str, index: int) -> str:
+        clip = super().generate_clip(text, speaker, index)
+        cache_dir = os.path.join(self.output_dir, "cache")
+        os.makedirs(cache_dir, exist_ok=True)
+        os.link(clip, os.path.join(cache_dir, f"{index}_{text}.wav"))
+        return clip
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestRenderRevision(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        music = os.path.join(self.tmp.name, "music.wav")
+        write_wav(music, [(i * 997) % 20000 - 10000 for i in range(25)])  # Shorter than the episode, so it loops
+        patcher = mock.patch.object(audio_engine, "BACKGROUND_MUSIC", music)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def render(self, name, values, previous=None, on_audio=None, engine_class=None):
+        job_dir = os.path.join(self.tmp.name, name)
+        engine = (engine_class or CountingSineEngine)(output_dir=os.path.join(self.tmp.name, "scratch"), use_cache=False)
+        lines = [("Host" if i % 2 == 0 else "Guest", str(v)) for i, v in enumerate(values)]
+        timeline = engine.render_revision(lines, os.path.join(job_dir, "out.wav"), job_dir,
+                                          previous=previous, workers=3, on_audio=on_audio)
+        return engine, timeline, os.path.join(job_dir, "out.wav")
+
+    def test_one_line_edit_matches_full_render(self):
+        self.render("v1", [100, 200, 300, 400, 500, 600])
+        previous = audio_engine.load_timeline(os.path.join(self.tmp.name, "v1"))
+        chunks = []
+        engine, timeline, output = self.render("v2", [100, 200, 300, 450, 500, 600], previous, chunks.append)
+        _, _, full = self.render("full", [100, 200, 300, 450, 500, 600])
+
+        self.assertEqual(engine.texts, ["450"])
+        self.assertEqual((timeline["reused_lines"], timeline["synthesized_lines"], timeline["copied_lines"]),
+                         (5, 1, 3))
+        self.assertEqual(read_wav(output)[1].tobytes(), read_wav(full)[1].tobytes())
+        self.assertEqual(chunks[0], audio_engine.wav_stream_header(22050))
+        self.assertEqual(b"".join(chunks[1:]), read_wav(output)[1].tobytes())
+        self.assertEqual([(e["start"], e["frames"]) for e in timeline["lines"]], [(i * 10, 10) for i in range(6)])
+
+    def test_inserted_and_removed_lines(self):
+        self.render("v1", [100, 200, 300, 400])
+        previous = audio_engine.load_timeline(os.path.join(self.tmp.name, "v1"))
+        os.remove(os.path.join(self.tmp.name, "v1", "lines", "line_001.wav"))  # Lost clips are made again
+        # Speakers alternate by position, so the insert changes the voice of every line after it
+        engine, timeline, output = self.render("v2", [100, 200, 250, 300, 400], previous)
+        _, _, full = self.render("full", [100, 200, 250, 300, 400])
+
+        self.assertEqual(sorted(engine.texts), ["200", "250", "300", "400"])
+        self.assertEqual((timeline["reused_lines"], timeline["copied_lines"]), (1, 1))
+        self.assertEqual(read_wav(output)[1].tobytes(), read_wav(full)[1].tobytes())
+
+        engine, timeline, output = self.render("v3", [100, 250, 300, 400],
+                                               audio_engine.load_timeline(os.path.join(self.tmp.name, "v2")))
+        self.assertEqual(engine.texts, ["250", "300", "400"])
+        self.assertEqual(timeline["copied_lines"], 1)
+        self.assertEqual(read_wav(output)[1][:10].tobytes(), read_wav(full)[1][:10].tobytes())
+
+    def test_job_clips_share_no_files(self):
+        # Jobs are aged and sized by their own files, so clips must not be links
+        # into the clip cache or into an earlier revision
+        self.render("v1", [100, 200, 300], engine_class=LinkedSineEngine)
+        previous = audio_engine.load_timeline(os.path.join(self.tmp.name, "v1"))
+        engine, timeline, _ = self.render("v2", [100, 250, 300], previous, engine_class=LinkedSineEngine)
+        self.assertEqual(engine.texts, ["250"])
+        for name in ("v1", "v2"):
+            lines_dir = os.path.join(self.tmp.name, name, "lines")
+            for clip in os.listdir(lines_dir):
+                self.assertEqual(os.stat(os.path.join(lines_dir, clip)).st_nlink, 1, (name, clip))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from job_queue import JobQueue
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "jobs.db")
+        self.ran = []
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def handler(self, job_id: str, params: dict):
+        self.release.wait(5)
+        self.ran.append(params["name"])
+        self.queue.update(job_id, status="completed", filename=f"{params['name']}.wav")
+
+    def wait_for(self, count: int):
+        deadline = time.time() + 5
+        while len(self.ran) < count and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_priority_then_fifo(self):
+        self.queue = JobQueue(self.db, {"generate": self.handler}, slots=1)
+        for name, priority in [("a", 0), ("b", 0), ("c", 5), ("d", 0)]:
+            self.queue.submit("generate", {"name": name}, priority=priority)
+        self.release.set()
+        self.queue.start()
+        self.wait_for(4)
+        self.queue.stop()
+        self.assertEqual(self.ran, ["c", "a", "b", "d"])
+
+    def test_queue_position_and_eta(self):
+        self.queue = JobQueue(self.db, {"generate": self.handler}, slots=2)
+        self.queue.start()
+        ids = [self.queue.submit("generate", {"name": str(i)}) for i in range(5)]
+        time.sleep(0.2)  # Two slots pick up the first two jobs
+        first, last = self.queue.get(ids[2]), self.queue.get(ids[4])
+        self.assertEqual(first["queue_position"], 1)
+        self.assertEqual(last["queue_position"], 3)
+        self.assertGreater(last["estimated_wait_s"], first["estimated_wait_s"])
+        self.assertEqual(self.queue.depth(), 3)
+        self.release.set()
+        self.wait_for(5)
+        self.queue.stop()
+        self.assertEqual(self.queue.get(ids[4])["status"], "completed")
+        self.assertEqual(self.queue.get(ids[4])["filename"], "4.wav")
+
+    def test_jobs_survive_restart(self):
+        self.queue = JobQueue(self.db, {"generate": self.handler}, slots=1)
+        job_id = self.queue.submit("generate", {"name": "persisted"})
+        self.queue.update(job_id, status="processing")  # Interrupted mid-flight
+        self.queue.conn.close()
+
+        self.release.set()
+        self.queue = JobQueue(self.db, {"generate": self.handler}, slots=1)
+        self.queue.start()
+        self.wait_for(1)
+        self.queue.stop()
+        self.assertEqual(self.ran, ["persisted"])
+        self.assertEqual(self.queue.get(job_id)["status"], "completed")
+
+    def test_batch_requeued_but_not_its_episodes(self):
+        self.queue = JobQueue(self.db, {"batch": self.handler}, slots=1)
+        episode_id = self.queue.submit("episode", {"name": "episode"}, status="batched")
+        batch_id = self.queue.submit("batch", {"name": "batch"})
+        for job_id in (episode_id, batch_id):
+            self.queue.update(job_id, status="processing")  # Interrupted mid-flight
+        self.queue.conn.close()
+
+        self.queue = JobQueue(self.db, {"batch": self.handler}, slots=1)
+        self.queue.start()
+        time.sleep(0.1)  # The batch is picked up and waits in its handler
+        self.assertEqual(self.queue.get(batch_id)["status"], "processing")
+        self.assertEqual(self.queue.depth(), 0)
+        # The episode record was never handed to a worker (which would fail with KeyError)
+        episode = self.queue.get(episode_id)
+        self.assertEqual((episode["status"], episode["message"]), ("failed", "Interrupted by a restart"))
+        self.release.set()
+        self.wait_for(1)
+        self.queue.stop()
+        self.assertEqual(self.ran, ["batch"])
+        self.assertEqual(self.queue.get(batch_id)["status"], "completed")
+
+    def test_handler_failure_marks_job_failed(self):
+        def boom(job_id, params):
+            raise RuntimeError("ollama down")
+        self.queue = JobQueue(self.db, {"generate": boom}, slots=1)
+        job_id = self.queue.submit("generate", {})
+        self.queue.start()
+        deadline = time.time() + 5
+        while self.queue.get(job_id)["status"] != "failed" and time.time() < deadline:
+            time.sleep(0.01)
+        self.queue.stop()
+        self.assertEqual(self.queue.get(job_id)["message"], "ollama down")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from metrics import Histogram, Registry, Trace
+
+
+class TestTrace(unittest.TestCase):
+    def test_summary_totals_and_rtf(self):
+        seen = []
+        trace = Trace(seen.append)
+        with trace.span("research", topic="AI") as span:
+            span["sources"] = 3
+        trace.record("synthesize", 1.0, voice="Host", chars=40, audio_s=4.0, cached=False)
+        trace.record("synthesize", 0.5, voice="Guest", chars=20, audio_s=1.0, cached=False)
+        trace.record("synthesize", 0.01, voice="Host", chars=40, audio_s=4.0, cached=True)
+
+        self.assertEqual([s["name"] for s in seen], ["research", "synthesize", "synthesize", "synthesize"])
+        self.assertEqual(seen[0]["sources"], 3)
+        self.assertEqual(seen[1]["rtf"], 0.25)
+        self.assertNotIn("rtf", seen[3])  # Cache hits say nothing about synthesis speed
+
+        summary = trace.summary()
+        self.assertEqual(summary["stages"]["synthesize"], 1.51)
+        self.assertEqual(summary["synthesis"]["lines"], 3)
+        self.assertEqual(summary["synthesis"]["cached_lines"], 1)
+        self.assertEqual(summary["synthesis"]["characters"], 100)
+        self.assertEqual(summary["synthesis"]["audio_s"], 9.0)
+        self.assertEqual(summary["synthesis"]["rtf"], 0.3)  # 1.5s for 5s of fresh audio
+
+    def test_summary_reports_cold_model(self):
+        trace = Trace()
+        trace.record("script_generation", 4.0, model="m", first_token_s=2.5, load_s=2.1, cold=True)
+        self.assertEqual(trace.summary()["llm"], {"model": "m", "cold": True, "first_token_s": 2.5, "load_s": 2.1})
+
+
+class TestPrometheus(unittest.TestCase):
+    def test_histogram_is_cumulative(self):
+        histogram = Histogram("latency", "Test.", (1, 5))
+        for value in (0.5, 2, 10):
+            histogram.observe(value, stage="mix")
+        text = "\n".join(histogram.render())
+        self.assertIn('latency_bucket{stage="mix",le="1"} 1', text)
+        self.assertIn('latency_bucket{stage="mix",le="5"} 2', text)
+        self.assertIn('latency_bucket{stage="mix",le="+Inf"} 3', text)
+        self.assertIn('latency_sum{stage="mix"} 12.5', text)
+        self.assertIn('latency_count{stage="mix"} 3', text)
+
+    def test_registry_renders_gauges(self):
+        registry = Registry()
+        registry.observe_span({"name": "parse", "duration_s": 0.01})
+        text = registry.render({"queue_depth": ("Queued jobs.", {(): 2})})
+        self.assertIn("# TYPE queue_depth gauge\nqueue_depth 2", text)
+        self.assertIn('podcast_stage_seconds_count{stage="parse"} 1', text)
+
+    def test_label_values_are_escaped(self):
+        histogram = Histogram("latency", "Test.", (1,))
+        histogram.observe(0.5, model='a"b\\c\nd')
+        self.assertIn('latency_count{model="a\\"b\\\\c\\nd"} 1', "\n".join(histogram.render()))
+
+    def test_first_token_split_by_model_state(self):
+        registry = Registry()
+        registry.observe_span({"name": "script_generation", "duration_s": 3, "model": "m",
+                               "first_token_s": 2.0, "cold": True})
+        registry.observe_span({"name": "script_generation", "duration_s": 1, "model": "m",
+                               "first_token_s": 0.08, "cold": False})
+        text = registry.render()
+        self.assertIn('podcast_llm_first_token_seconds_bucket{model="m",state="cold",le="2.5"} 1', text)
+        self.assertIn('podcast_llm_first_token_seconds_bucket{model="m",state="warm",le="0.1"} 1', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import podcast_agent
+from podcast_agent import ModelCatalog
+
+
+class StubTags(BaseHTTPRequestHandler):
+    """Answers /api/tags like Ollama with the server's current model list."""
+    def do_GET(self):
+        self.server.requests += 1
+        time.sleep(self.server.delay)
+        payload = json.dumps({"models": [
+            {"name": name, "size": size, "modified_at": "2024-01-01T00:00:00Z",
+             "details": {"family": "qwen2", "parameter_size": "494M", "quantization_level": "Q4_K_M"}}
+            for name, size in self.server.models
+        ]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestModelCatalog(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubTags)
+        self.server.daemon_threads = True
+        self.server.models = [("qwen2.5:0.5b", 397821319)]
+        self.server.requests = 0
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sizes_and_details(self):
+        snapshot = ModelCatalog(self.url, ttl=60).snapshot()
+        self.assertFalse(snapshot["stale"])
+        model = snapshot["models"][0]
+        self.assertEqual((model["name"], model["size"]), ("qwen2.5:0.5b", 397821319))
+        self.assertEqual((model["parameter_size"], model["quantization"]), ("494M", "Q4_K_M"))
+
+    def test_cached_within_ttl(self):
+        catalog = ModelCatalog(self.url, ttl=60)
+        for _ in range(5):
+            self.assertEqual(catalog.names(), ["qwen2.5:0.5b"])
+        self.assertEqual(self.server.requests, 1)
+
+    def test_stale_list_served_while_refreshing(self):
+        catalog = ModelCatalog(self.url, ttl=60)
+        catalog.names()
+        self.server.models.append(("llama3.2", 2019393189))
+        self.server.delay = 0.5
+
+        with mock.patch.object(podcast_agent.time, "time", return_value=time.time() + 61):
+            start = time.perf_counter()
+            snapshot = catalog.snapshot()
+            self.assertLess(time.perf_counter() - start, 0.25)
+        self.assertEqual([m["name"] for m in snapshot["models"]], ["qwen2.5:0.5b"])
+        self.assertTrue(snapshot["stale"])
+
+        deadline = time.time() + 5
+        while catalog.refreshing and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(catalog.names(), ["qwen2.5:0.5b", "llama3.2"])
+        self.assertEqual(catalog.size_of("llama3.2"), 2019393189)
+
+    def test_failed_refresh_keeps_previous_list(self):
+        catalog = ModelCatalog(self.url, ttl=0)
+        catalog.refresh()
+        catalog.base_url, catalog.timeout = "http://127.0.0.1:9", 0.5
+        catalog.refresh()
+        self.assertEqual([m["name"] for m in catalog.models], ["qwen2.5:0.5b"])
+        self.assertIsNotNone(catalog.error)
+
+    def test_unreachable_ollama_only_blocks_the_first_read(self):
+        self.server.delay = 1.0
+        catalog = ModelCatalog(self.url, ttl=60, timeout=0.2, retry_after=0)
+        self.assertEqual(catalog.names(), [])  # The first fetch times out
+        self.assertIsNotNone(catalog.error)
+
+        self.server.delay = 0.5
+        for _ in range(5):
+            start = time.perf_counter()
+            self.assertEqual(catalog.names(), [])
+            self.assertLess(time.perf_counter() - start, 0.1)
+        # Ollama is back: a background retry loads the list
+        self.server.delay = 0
+        deadline = time.time() + 5
+        while catalog.models is None and time.time() < deadline:
+            catalog.names()
+            time.sleep(0.05)
+        self.assertEqual(catalog.names(), ["qwen2.5:0.5b"])
+
+    def test_fallback_when_ollama_is_down(self):
+        catalog = ModelCatalog("http://127.0.0.1:9", ttl=60, timeout=0.5)
+        with mock.patch.object(podcast_agent, "_model_catalog", catalog):
+            self.assertEqual(podcast_agent.get_ollama_models(), ["qwen2.5:0.5b"])
+
+
+if __name__ == '__main__':
+    unittest.main()
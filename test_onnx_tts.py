@@ -0,0 +1,227 @@
+import os
+import tempfile
+import time
+import unittest
+import wave
+from unittest import mock
+
+import audio_engine
+import onnx_tts
+from audio_engine import AudioEngine
+from metrics import Trace
+
+try:
+    import numpy as np
+    from onnx_tts import OnnxVoice
+except ImportError:
+    np = None
+
+VOICE = "./en_US-lessac-medium.onnx"
+
+
+class FakePhonemizer:
+    """One 'phoneme' per letter; sentences are split on '|'."""
+    def phonemize(self, text, voice, stats=None):
+        return [[c for c in sentence if c.isalpha()] for sentence in text.split("|")]
+
+
+class FakeSession:
+    """VITS-like output: 1000 samples of 0.5 per phoneme ID, zero-padded to the longest sequence."""
+    SAMPLES_PER_ID = 1000
+
+    def __init__(self):
+        self.batches = []
+
+    def run(self, outputs, inputs):
+        ids, lengths = inputs["input"], inputs["input_lengths"]
+        self.batches.append(len(lengths))
+        audio = np.zeros((len(lengths), 1, ids.shape[1] * self.SAMPLES_PER_ID), dtype=np.float32)
+        for row, length in enumerate(lengths):
+            audio[row, 0, :length * self.SAMPLES_PER_ID] = 0.5
+        return [audio]
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestOnnxVoice(unittest.TestCase):
+    def setUp(self):
+        self.session = FakeSession()
+        self.voice = OnnxVoice(VOICE, session=self.session, phonemizer=FakePhonemizer())
+
+    def test_config_and_phoneme_ids(self):
+        self.assertEqual(self.voice.sample_rate, 22050)
+        self.assertEqual(self.voice.espeak_voice, "en-us")
+        id_map = self.voice.id_map
+        # BOS PAD, each phoneme followed by PAD, EOS; unknown phonemes are dropped
+        self.assertEqual(self.voice.phoneme_ids(["h", "\uffff", "i"]),
+                         id_map["^"] + id_map["_"] + id_map["h"] + id_map["_"] + id_map["i"] + id_map["_"] + id_map["$"])
+
+    def test_sentences_batched_and_reassembled(self):
+        texts = ["ab|abcdef", "abc", "abcdefhi"]
+        audio = self.voice.synthesize(texts, batch_size=2, sentence_silence=0.001)
+        self.assertEqual(self.session.batches, [2, 2])
+
+        silence = int(22050 * 0.001)
+        # 1000 samples per phoneme ID: BOS, PAD, 2 per letter, EOS. Each sentence
+        # is cut 50 ms after the end of its last voiced 10 ms window (220 samples);
+        # one that fills the batch width is kept whole
+        self.assertEqual([len(a) for a in audio], [32 * 220 + 1102 + silence + 69 * 220 + 1102,
+                                                   (3 + 3 * 2) * 1000, (3 + 8 * 2) * 1000])
+        # Peak-normalized to full scale like piper's output
+        self.assertEqual(audio[1].dtype, np.int16)
+        self.assertEqual(int(audio[1].max()), 32767)
+        self.assertEqual(int(audio[0][7000:32 * 220 + 1102 + silence].max()), 0)
+
+    def test_padding_trimmed_from_the_row_with_most_ids(self):
+        # Durations are predicted, so the sequence with more IDs can be the shorter clip
+        class SlowShortSession(FakeSession):
+            def run(self, outputs, inputs):
+                lengths = inputs["input_lengths"]
+                audio = np.zeros((len(lengths), 1, 20000), dtype=np.float32)
+                for row, length in enumerate(lengths):
+                    audio[row, 0, :(4 if length == max(lengths) else 18) * 1000] = 0.5
+                return [audio]
+
+        voice = OnnxVoice(VOICE, session=SlowShortSession(), phonemizer=FakePhonemizer())
+        short, long = voice.infer([voice.phoneme_ids(list("abcdef")), voice.phoneme_ids(list("ab"))])
+        self.assertEqual(len(short), 4000 // 220 * 220 + 220 + 1102)
+        self.assertEqual(len(long), 18000 // 220 * 220 + 220 + 1102)
+
+    def test_quiet_tail_survives_padding_trim(self):
+        rng = np.random.default_rng(0)
+        # Speech, then a breathy ending far below the peak, then batch padding
+        tail = rng.uniform(-0.0008, 0.0008, 800).astype(np.float32)
+        audio = np.concatenate([np.full(4410, 0.5, dtype=np.float32), tail, np.zeros(6000, dtype=np.float32)])
+        trimmed = onnx_tts._trim_padding(audio, 22050)
+        self.assertGreaterEqual(len(trimmed), 4410 + 800)
+        self.assertTrue(np.array_equal(trimmed[:5210], audio[:5210]))
+        self.assertLess(len(trimmed), len(audio) - 4000)  # The padding is still dropped
+        self.assertEqual(len(onnx_tts._trim_padding(np.zeros(5000, dtype=np.float32), 22050)), 0)
+
+
+@unittest.skipUnless(os.path.exists(onnx_tts.ESPEAK_LIBRARY), "bundled espeak-ng not found")
+class TestEspeakPhonemizer(unittest.TestCase):
+    def test_sentences_and_punctuation(self):
+        phonemizer = onnx_tts.EspeakPhonemizer()
+        phonemizer.phonemize_espeak = None  # Always exercise the bundled library
+        sentences = phonemizer.phonemize("Hello there, friend. How are you?", "en-us")
+        self.assertEqual(["".join(s) for s in sentences], ["həlˈoʊ ðˈɛɹ, fɹˈɛnd.", "hˈaʊ ɑːɹ juː?"])
+
+
+class TestPhonemeCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "phonemes.sqlite3")
+
+    def test_memory_lru_backed_by_disk(self):
+        cache = onnx_tts.PhonemeCache(self.path, memory_entries=2, max_entries=100)
+        for phrase in ("one", "two", "three"):
+            self.assertIsNone(cache.get("en-us", phrase))
+            cache.put("en-us", phrase, [list(phrase)], seconds=0.01 * len(phrase))
+        self.assertEqual(list(cache.memory), [("en-us", "two"), ("en-us", "three")])
+
+        stats = {}
+        self.assertEqual(cache.get("en-us", "one", stats), [list("one")])  # From disk
+        self.assertEqual(cache.get("en-us", "one", stats), [list("one")])  # From memory
+        self.assertIsNone(cache.get("en-gb", "one"))
+        self.assertEqual(stats["phoneme_hits"], 2)
+        # Misses cost 0.01s per character, so each hit on "one" saved 0.03s
+        self.assertAlmostEqual(stats["saved_s"], 0.06)
+        self.assertEqual((cache.stats()["disk_hits"], cache.stats()["misses"]), (1, 4))
+
+        reopened = onnx_tts.PhonemeCache(self.path)
+        self.assertEqual(reopened.get("en-us", "three"), [list("three")])
+        self.assertEqual(reopened.stats()["entries"], 3)
+
+    def test_least_recently_used_evicted_from_disk(self):
+        cache = onnx_tts.PhonemeCache(self.path, memory_entries=1, max_entries=10)
+        for n in range(10):
+            cache.put("en-us", f"phrase {n}", [["a"]], seconds=0.001)
+            time.sleep(0.002)
+        cache.get("en-us", "phrase 0")  # Used again, so it is now the newest
+        cache.put("en-us", "phrase 10", [["a"]], seconds=0.001)
+        # A tenth of max_entries is dropped, oldest first
+        self.assertEqual(cache.entries, 9)
+        self.assertIsNotNone(cache.get("en-us", "phrase 0"))
+        self.assertIsNone(cache.get("en-us", "phrase 1"))
+        self.assertIsNone(cache.get("en-us", "phrase 2"))
+
+    def test_phrases_cached_across_texts(self):
+        class CountingPhonemizer(onnx_tts.EspeakPhonemizer):
+            calls = []
+
+            def _phonemize(self, text, voice):
+                self.calls.append(text)
+                words = [c for c in text if c != " "]
+                end = text.rstrip()[-1:]
+                return [words] if end not in ".?!" else [words[:-1] + [end]]
+
+        phonemizer = CountingPhonemizer(cache=onnx_tts.PhonemeCache(self.path))
+        first = phonemizer.phonemize("Hi Ada, welcome. Ready?", "en-us")
+        self.assertEqual(["".join(s) for s in first], ["HiAda,welcome.", "Ready?"])
+        stats = {}
+        second = phonemizer.phonemize("Hi  Ada, good to see you.", "en-us", stats)
+        self.assertEqual(["".join(s) for s in second], ["HiAda,goodtoseeyou."])
+        self.assertEqual(CountingPhonemizer.calls, ["Hi Ada,", "welcome.", "Ready?", "good to see you."])
+        self.assertEqual((stats["phoneme_hits"], stats["phoneme_misses"]), (1, 1))
+
+
+@unittest.skipUnless(os.path.exists(onnx_tts.ESPEAK_LIBRARY), "bundled espeak-ng not found")
+class TestCachedEspeakParity(unittest.TestCase):
+    def test_phrase_cache_matches_whole_text(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cached = onnx_tts.EspeakPhonemizer(cache=onnx_tts.PhonemeCache(os.path.join(tmp, "p.sqlite3")))
+            cached.phonemize_espeak = None
+            texts = ["Hello there, friend. How are you?",
+                     "Welcome back to Tech Talk; today: AI news! Dr. Smith joins us, as always.",
+                     "Well... maybe. I read 3.5 books, e.g. Dune.",
+                     "It was 5 p.m. when we started.", "phones, laptops, etc. and more.", "approx. ten dollars",
+                     "We met at 5 p.m. Then we left. Wait! 3 more."]
+            for text in texts:
+                whole = cached._phonemize(text, "en-us")
+                self.assertEqual(cached.phonemize(text, "en-us"), whole, text)
+                self.assertEqual(cached.phonemize(text, "en-us"), whole, text)
+            self.assertGreater(cached.cache.stats()["hit_rate"], 0.4)
+
+
+class FakeOnnxTTS:
+    """Stands in for OnnxTTS: one sample per character, recording each call."""
+    batch_size = 2
+
+    def __init__(self):
+        self.calls = []
+
+    def voice(self, model):
+        return mock.Mock(sample_rate=16000)
+
+    def synthesize(self, texts, model, stats=None):
+        self.calls.append((os.path.basename(model), list(texts)))
+        return [np.full(len(text), 1000, dtype=np.int16) for text in texts]
+
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestOnnxBackend(unittest.TestCase):
+    def test_lines_batched_per_voice(self):
+        tts = FakeOnnxTTS()
+        trace = Trace()
+        lines = [("Host", "one"), ("Guest", "two"), ("Host", "three"), ("Host", "four"), ("Guest", "five")]
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(audio_engine, "_onnx_tts", tts):
+            engine = AudioEngine(output_dir=tmp, persistent=True, use_cache=False, trace=trace, backend="onnx")
+            self.assertIsNone(engine.pool)
+            clips = engine.synthesize_lines(lines, workers=2)
+
+            self.assertEqual(clips, [os.path.join(tmp, f"line_{i:03d}.wav") for i in range(5)])
+            for clip, (_, text) in zip(clips, lines):
+                with wave.open(clip, "rb") as w:
+                    self.assertEqual((w.getframerate(), w.getnframes()), (16000, len(text)))
+
+        self.assertEqual(sorted(tts.calls), [("en_US-lessac-medium.onnx", ["four"]),
+                                             ("en_US-lessac-medium.onnx", ["one", "three"]),
+                                             ("en_US-ryan-medium.onnx", ["two", "five"])])
+        spans = [s for s in trace.spans if s["name"] == "synthesize"]
+        self.assertEqual(sorted(s["index"] for s in spans), [0, 1, 2, 3, 4])
+        self.assertEqual(trace.summary()["synthesis"]["lines"], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
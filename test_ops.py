@@ -1,5 +1,5 @@
 import unittest
-from podcast_agent import search_tool, local_llm
+from podcast_agent import search_tool, stream_ollama
 
 class TestPodcastAgent(unittest.TestCase):
     def test_search_tool(self):
@@ -11,7 +11,7 @@ class TestPodcastAgent(unittest.TestCase):
 
     def test_llm_connectivity(self):
         print("\nTesting LLM Connectivity...")
-        response = local_llm.invoke("Say 'Test Successful'")
+        response = "".join(stream_ollama("qwen2.5:0.5b", "Say 'Test Successful'"))
         print(f"LLM Response: {response}")
         self.assertTrue(len(response) > 0, "LLM should return a response")
 
@@ -0,0 +1,91 @@
+import io
+import random
+import time
+import tracemalloc
+import unittest
+
+from bench_parser import blocks, legacy_parse, legacy_parse_line, legacy_voice_for, make_transcript
+from script_parser import ScriptParser, VoiceResolver
+
+# Pieces that exercise every branch: separators, markup, headers, case folding
+# ('ſ' and the Kelvin sign match [a-z] under IGNORECASE), odd whitespace
+FRAGMENTS = ["Host", "Guest", "says", "SAYS", ":", "-", " ", "  ", "\t", "\r", "\x0b", "\x1c", "*", "**", "#",
+             "\"", "'", "scene", "Scene", "NAME", "text", "Speaker", "a", "Z", "7", "ſ", "K", "ı",
+             "é", "—", "?", "hello there", "Dany", "A very long speaker name indeed"]
+
+
+def random_script(rng: random.Random, lines: int) -> str:
+    return "\n".join("".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 12))) for _ in range(lines))
+
+
+def random_chunks(rng: random.Random, text: str):
+    start = 0
+    while start < len(text):
+        size = rng.choice([1, 2, 3, 7, 64, 1000])
+        yield text[start:start + size]
+        start += size
+
+
+class TestParserParity(unittest.TestCase):
+    """The precompiled parser must give exactly what the original one did."""
+    def test_fuzz_parse(self):
+        rng = random.Random(1234)
+        for _ in range(300):
+            script = random_script(rng, rng.randint(1, 40))
+            expected = legacy_parse(script)
+            self.assertEqual(ScriptParser.parse(script), expected, repr(script))
+            self.assertEqual(list(ScriptParser.parse_stream(random_chunks(rng, script))), expected, repr(script))
+            self.assertEqual(list(ScriptParser.parse_lines(io.StringIO(script))), expected, repr(script))
+
+    def test_fuzz_single_lines_with_newlines(self):
+        rng = random.Random(99)
+        for _ in range(2000):
+            line = "".join(rng.choice(FRAGMENTS + ["\n"]) for _ in range(rng.randint(0, 10)))
+            self.assertEqual(ScriptParser.parse_line(line), legacy_parse_line(line), repr(line))
+
+    def test_generated_transcript(self):
+        script = make_transcript(5000, seed=7)
+        self.assertEqual(ScriptParser.parse(script), legacy_parse(script))
+
+    def test_fuzz_voice_resolver(self):
+        rng = random.Random(5)
+        names = ["Host", "Guest", "Dany Bhatti", "dany", "Al", "AL ", "Bob", "Guest Star", "x", "Dr Who", ""]
+        for _ in range(200):
+            host, guest = rng.choice(names), rng.choice(names)
+            resolver = VoiceResolver(host, guest)
+            for idx in range(20):
+                speaker = rng.choice(names + ["Narrator", "dany b", "Guest 2"])
+                self.assertEqual(resolver.resolve(speaker, idx), legacy_voice_for(speaker, idx, host, guest),
+                                 (speaker, idx, host, guest))
+
+
+class TestParserPerformance(unittest.TestCase):
+    def test_not_slower_than_original(self):
+        script = make_transcript(20000)
+        times = {legacy_parse: [], ScriptParser.parse: []}
+        # Interleaved, best of five, so a noisy neighbour hits both alike
+        for _ in range(5):
+            for fn, runs in times.items():
+                start = time.perf_counter()
+                fn(script)
+                runs.append(time.perf_counter() - start)
+
+        legacy, current = min(times[legacy_parse]), min(times[ScriptParser.parse])
+        print(f"\nparse: {current * 1000:.0f} ms, original: {legacy * 1000:.0f} ms")
+        self.assertLess(current, legacy * 1.1)
+
+    def test_streaming_memory_is_bounded(self):
+        script = make_transcript(60000)  # About 5 MB
+        tracemalloc.start()
+        try:
+            count = sum(1 for _ in ScriptParser.parse_stream(blocks(script, 64 * 1024)))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(count, len(legacy_parse(script)))
+        # A couple of blocks in flight, nowhere near the size of the transcript
+        self.assertLess(peak, 1024 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,284 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import podcast_agent
+from podcast_agent import (PageFetcher, ResultCache, extract_key_sentences, fast_research,
+                           format_bundle, gather_research, html_to_text)
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_normalize_topic(self):
+        self.assertEqual(ResultCache.normalize("  Artificial  Intelligence! "),
+                         ResultCache.normalize("artificial intelligence"))
+        self.assertNotEqual(ResultCache.normalize("AI news"), ResultCache.normalize("AI music"))
+        self.assertEqual(ResultCache.normalize("Latest AI news?"), ResultCache.normalize("latest ai news."))
+        # Symbols can be all that tells two topics apart
+        topics = ["C++ news", "C# news", "C news", ".NET news", "R&D news", "R D news"]
+        self.assertEqual(len({ResultCache.normalize(topic) for topic in topics}), len(topics))
+        self.assertEqual(ResultCache.normalize("  c++  NEWS! "), "c++ news")
+
+    def test_entries_survive_restart_and_expire(self):
+        cache = ResultCache(self.tmp.name, ttl=60)
+        cache.put("k", "summary")
+        reopened = ResultCache(self.tmp.name, ttl=60)
+        self.assertEqual(reopened.get("k"), "summary")
+
+        with mock.patch.object(podcast_agent.time, "time", return_value=time.time() + 61):
+            self.assertIsNone(reopened.get("k"))
+        self.assertFalse(os.path.exists(reopened._path("k")))
+        self.assertEqual((reopened.hits, reopened.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        cache = ResultCache(self.tmp.name, ttl=60, max_entries=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        now = time.time()
+        os.utime(cache._path("a"), (now - 20, now - 20))
+        os.utime(cache._path("b"), (now - 10, now - 10))
+        cache.get("a")  # "a" becomes most recently used
+        cache.put("c", "3")
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["entries"], 2)
+
+
+@unittest.skipIf(importlib.util.find_spec("crewai") is None, "crewai not installed")
+class TestCachedResearch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(podcast_agent, "_research_caches",
+                                    {kind: ResultCache(os.path.join(self.tmp.name, kind), ttl=60)
+                                     for kind in ("research", "scrape", "search")})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_search_results_are_cached_per_query(self):
+        calls = []
+
+        class FakeDDGS:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def text(self, query, max_results):
+                calls.append(query)
+                return [{"title": query}]
+
+        from research_tools import SearchTool
+        with mock.patch.dict(sys.modules, {"duckduckgo_search": types.SimpleNamespace(DDGS=FakeDDGS)}):
+            tool = SearchTool()
+            first = tool._run("Latest AI news")
+            second = tool._run("latest ai news?")
+        self.assertEqual(first, second)
+        self.assertEqual(calls, ["Latest AI news"])
+
+    def test_research_reused_across_models(self):
+        crew = mock.MagicMock()
+        crew.return_value.kickoff.return_value = "- AI is moving fast"
+        with mock.patch("crewai.Crew", crew), mock.patch("crewai.Agent"), mock.patch("crewai.Task"), \
+                mock.patch("crewai.LLM"):
+            first = podcast_agent.research_topic("AI News", "qwen2.5:0.5b")
+            second = podcast_agent.research_topic("ai news", "llama3.2")
+        self.assertEqual(first, second)
+        self.assertEqual(crew.return_value.kickoff.call_count, 1)
+
+    def test_failed_research_is_not_cached(self):
+        crew = mock.MagicMock()
+        crew.return_value.kickoff.side_effect = RuntimeError("ollama down")
+        with mock.patch("crewai.Crew", crew), mock.patch("crewai.Agent"), mock.patch("crewai.Task"), \
+                mock.patch("crewai.LLM"):
+            podcast_agent.research_topic("AI", "m")
+            podcast_agent.research_topic("AI", "m")
+        self.assertEqual(crew.return_value.kickoff.call_count, 2)
+
+PAGE = (
+    "<html><head><title>Story {n}</title><style>p {{color: red}}</style></head>"
+    "<body><nav>Home | About</nav><p>Paragraph one of story {n}.</p>"
+    "<script>var x = 1;</script><p>Paragraph two.</p></body></html>"
+)
+
+
+class FixtureSite(BaseHTTPRequestHandler):
+    """
+    Serves /story/N and tracks how many requests overlap. With server.gate
+    set, a story is held until `gate` requests are in flight (or every
+    expected request has arrived), so overlap doesn't depend on timing.
+    """
+    def do_GET(self):
+        with self.server.lock:
+            self.server.hits.append(self.path)
+            self.server.active += 1
+            self.server.peak = max(self.server.peak, self.server.active)
+            self.server.lock.notify_all()
+        try:
+            if self.path == "/slow":
+                time.sleep(2)
+            elif self.server.gate:
+                with self.server.lock:
+                    # The timeout only keeps a broken fetcher from hanging the suite
+                    self.server.lock.wait_for(lambda: self.server.active >= self.server.gate
+                                              or len(self.server.hits) >= self.server.expected, timeout=5)
+            else:
+                time.sleep(0.2)
+            if self.path.startswith("/story/"):
+                body = PAGE.format(n=self.path.rsplit("/", 1)[1]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+            else:
+                body = b"missing"
+                self.send_response(404)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+                self.server.lock.notify_all()
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipIf(importlib.util.find_spec("httpx") is None, "httpx not installed")
+class TestResearchFanOut(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureSite)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        self.server.lock = threading.Condition()
+        self.server.hits, self.server.active, self.server.peak = [], 0, 0
+        self.server.gate = self.server.expected = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(podcast_agent, "_research_caches",
+                                    {kind: ResultCache(os.path.join(self.tmp.name, kind), ttl=60)
+                                     for kind in ("research", "scrape", "search")})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.fetcher = PageFetcher(per_host=3, timeout=1)
+
+    def tearDown(self):
+        self.fetcher.close()
+        self.tmp.cleanup()
+        # Let abandoned requests (e.g. /slow after a timeout) finish before the counters are reset
+        with self.server.lock:
+            self.server.lock.wait_for(lambda: self.server.active == 0, timeout=5)
+
+    def search(self, query: str):
+        """Stub search: three fixture stories per query, one shared between queries."""
+        return [{"title": f"{query} {i}", "href": f"{self.base}/story/{i}", "body": f"snippet {i}"}
+                for i in (query, f"{query}-b", "shared")]
+
+    def test_html_to_text_drops_markup(self):
+        title, text = html_to_text(PAGE.format(n=1))
+        self.assertEqual(title, "Story 1")
+        self.assertEqual(text, "Paragraph one of story 1. Paragraph two.")
+
+    def test_fetches_concurrently_within_host_limit(self):
+        # Each story is held until three are in flight: a fetcher that didn't
+        # overlap them would leave the peak below three
+        self.server.gate, self.server.expected = 3, 7
+        bundle = gather_research(["a", "b", "c"], search=self.search, fetcher=self.fetcher)
+
+        self.assertEqual(len(bundle["sources"]), 7)  # "shared" is fetched once
+        self.assertEqual(sorted(self.server.hits), sorted(set(self.server.hits)))
+        self.assertEqual(self.server.peak, 3)  # Concurrent, and never more than per_host
+        self.assertEqual(bundle["sources"][0]["title"], "Story a")
+        self.assertIn("Paragraph one of story a.", format_bundle(bundle))
+
+    def test_errors_and_timeouts_are_reported(self):
+        def search(query):
+            if query == "broken":
+                raise RuntimeError("rate limited")
+            return [{"title": "slow", "href": f"{self.base}/slow"},
+                    {"title": "gone", "href": f"{self.base}/gone"}]
+
+        start = time.perf_counter()
+        bundle = gather_research(["ok", "broken"], search=search, fetcher=self.fetcher)
+        self.assertLess(time.perf_counter() - start, 2)
+        slow, gone = bundle["sources"]
+        self.assertIn("Timeout", slow["error"])
+        self.assertIn("404", gone["error"])
+        self.assertEqual(bundle["errors"], [{"query": "broken", "error": "rate limited"}])
+
+    def test_pages_come_from_scrape_cache_on_repeat(self):
+        gather_research(["a"], search=self.search, fetcher=self.fetcher)
+        bundle = gather_research(["a"], search=self.search, fetcher=self.fetcher)
+        self.assertEqual(len(self.server.hits), 3)
+        self.assertTrue(all(source.get("cached") for source in bundle["sources"]))
+
+    def test_fast_research_makes_one_llm_call(self):
+        prompts = []
+
+        def fake_llm(model, prompt, base_url=None, stats=None):
+            prompts.append(prompt)
+            stats.update(llm_calls=1, prompt_tokens=120, completion_tokens=30)
+            yield "- Story a is about "
+            yield "paragraphs."
+
+        usage = {}
+        with mock.patch.object(podcast_agent, "stream_ollama", fake_llm):
+            result = fast_research("story", search=self.search, fetcher=self.fetcher, usage=usage)
+        self.assertEqual(result, "- Story a is about paragraphs.")
+        self.assertEqual(len(prompts), 1)
+        self.assertIn("- Paragraph one of story story.", prompts[0])
+        self.assertEqual(usage, {"llm_calls": 1, "prompt_tokens": 120, "completion_tokens": 30})
+
+    def test_fast_research_falls_back_to_notes(self):
+        def broken_llm(model, prompt, base_url=None, stats=None):
+            raise OSError("connection refused")
+            yield
+
+        with mock.patch.object(podcast_agent, "stream_ollama", broken_llm):
+            result = fast_research("story", search=self.search, fetcher=self.fetcher)
+        self.assertIn("- Paragraph one of story story.", result)
+
+
+class TestExtractiveSummary(unittest.TestCase):
+    def test_prefers_on_topic_sentences_in_source_order(self):
+        bundle = {"sources": [
+            {"text": "The weather was pleasant for most of the afternoon today. "
+                     "Solar panels now convert a quarter of sunlight into power."},
+            {"snippet": "Solar storage prices fell sharply this year across Europe.",
+             "text": "Solar storage prices fell sharply this year across Europe. Short."},
+        ]}
+        sentences = extract_key_sentences("solar power", bundle, max_sentences=2)
+        self.assertEqual(sentences, ["Solar panels now convert a quarter of sunlight into power.",
+                                     "Solar storage prices fell sharply this year across Europe."])
+
+    def test_respects_character_budget(self):
+        text = " ".join(f"Sentence number {i} mentions solar energy in some detail." for i in range(50))
+        sentences = extract_key_sentences("solar", {"sources": [{"text": text}]}, max_chars=200)
+        self.assertLessEqual(sum(len(s) for s in sentences), 200)
+        self.assertTrue(sentences)
+
+if __name__ == '__main__':
+    unittest.main()
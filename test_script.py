@@ -0,0 +1,140 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from podcast_agent import OllamaClient, stream_ollama
+from script_parser import ScriptParser
+
+SCRIPT = (
+    "**Host**: Welcome to the show!\n"
+    "# Scene 1\n"
+    "Guest: Thanks for having me.\n"
+    "Host says: Let's talk about AI.\n"
+    "Guest - It's moving fast."
+)
+
+
+class StubOllama(BaseHTTPRequestHandler):
+    """Streams SCRIPT back a few characters at a time, like Ollama's /api/generate."""
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for i in range(0, len(SCRIPT), 7):
+            self.wfile.write(json.dumps({"response": SCRIPT[i:i + 7], "done": False}).encode() + b"\n")
+            self.wfile.flush()
+            time.sleep(0.01)
+        self.wfile.write(json.dumps({"response": "", "done": True}).encode() + b"\n")
+
+    def log_message(self, *args):
+        pass
+
+
+class KeepAliveOllama(BaseHTTPRequestHandler):
+    """HTTP/1.1 stand-in that keeps connections open and loads a model on its first request."""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.requests.append(body)
+            self.server.connections.add(self.client_address)
+            cold = body["model"] not in self.server.loaded
+            self.server.loaded.add(body["model"])
+        final = {"done": True, "load_duration": 2_000_000_000 if cold else 1_000_000,
+                 "prompt_eval_count": 5, "eval_count": 3}
+        lines = [] if not body["prompt"] else [{"response": "Host: Hi", "done": False}]
+        payload = b"".join(json.dumps(m).encode() + b"\n" for m in lines + [final])
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestOllamaClient(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveOllama)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.requests, self.server.connections, self.server.loaded = [], set(), set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = OllamaClient(f"http://127.0.0.1:{self.server.server_address[1]}", keep_alive="10m")
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reused_and_keep_alive_sent(self):
+        for _ in range(3):
+            self.assertEqual("".join(self.client.generate("m", "prompt")), "Host: Hi")
+        self.assertEqual(self.client.connections_opened, 1)
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertTrue(all(r["keep_alive"] == "10m" for r in self.server.requests))
+
+    def test_cold_then_warm(self):
+        cold, warm = {}, {}
+        "".join(self.client.generate("m", "prompt", stats=cold))
+        "".join(self.client.generate("m", "prompt", stats=warm))
+        self.assertEqual((cold["cold"], cold["load_s"]), (True, 2.0))
+        self.assertEqual((warm["cold"], warm["load_s"]), (False, 0.001))
+        self.assertEqual(warm["completion_tokens"], 3)
+        self.assertIn("first_token_s", warm)
+
+    def test_warm_loads_model(self):
+        self.assertFalse(self.client.is_warm("m"))
+        self.client.warm("m")
+        self.assertTrue(self.client.is_warm("m"))
+        self.assertEqual(self.server.requests[-1]["prompt"], "")
+        stats = {}
+        "".join(self.client.generate("m", "prompt", stats=stats))
+        self.assertFalse(stats["cold"])
+        self.assertEqual(self.client.connections_opened, 1)
+
+
+class TestStreamingScript(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+        cls.server.requests = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def test_stream_ollama_reassembles_script(self):
+        text = "".join(stream_ollama("qwen2.5:0.5b", "prompt", base_url=self.url))
+        self.assertEqual(text, SCRIPT)
+        self.assertEqual(self.server.requests[-1]["model"], "qwen2.5:0.5b")
+        self.assertTrue(self.server.requests[-1]["stream"])
+
+    def test_parse_stream_matches_parse(self):
+        streamed = list(ScriptParser.parse_stream(stream_ollama("m", "p", base_url=self.url)))
+        self.assertEqual(streamed, ScriptParser.parse(SCRIPT))
+        self.assertEqual(len(streamed), 4)
+
+    def test_parse_stream_yields_before_input_ends(self):
+        seen = []
+
+        def chunks():
+            yield "Host: Hello"
+            yield " there\nGuest: Hi"
+            seen.append("end of input")
+            yield "!\n"
+
+        for parsed in ScriptParser.parse_stream(chunks()):
+            seen.append(parsed)
+        self.assertEqual(seen, [("Host", "Hello there"), "end of input", ("Guest", "Hi!")])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# Generous budgets: these guard against the agent stack creeping back onto the import path
+IMPORT_BUDGET_S = 3.0
+FIRST_REQUEST_BUDGET_S = 1.0
+
+
+def timed_import(statement: str) -> dict:
+    """Runs an import in a fresh interpreter and reports its time and whether CrewAI got loaded."""
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "heavy = sorted(m for m in ('crewai', 'crewai_tools', 'httpx') if m in sys.modules)\n"
+        "print(elapsed, ','.join(heavy))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+    return {"seconds": float(out[0]), "heavy": out[1].split(",") if len(out) > 1 else []}
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_tts_core_imports_without_agent_stack(self):
+        result = timed_import("import audio_engine, script_parser")
+        print(f"\nimport audio_engine, script_parser: {result['seconds'] * 1000:.0f} ms")
+        self.assertEqual(result["heavy"], [])
+        self.assertLess(result["seconds"], IMPORT_BUDGET_S)
+
+    def test_podcast_agent_defers_crewai(self):
+        result = timed_import("import podcast_agent")
+        print(f"\nimport podcast_agent: {result['seconds'] * 1000:.0f} ms")
+        self.assertEqual(result["heavy"], [])
+        self.assertLess(result["seconds"], IMPORT_BUDGET_S)
+
+    def test_api_defers_crewai(self):
+        result = timed_import("import api")
+        print(f"\nimport api: {result['seconds'] * 1000:.0f} ms")
+        self.assertEqual(result["heavy"], [])
+
+
+class TestFirstRequest(unittest.TestCase):
+    def test_first_manual_request_is_fast(self):
+        from fastapi.testclient import TestClient
+        import api
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(api, "WARM_START", False), \
+                mock.patch.object(api, "job_queue", api.JobQueue(os.path.join(tmp, "jobs.db"), api.job_queue.handlers)), \
+                mock.patch.object(api, "artifacts", api.ArtifactStore(os.path.join(tmp, "artifacts"))):
+            os.chdir(tmp)  # Keeps anything written to the working directory out of the repo
+            try:
+                with TestClient(api.app) as client:
+                    start = time.perf_counter()
+                    res = client.post("/api/manual", json={"script": "Host: Hello"})
+                    elapsed = time.perf_counter() - start
+            finally:
+                os.chdir(cwd)
+        print(f"\nfirst /api/manual response: {elapsed * 1000:.0f} ms")
+        self.assertEqual(res.status_code, 200)
+        self.assertLess(elapsed, FIRST_REQUEST_BUDGET_S)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -66,15 +66,7 @@ export default function Home() {
 
             const data = await res.json();
 
-            // Handle Manual Mode (Sync)
-            if (mode === 'manual') {
-                setAudioUrl(`${API_URL}/api/audio/${data.filename}`);
-                setStatus('Complete!');
-                setIsGenerating(false);
-                return;
-            }
-
-            // Handle Agent Mode (Async Polling)
+            // Both modes run as queued jobs (Async Polling)
             const jobId = data.jobId;
             setStatus('Request Queued...');
 
@@ -313,7 +305,7 @@ export default function Home() {
                                     <h3 className="text-lg font-semibold text-white mb-1">Generated Podcast</h3>
                                     <p className="text-sm text-green-400">Ready to play</p>
                                 </div>
-                                <audio controls src={audioUrl} className="w-full max-w-md h-10 accent-green-500" />
+                                <audio controls preload="metadata" src={audioUrl} className="w-full max-w-md h-10 accent-green-500" />
                             </div>
                         </motion.div>
                     )}